@@ -0,0 +1,56 @@
+"""
+Answer validation against the stored solutions of a challenge
+
+Solutions are solved once when a challenge is stored (populate_challenges,
+generate_challenges) and kept as a sorted word list. Each process turns
+them into a frozenset per challenge, kept for settings.SOLUTION_CACHE_TTL
+seconds, so checking a word is one set lookup: no dictionary load and no
+re-solve per request.
+"""
+import threading
+
+from django.conf import settings
+
+from .cache import LocalMemoryCache
+from .storage import get_storage
+
+_solution_sets = None
+_solution_sets_lock = threading.Lock()
+
+
+def _get_solution_sets():
+    global _solution_sets
+
+    if _solution_sets is None:
+        with _solution_sets_lock:
+            if _solution_sets is None:
+                _solution_sets = LocalMemoryCache(settings.SOLUTION_CACHE_TTL)
+    return _solution_sets
+
+
+def get_solution_set(challenge_id):
+    """Get the set of solutions of a challenge, or None if it does not exist"""
+    solution_sets = _get_solution_sets()
+    solutions = solution_sets.get(challenge_id)
+    if solutions is None:
+        challenge = get_storage().get_challenge(challenge_id)
+        if challenge is None:
+            return None
+        solutions = frozenset(word.upper() for word in challenge.get('solutions', []))
+        solution_sets.set(challenge_id, solutions)
+    return solutions
+
+
+def check_words(solutions, words):
+    """
+    Check words (case-insensitive, duplicates ignored) against a solution set.
+    Returns {'valid': [...], 'invalid': [...], 'score'} with the score of
+    the words on the leaderboard: one point per valid word, as in the game
+    """
+    unique_words = dict.fromkeys(str(word).strip().upper() for word in words)
+    valid = [word for word in unique_words if word in solutions]
+    return {
+        'valid': valid,
+        'invalid': [word for word in unique_words if word not in solutions],
+        'score': len(valid),
+    }
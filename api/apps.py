@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+
+def _instrument_connection(sender, connection, **kwargs):
+    from .instrumentation import instrument_queries
+
+    # Time database queries like Firestore calls (see instrumentation.py)
+    if instrument_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrument_queries)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        connection_created.connect(_instrument_connection, dispatch_uid='api.instrument_connection')
+        if settings.API_WARM_UP:
+            from .warmup import warm_up
+
+            warm_up()
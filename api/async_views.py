@@ -0,0 +1,132 @@
+"""
+Async API views for Boggle challenges, leaderboard and scores
+
+With the Firestore storage these use the Firestore AsyncClient, so a worker
+serves other requests while it waits on Firestore, and independent reads of
+one request are issued concurrently. They need an ASGI server (see README)
+and replace the views of the same name in views.py when
+settings.API_ASYNC_VIEWS is set.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+
+from .cache import cache_challenges, get_cached_challenges, invalidate_challenges
+from .http_cache import conditional_response, data_etag
+from .storage import get_storage
+from .views import (
+    _build_score_data,
+    _challenge_list_response,
+    _parse_challenge_fields,
+    _parse_leaderboard_params,
+    _project_challenge,
+    _score_response,
+    _set_next_cursor,
+    _validate_found_words,
+)
+
+def async_api_view(http_method_names):
+    """
+    Async counterpart of rest_framework's @api_view: rejects other methods
+    with 405, exempts the view from CSRF like DRF does and turns uncaught
+    errors into a 500 JSON response
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in http_method_names:
+                return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+            try:
+                return await view(request, *args, **kwargs)
+            except Exception as e:
+                return JsonResponse({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+@async_api_view(['GET'])
+async def list_challenges(request):
+    """Get list of all challenges with high scores (takes ?fields= like views.list_challenges)"""
+    try:
+        fields = _parse_challenge_fields(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cached = get_cached_challenges()
+    if cached is None:
+        cached = cache_challenges(await get_storage().alist_challenges())
+
+    return _challenge_list_response(request, cached, fields)
+
+@async_api_view(['GET'])
+async def get_challenge(request, challenge_id):
+    """Get a specific challenge by ID (takes ?fields= like views.get_challenge)"""
+    try:
+        fields = _parse_challenge_fields(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    challenge = await get_storage().aget_challenge(challenge_id)
+
+    if challenge is None:
+        return JsonResponse({'error': 'Challenge not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    challenge = _project_challenge(challenge, fields)
+    return conditional_response(request, lambda: JsonResponse(challenge, status=status.HTTP_200_OK),
+                                data_etag(challenge), settings.CHALLENGE_MAX_AGE)
+
+@async_api_view(['POST'])
+async def submit_score(request):
+    """
+    Submit a score to the leaderboard
+
+    An optional idempotencyKey makes retries safe: a score with the same
+    userId and key is only added once
+    """
+    try:
+        data = json.loads(request.body or b'null')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON body'}, status=status.HTTP_400_BAD_REQUEST)
+
+    score_data, error = _build_score_data(data)
+    if not error:
+        error = await sync_to_async(_validate_found_words)(data, score_data)
+    if error:
+        return JsonResponse({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Add to leaderboard (and update the challenge summary)
+    created, is_high_score = await get_storage().aadd_score(score_data, data.get('idempotencyKey'))
+    if not created:
+        return _score_response(data, {'success': True, 'message': 'Score already submitted'}, status.HTTP_200_OK, JsonResponse)
+
+    # Refresh the challenge list if this is a new high score
+    if is_high_score:
+        invalidate_challenges()
+
+    return _score_response(data, {'success': True, 'message': 'Score submitted successfully'}, status.HTTP_201_CREATED, JsonResponse)
+
+@async_api_view(['GET'])
+async def get_leaderboard(request, challenge_id):
+    """
+    Get leaderboard for a specific challenge, highest scores first
+
+    Takes the same limit and after parameters as views.get_leaderboard
+    """
+    try:
+        limit, cursor = _parse_leaderboard_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    scores, has_more = await get_storage().aget_leaderboard(challenge_id, limit, cursor)
+
+    def build_response():
+        response = JsonResponse(scores, safe=False, status=status.HTTP_200_OK)
+        _set_next_cursor(response, scores, has_more)
+        return response
+
+    return conditional_response(request, build_response, data_etag([scores, has_more]), settings.SCORES_MAX_AGE)
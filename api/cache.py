@@ -0,0 +1,146 @@
+"""
+Cache for the challenge list served by list_challenges
+
+The list is cached with its ETag and the time it was read, for conditional
+requests (see http_cache.py). Its response bodies, serialized and compressed,
+are kept per process for each list version (challenge_list_payload).
+
+The backend is chosen by settings.CHALLENGE_LIST_CACHE['BACKEND']:
+- 'local': a per-process dict with a TTL (default). invalidate_challenges
+  only clears the calling process; other workers keep their list until the TTL
+- 'django': Django's cache framework (settings.CACHES), e.g. locmem or file;
+  a cache shared by the workers (file) is invalidated in all of them
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .http_cache import compress, data_etag
+
+CHALLENGE_LIST_KEY = 'challenges:list'
+# Encoded challenge list bodies kept per process, by (ETag, fields, encoding)
+PAYLOAD_CACHE_SIZE = 32
+
+
+class LocalMemoryCache:
+    """Per-process cache with a TTL"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class DjangoCache:
+    """Cache backed by one of the caches configured in settings.CACHES"""
+
+    def __init__(self, ttl, alias='default'):
+        self.ttl = ttl
+        self.alias = alias
+
+    def get(self, key):
+        return caches[self.alias].get(key)
+
+    def set(self, key, value):
+        caches[self.alias].set(key, value, self.ttl)
+
+    def delete(self, key):
+        caches[self.alias].delete(key)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_challenge_cache():
+    """Get the configured challenge list cache"""
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = settings.CHALLENGE_LIST_CACHE
+                backend = config.get('BACKEND', 'local')
+                ttl = config.get('TTL', 60)
+                if backend == 'local':
+                    _cache = LocalMemoryCache(ttl)
+                elif backend == 'django':
+                    _cache = DjangoCache(ttl, config.get('ALIAS', 'default'))
+                else:
+                    raise ValueError(f'Unknown challenge list cache backend: {backend}')
+    return _cache
+
+
+def get_cached_challenges():
+    """Get the cached (challenge list, ETag, last modified), or None on a miss"""
+    return get_challenge_cache().get(CHALLENGE_LIST_KEY)
+
+
+def cache_challenges(challenges):
+    """
+    Store the challenge list with its ETag and the time it was read (a Unix
+    timestamp); returns that (challenges, etag, last_modified) entry
+    """
+    entry = (challenges, data_etag(challenges), int(time.time()))
+    get_challenge_cache().set(CHALLENGE_LIST_KEY, entry)
+    return entry
+
+
+def invalidate_challenges():
+    """Drop the cached challenge list"""
+    get_challenge_cache().delete(CHALLENGE_LIST_KEY)
+
+
+_payloads = OrderedDict()
+_payloads_lock = threading.Lock()
+
+
+def challenge_list_payload(challenges, etag, fields=None, encoding=None):
+    """
+    Get the challenge list as a JSON body with only the given fields (all
+    with None), compressed with encoding (see http_cache.choose_encoding).
+    Bodies are built once per list version, identified by its ETag
+    """
+    key = (etag, fields, encoding)
+    with _payloads_lock:
+        body = _payloads.get(key)
+        if body is not None:
+            _payloads.move_to_end(key)
+            return body
+
+    if encoding is not None:
+        body = compress(challenge_list_payload(challenges, etag, fields), encoding)
+    else:
+        if fields is not None:
+            challenges = [{field: challenge[field] for field in fields if field in challenge} for challenge in challenges]
+        body = json.dumps(challenges, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    with _payloads_lock:
+        _payloads[key] = body
+        while len(_payloads) > PAYLOAD_CACHE_SIZE:
+            _payloads.popitem(last=False)
+    return body
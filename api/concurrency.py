@@ -0,0 +1,93 @@
+"""
+Bounded concurrency for issuing independent Firestore calls: a thread pool
+for the sync views and a semaphore-limited gather for the async views
+"""
+import asyncio
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .instrumentation import record_fallback
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Get the shared pool (settings.FIRESTORE_FANOUT_WORKERS threads per process)"""
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.FIRESTORE_FANOUT_WORKERS,
+                    thread_name_prefix='firestore-fanout',
+                )
+    return _executor
+
+
+def fan_out(func, items, timeout=None):
+    """
+    Call func(item) for every item on the shared pool and return the results
+    in item order. Calls that raise or do not finish within timeout seconds
+    (default settings.FIRESTORE_CALL_TIMEOUT) give None
+    """
+    items = list(items)
+    if not items:
+        return []
+    if timeout is None:
+        timeout = settings.FIRESTORE_CALL_TIMEOUT
+
+    # Run each call in a copy of the caller's context, so its storage calls
+    # are counted in the caller's request (see instrumentation.py)
+    futures = [get_executor().submit(contextvars.copy_context().run, func, item) for item in items]
+    wait(futures, timeout=timeout)
+
+    results = []
+    for item, future in zip(items, futures):
+        if not future.done():
+            future.cancel()
+            logger.warning('%s(%r) timed out after %ss', func.__name__, item, timeout)
+            record_fallback('fan_out_timeout')
+            results.append(None)
+        elif future.exception() is not None:
+            logger.warning('%s(%r) failed: %s', func.__name__, item, future.exception())
+            record_fallback('fan_out_error')
+            results.append(None)
+        else:
+            results.append(future.result())
+    return results
+
+
+async def fan_out_async(func, items, timeout=None):
+    """
+    Await func(item) for every item, at most settings.FIRESTORE_FANOUT_WORKERS
+    at a time, and return the results in item order. Like fan_out, calls that
+    raise or time out give None
+    """
+    items = list(items)
+    if not items:
+        return []
+    if timeout is None:
+        timeout = settings.FIRESTORE_CALL_TIMEOUT
+    semaphore = asyncio.Semaphore(settings.FIRESTORE_FANOUT_WORKERS)
+
+    async def call(item):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(func(item), timeout)
+            except asyncio.TimeoutError:
+                logger.warning('%s(%r) timed out after %ss', func.__name__, item, timeout)
+                record_fallback('fan_out_timeout')
+            except Exception as e:
+                logger.warning('%s(%r) failed: %s', func.__name__, item, e)
+                record_fallback('fan_out_error')
+            return None
+
+    return await asyncio.gather(*(call(item) for item in items))
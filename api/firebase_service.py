@@ -1,18 +1,33 @@
 """
 Firebase service for interacting with Firestore
 """
+import asyncio
 import os
+import threading
+import weakref
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
+from google.auth.credentials import AnonymousCredentials
 from pathlib import Path
 
 # Initialize Firebase Admin SDK
 _initialized = False
 _db = None
+# Concurrent first requests of a threaded worker must not both call
+# initialize_app (the second one raises) or build two clients
+_init_lock = threading.Lock()
+# Async clients are bound to the event loop they were created on
+_async_dbs = weakref.WeakKeyDictionary()
 
-def get_firestore_db():
-    """Get Firestore database instance"""
-    global _initialized, _db
+class _EmulatorCredential(credentials.Base):
+    """Anonymous credential for the local Firestore emulator"""
+
+    def get_credential(self):
+        return AnonymousCredentials()
+
+def _initialize_app():
+    """Initialize the Firebase Admin SDK once (call with _init_lock held)"""
+    global _initialized
     
     if not _initialized:
         # Try to find service account key
@@ -33,12 +48,14 @@ def get_firestore_db():
             firebase_admin.initialize_app(cred)
         else:
             # Try environment variables (for Heroku)
-            import os
             project_id = os.getenv('FIREBASE_PROJECT_ID')
             private_key = os.getenv('FIREBASE_PRIVATE_KEY', '')
             client_email = os.getenv('FIREBASE_CLIENT_EMAIL')
             
-            if project_id and private_key and client_email:
+            if os.getenv('FIRESTORE_EMULATOR_HOST') and not (private_key and client_email):
+                # Local Firestore emulator: no credentials needed
+                firebase_admin.initialize_app(_EmulatorCredential(), {'projectId': project_id or 'demo-boggle'})
+            elif project_id and private_key and client_email:
                 # Handle newlines in private key (Heroku config vars)
                 private_key = private_key.replace('\\n', '\n')
                 
@@ -56,7 +73,28 @@ def get_firestore_db():
                 )
         
         _initialized = True
-        _db = firestore.client()
+
+def get_firestore_db():
+    """Get Firestore database instance"""
+    global _db
+    
+    if _db is None:
+        with _init_lock:
+            if _db is None:
+                _initialize_app()
+                _db = firestore.client()
     
     return _db
 
+def get_async_firestore_db():
+    """Get the Firestore AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    db = _async_dbs.get(loop)
+    
+    if db is None:
+        with _init_lock:
+            _initialize_app()
+            db = _async_dbs[loop] = firestore_async.client()
+    
+    return db
+
@@ -0,0 +1,60 @@
+"""
+Thin wrappers around the Firestore calls that make round trips, so each one
+is timed and its documents read are counted (see instrumentation.py). The
+a-prefixed versions are for the AsyncClient.
+
+    docs = stream(query, 'leaderboard')
+    doc = get(ref, 'challenge')
+"""
+from .instrumentation import store_call
+
+
+def stream(query, operation='stream', **kwargs):
+    """Run a query and return its documents as a list"""
+    with store_call(operation) as call:
+        docs = list(query.stream(**kwargs))
+        call.documents = len(docs)
+    return docs
+
+
+async def astream(query, operation='stream', **kwargs):
+    with store_call(operation) as call:
+        docs = [doc async for doc in query.stream(**kwargs)]
+        call.documents = len(docs)
+    return docs
+
+
+def get(ref, operation='get', **kwargs):
+    """Read one document"""
+    with store_call(operation) as call:
+        doc = ref.get(**kwargs)
+        call.documents = 1 if doc.exists else 0
+    return doc
+
+
+async def aget(ref, operation='get', **kwargs):
+    with store_call(operation) as call:
+        doc = await ref.get(**kwargs)
+        call.documents = 1 if doc.exists else 0
+    return doc
+
+
+def get_all(db, refs, operation='get_all', **kwargs):
+    """Read many documents in one batched call and return them as a list"""
+    with store_call(operation) as call:
+        docs = list(db.get_all(refs, **kwargs))
+        call.documents = sum(1 for doc in docs if doc.exists)
+    return docs
+
+
+async def aget_all(db, refs, operation='get_all', **kwargs):
+    with store_call(operation) as call:
+        docs = [doc async for doc in db.get_all(refs, **kwargs)]
+        call.documents = sum(1 for doc in docs if doc.exists)
+    return docs
+
+
+def commit(batch, operation='commit'):
+    """Commit a WriteBatch"""
+    with store_call(operation):
+        return batch.commit()
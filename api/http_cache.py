@@ -0,0 +1,95 @@
+"""
+HTTP caching of the challenge and leaderboard reads
+
+Responses carry a strong ETag, a hash of their data (so every worker gives
+the same ETag for the same data), and a Cache-Control max-age:
+- a challenge's grid and solutions do not change, so browsers and CDNs keep
+  it for settings.CHALLENGE_MAX_AGE seconds
+- the challenge list and leaderboards change when scores are added, so they
+  are kept for settings.SCORES_MAX_AGE seconds and then revalidated
+
+A GET whose If-None-Match matches (or, without one, whose If-Modified-Since
+is not older than the Last-Modified) is answered with a bodyless 304 Not
+Modified. The challenge list is cached with its ETag (see cache.py), so
+revalidating it reads, serializes and hashes nothing.
+
+Bodies that are served often, like the challenge list, can be sent
+pre-compressed: choose_encoding picks brotli (with the optional Brotli
+package) or gzip from the request's Accept-Encoding, and each encoding is a
+representation with its own ETag (variant_etag).
+"""
+import gzip
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings in order of preference
+ENCODINGS = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def data_etag(data):
+    """Get the strong ETag of JSON-serializable response data"""
+    content = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return '"' + hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest() + '"'
+
+
+def conditional_response(request, build_response, etag, max_age, last_modified=None):
+    """
+    Answer a GET with a 304 Not Modified if its validators match the ETag
+    (and last_modified, a Unix timestamp), or else with build_response().
+    Both get the ETag, Last-Modified and Cache-Control headers
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build_response()
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+
+def variant_etag(etag, *parts):
+    """Get the ETag of a variant of the representation etag belongs to, e.g. an encoding"""
+    return '"' + '-'.join([etag.strip('"'), *[part for part in parts if part]]) + '"'
+
+
+def choose_encoding(request):
+    """Get the preferred content coding the request accepts ('br', 'gzip'), or None for identity"""
+    accepted = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    wildcard = accepted.get('*', 0.0)
+    return next((coding for coding in ENCODINGS if accepted.get(coding, wildcard) > 0), None)
+
+
+# Compression levels: the bodies are compressed in the request that misses
+# the payload cache, and the highest levels cost several times the CPU for
+# output only a few percent smaller
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+def compress(body, encoding):
+    """Compress bytes with a content coding from choose_encoding (None returns them as is)"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
@@ -0,0 +1,107 @@
+"""
+Per-request instrumentation of storage calls
+
+RequestTimingMiddleware (middleware.py) starts a RequestStats for each
+request. Storage code reports to it through:
+- store_call(operation): times a Firestore or database call and counts the
+  documents it read (see firestore_calls.py and the database query wrapper)
+- record_fallback(branch): notes that a slower fallback path ran, e.g. a
+  leaderboard scan for a challenge without a summary
+
+The stats of a request end up in its Server-Timing header, and every call and
+fallback is also added to the process metrics (metrics.py, served by
+/api/metrics/) whether or not it ran inside a request.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_request_stats = ContextVar('request_stats', default=None)
+# Whether a store call is in progress: calls made inside another (e.g. reads
+# in a transaction) are counted but their time is already in the outer call
+_in_store_call = ContextVar('in_store_call', default=False)
+
+
+class RequestStats:
+    """Storage calls and fallbacks of one request"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.documents = 0
+        self.fallbacks = []
+        # Calls of one request may run on the fan-out threads
+        self._lock = threading.Lock()
+
+    def add_call(self, seconds, documents):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+            self.documents += documents
+
+    def add_fallback(self, branch):
+        with self._lock:
+            self.fallbacks.append(branch)
+
+
+def begin_request():
+    """Start collecting the stats of a request; returns (stats, token for end_request)"""
+    stats = RequestStats()
+    return stats, _request_stats.set(stats)
+
+
+def end_request(token):
+    _request_stats.reset(token)
+
+
+class _StoreCall:
+    __slots__ = ('documents',)
+
+    def __init__(self):
+        self.documents = 0
+
+
+@contextmanager
+def store_call(operation):
+    """
+    Time a storage call. Set .documents on the yielded object to the number
+    of documents (or rows) it read
+    """
+    call = _StoreCall()
+    nested = _in_store_call.get()
+    token = _in_store_call.set(True)
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        elapsed = 0.0 if nested else time.perf_counter() - start
+        _in_store_call.reset(token)
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.add_call(elapsed, call.documents)
+        metrics.increment('store_calls', operation=operation)
+        metrics.increment('store_documents_read', call.documents, operation=operation)
+        if not nested:
+            metrics.observe('store_call_seconds', elapsed, operation=operation)
+
+
+def record_fallback(branch):
+    """Note that a fallback branch ran"""
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add_fallback(branch)
+    metrics.increment('store_fallbacks', branch=branch)
+    logger.info('Fallback: %s', branch)
+
+
+def instrument_queries(execute, sql, params, many, context):
+    """Database execute wrapper (connection.execute_wrappers) that times queries"""
+    with store_call('sql'):
+        return execute(sql, params, many, context)
@@ -0,0 +1,159 @@
+"""
+Django management command to generate challenge grids within a difficulty band
+"""
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.solver_service import canonical_grid, encode_grid, get_dictionary_index
+from api.storage import get_storage
+
+# On sys.path through api.solver_service
+from boggle_batch import solve_batch  # noqa: E402
+from boggle_boards import random_letters, roll_dice  # noqa: E402
+
+# Word-count bands (min, max or None) per board size and difficulty: boards
+# with fewer words are harder. Roughly the deciles of dice boards with the
+# full word list (4x4 median ~90 words, 5x5 ~235, 6x6 ~420, 8x8 ~860,
+# 10x10 ~1470, 12x12 ~2240)
+DIFFICULTY_BANDS = {
+    4: {'easy': (120, None), 'medium': (60, 120), 'hard': (20, 60)},
+    5: {'easy': (300, None), 'medium': (180, 300), 'hard': (60, 180)},
+    6: {'easy': (480, None), 'medium': (320, 480), 'hard': (160, 320)},
+    8: {'easy': (960, None), 'medium': (740, 960), 'hard': (370, 740)},
+    10: {'easy': (1640, None), 'medium': (1220, 1640), 'hard': (600, 1220)},
+    12: {'easy': (2430, None), 'medium': (1900, 2430), 'hard': (950, 1900)},
+}
+
+
+def _in_band(value, low, high):
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+class Command(BaseCommand):
+    help = 'Generate challenge grids whose solution count and score fall in a difficulty band'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10, help='Challenges to generate')
+        parser.add_argument('--size', type=int, default=4, help='Board size (default 4x4)')
+        parser.add_argument('--difficulty', choices=['easy', 'medium', 'hard'], default='medium')
+        parser.add_argument('--board', choices=['dice', 'random'], default='dice',
+                            help='Roll Boggle dice or draw letters by English frequency')
+        parser.add_argument('--min-words', type=int, help='Overrides the difficulty band')
+        parser.add_argument('--max-words', type=int, help='Overrides the difficulty band')
+        parser.add_argument('--min-score', type=int)
+        parser.add_argument('--max-score', type=int)
+        parser.add_argument('--max-candidates', type=int, default=100000,
+                            help='Give up after solving this many boards')
+        parser.add_argument('--processes', type=int, help='Solver processes (default: CPU count)')
+        parser.add_argument('--chunksize', type=int, default=256)
+        parser.add_argument('--batch-size', type=int, default=100, help='Challenges per storage write')
+        parser.add_argument('--start', type=int, help='Number of the first challenge id (default: after the last one)')
+        parser.add_argument('--seed', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Generate without writing to storage')
+
+    def handle(self, *args, **options):
+        size = options['size']
+        difficulty = options['difficulty']
+        band = DIFFICULTY_BANDS.get(size, {}).get(difficulty, (None, None))
+        min_words = options['min_words'] if options['min_words'] is not None else band[0]
+        max_words = options['max_words'] if options['max_words'] is not None else band[1]
+        min_score, max_score = options['min_score'], options['max_score']
+        if size not in DIFFICULTY_BANDS and min_words is None and max_words is None \
+                and min_score is None and max_score is None:
+            raise CommandError(f'No difficulty bands for {size}x{size} boards: pass --min-words/--max-words')
+
+        try:
+            storage = None if options['dry_run'] else get_storage()
+            existing = storage.list_challenges() if storage is not None else []
+            number = options['start']
+            if number is None:
+                numbers = [int(c['id'][len('challenge-'):]) for c in existing
+                           if c['id'].startswith('challenge-') and c['id'][len('challenge-'):].isdigit()]
+                number = max(numbers, default=0) + 1
+
+            self.stdout.write(
+                f'Generating {options["count"]} {difficulty} {size}x{size} challenges '
+                f'(words {min_words}-{max_words}, score {min_score}-{max_score})...')
+
+            # Compile the index once; every solver process memory-maps it
+            index_path = get_dictionary_index().path
+            rng = random.Random(options['seed'])
+            make_board = roll_dice if options['board'] == 'dice' else random_letters
+            candidates = {}
+
+            # Rotated or reflected boards have the same words: skip boards
+            # equivalent to an existing challenge or an earlier candidate
+            seen = {canonical_grid(c['gridCode'])[0] for c in existing if c['gridCode']}
+            skipped = 0
+
+            def generate():
+                nonlocal skipped
+                for candidate in range(options['max_candidates']):
+                    # Grid codes are hashable and small to send to the solver processes
+                    grid = encode_grid(make_board(size, rng))
+                    canonical_code = canonical_grid(grid)[0]
+                    if canonical_code in seen:
+                        skipped += 1
+                        continue
+                    seen.add(canonical_code)
+                    candidates[candidate] = grid
+                    yield {'id': candidate, 'grid': grid}
+
+            accepted = []
+            pending = []
+            solved = 0
+            start = time.perf_counter()
+            # Feed the pool one chunk per process at a time, so boards are
+            # only generated (and counted as skipped) while more are needed
+            processes = options['processes'] or os.cpu_count() or 1
+            results = solve_batch(generate(), index_path, processes, options['chunksize'], ordered=False,
+                                  max_pending=processes * options['chunksize'])
+            try:
+                for result in results:
+                    solved += 1
+                    grid = candidates.pop(result['id'])
+                    if not (_in_band(len(result['words']), min_words, max_words)
+                            and _in_band(result['totalScore'], min_score, max_score)):
+                        continue
+
+                    challenge_id = f'challenge-{number + len(accepted)}'
+                    challenge = {
+                        'id': challenge_id,
+                        'name': f'Challenge {number + len(accepted)}: {difficulty.title()} {size}x{size}',
+                        'size': size,
+                        'grid': grid,
+                        'solutions': result['words'],
+                        'difficulty': difficulty,
+                    }
+                    accepted.append(challenge)
+                    pending.append(challenge)
+                    self.stdout.write(self.style.SUCCESS(
+                        f'✅ {challenge_id}: {len(result["words"])} words, score {result["totalScore"]}'))
+
+                    if storage is not None and len(pending) >= options['batch_size']:
+                        storage.save_challenges(pending)
+                        pending = []
+                    if len(accepted) >= options['count']:
+                        break
+            finally:
+                results.close()
+
+            if storage is not None and pending:
+                storage.save_challenges(pending)
+
+            elapsed = time.perf_counter() - start
+            rate = solved / elapsed * 60 if elapsed else 0
+            self.stdout.write(f'Solved {solved} candidates in {elapsed:.1f}s ({rate:,.0f} per minute), '
+                              f'skipped {skipped} equivalent boards')
+            if len(accepted) < options['count']:
+                self.stdout.write(self.style.WARNING(
+                    f'Only {len(accepted)} of {solved} candidates were in the band; try --max-candidates or a wider band'))
+            target = 'dry run, nothing written' if storage is None else storage.name
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Generated {len(accepted)} challenges ({target})'))
+
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'❌ Error: {str(e)}'))
+            raise
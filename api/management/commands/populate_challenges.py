@@ -1,9 +1,9 @@
 """
-Django management command to populate Firestore with challenge grids
+Django management command to populate the challenge storage with challenge grids
 """
 from django.core.management.base import BaseCommand
-from api.firebase_service import get_firestore_db
-from firebase_admin import firestore
+from api.solver_service import solve_words
+from api.storage import get_storage
 
 # Fixed challenge grids data
 CHALLENGE_GRIDS = [
@@ -17,7 +17,6 @@ CHALLENGE_GRIDS = [
             ['I', 'J', 'K', 'L'],
             ['M', 'N', 'O', 'P']
         ],
-        'solutions': ['ABC', 'DEF', 'GHI', 'JKL', 'MNO', 'PQR', 'AFK', 'BGL', 'CHM', 'DIN'],
         'difficulty': 'easy',
     },
     {
@@ -30,7 +29,6 @@ CHALLENGE_GRIDS = [
             ['G', 'A', 'M', 'E'],
             ['P', 'L', 'A', 'Y']
         ],
-        'solutions': ['TEST', 'WORD', 'GAME', 'PLAY', 'TEAR', 'STEM', 'WARD', 'RODE', 'GAME', 'MALE', 'PLAY', 'LAMP'],
         'difficulty': 'medium',
     },
     {
@@ -43,7 +41,6 @@ CHALLENGE_GRIDS = [
             ['W', 'N', 'N', 'D'],
             ['S', 'O', 'L', 'V']
         ],
-        'solutions': ['QUICK', 'BROWN', 'DOWN', 'SOLVE', 'QUI', 'ICK', 'BRO', 'OWN', 'WON', 'SOL', 'OVE'],
         'difficulty': 'hard',
     },
     {
@@ -56,7 +53,6 @@ CHALLENGE_GRIDS = [
             ['L', 'D', 'F', 'U'],
             ['N', 'I', 'N', 'E']
         ],
-        'solutions': ['HELLO', 'WORLD', 'FUN', 'NINE', 'HEL', 'ELL', 'LLO', 'WOR', 'OLD', 'FUN', 'NIN', 'INE'],
         'difficulty': 'easy',
     },
     {
@@ -69,7 +65,6 @@ CHALLENGE_GRIDS = [
             ['F', 'G', 'H', 'J'],
             ['K', 'L', 'M', 'N']
         ],
-        'solutions': ['AEIO', 'BCDF', 'GHJK', 'LMN', 'AE', 'EI', 'IO', 'BC', 'CD', 'GH', 'HJ', 'LM', 'MN'],
         'difficulty': 'medium',
     },
     {
@@ -82,7 +77,6 @@ CHALLENGE_GRIDS = [
             ['B', 'I', 'R', 'D'],
             ['F', 'I', 'S', 'H']
         ],
-        'solutions': ['CAT', 'DOG', 'BIRD', 'FISH', 'CATS', 'DOGS', 'BIRDS', 'FISH', 'AT', 'OG', 'IR', 'IS'],
         'difficulty': 'easy',
     },
     {
@@ -96,7 +90,6 @@ CHALLENGE_GRIDS = [
             ['D', 'O', 'F', 'I', 'N'],
             ['I', 'S', 'H', 'E', 'D']
         ],
-        'solutions': ['START', 'HERE', 'THEN', 'FINISH', 'THESE', 'THE', 'HER', 'FIN', 'SHE', 'HED'],
         'difficulty': 'hard',
     },
     {
@@ -109,7 +102,6 @@ CHALLENGE_GRIDS = [
             ['T', 'A', 'K', 'E'],
             ['M', 'A', 'D', 'E']
         ],
-        'solutions': ['BOOK', 'LOOK', 'TAKE', 'MADE', 'BOO', 'OOK', 'LOO', 'TAK', 'MAD', 'ADE'],
         'difficulty': 'medium',
     },
     {
@@ -122,7 +114,6 @@ CHALLENGE_GRIDS = [
             ['S', 'O', 'U', 'P'],
             ['T', 'I', 'M', 'E']
         ],
-        'solutions': ['ALPHABET', 'SOUP', 'TIME', 'ALP', 'HAB', 'BET', 'SOU', 'TIM', 'IME'],
         'difficulty': 'hard',
     },
     {
@@ -135,45 +126,30 @@ CHALLENGE_GRIDS = [
             ['M', 'A', 'T', 'H'],
             ['S', 'C', 'I', 'O']
         ],
-        'solutions': ['ZEBRA', 'AXIO', 'MATH', 'SCIO', 'ZEB', 'RAX', 'MAT', 'SCI'],
         'difficulty': 'hard',
     }
 ]
 
 
 class Command(BaseCommand):
-    help = 'Populate Firestore with challenge grids'
+    help = 'Populate the challenge storage (settings.API_STORAGE_BACKEND) with challenge grids'
 
     def handle(self, *args, **options):
         try:
-            db = get_firestore_db()
-            challenges_ref = db.collection('challenges')
+            storage = get_storage()
             
-            self.stdout.write('Starting to populate Firestore with challenge grids...')
+            self.stdout.write(f'Starting to populate {storage.name} with challenge grids...')
             
-            for challenge in CHALLENGE_GRIDS:
-                # Convert 2D grid array to object format (Firestore doesn't support nested arrays)
-                grid_object = {}
-                for index, row in enumerate(challenge['grid']):
-                    grid_object[str(index)] = row
-                
-                challenge_doc = {
-                    'name': challenge['name'],
-                    'size': challenge['size'],
-                    'grid': grid_object,
-                    'solutions': challenge['solutions'],
-                    'difficulty': challenge['difficulty'],
-                    'createdAt': firestore.SERVER_TIMESTAMP
-                }
-                
-                # Set document
-                challenges_ref.document(challenge['id']).set(challenge_doc)
-                self.stdout.write(self.style.SUCCESS(f'✅ Added: {challenge["name"]} ({challenge["id"]})'))
+            # Store the real solutions, so answers are checked without re-solving
+            challenges = [dict(challenge, solutions=solve_words(challenge['grid'])) for challenge in CHALLENGE_GRIDS]
+            storage.save_challenges(challenges)
+            for challenge in challenges:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ Added: {challenge["name"]} ({challenge["id"]}, {len(challenge["solutions"])} words)'))
             
-            self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully populated {len(CHALLENGE_GRIDS)} challenge grids to Firestore!'))
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Successfully populated {len(CHALLENGE_GRIDS)} challenge grids to {storage.name}!'))
             self.stdout.write('Collection: challenges')
             
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'❌ Error: {str(e)}'))
             raise
-
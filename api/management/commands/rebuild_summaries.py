@@ -0,0 +1,29 @@
+"""
+Django management command to rebuild the per-challenge high-score summaries
+"""
+from django.core.management.base import BaseCommand
+from api.firebase_service import get_firestore_db
+from api.summaries import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = 'Rebuild challenge_summaries documents from the leaderboard collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('challenge_ids', nargs='*', help='Challenges to rebuild (default: all)')
+
+    def handle(self, *args, **options):
+        try:
+            db = get_firestore_db()
+            challenge_ids = options['challenge_ids'] or [doc.id for doc in db.collection('challenges').stream()]
+            
+            for challenge_id in challenge_ids:
+                summary = rebuild_summary(db, challenge_id)
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ {challenge_id}: {summary["scoreCount"]} scores, high score {summary["highScore"]}'))
+            
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Rebuilt {len(challenge_ids)} challenge summaries'))
+            
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'❌ Error: {str(e)}'))
+            raise
@@ -0,0 +1,77 @@
+"""
+In-process metrics: counters and value summaries (count, sum, max), served
+in the Prometheus text format by /api/metrics/
+"""
+import threading
+
+_lock = threading.Lock()
+_counters = {}
+_summaries = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, value=1, **labels):
+    """Add value to a counter"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    """Record one value (e.g. a latency or a batch size) in a summary"""
+    key = _key(name, labels)
+    with _lock:
+        count, total, maximum = _summaries.get(key, (0, 0, value))
+        _summaries[key] = (count + 1, total + value, max(maximum, value))
+
+
+def snapshot():
+    """
+    Get a copy of all metrics:
+    {'counters': {(name, labels): value}, 'summaries': {(name, labels): (count, sum, max)}}
+    """
+    with _lock:
+        return {'counters': dict(_counters), 'summaries': dict(_summaries)}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def render_prometheus(gauges=None, prefix='boggle_'):
+    """
+    Render all metrics in the Prometheus text exposition format: counters as
+    <name>_total, summaries as <name>_count, <name>_sum and a <name>_max
+    gauge. gauges is an optional list of (name, labels dict, value) sampled
+    at render time
+    """
+    data = snapshot()
+    samples = {}
+    for (name, labels), value in data['counters'].items():
+        samples.setdefault((f'{prefix}{name}_total', 'counter'), []).append((labels, value))
+    for (name, labels), (count, total, maximum) in data['summaries'].items():
+        samples.setdefault((f'{prefix}{name}', 'summary'), []).append((labels, (count, total)))
+        samples.setdefault((f'{prefix}{name}_max', 'gauge'), []).append((labels, maximum))
+    for name, labels, value in gauges or []:
+        samples.setdefault((f'{prefix}{name}', 'gauge'), []).append((tuple(sorted(labels.items())), value))
+
+    lines = []
+    for (name, kind), values in sorted(samples.items()):
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(values):
+            if kind == 'summary':
+                count, total = value
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+            else:
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
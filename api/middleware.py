@@ -0,0 +1,71 @@
+"""
+Request timing middleware
+
+Adds a Server-Timing header to every response, e.g.
+
+    Server-Timing: total;dur=23.4, store;dur=19.1;desc="3 calls, 41 docs", app;dur=4.3, fallback;desc="high_score_queries"
+
+- total: time spent in the view and the middleware below this one
+- store: summed time of the Firestore or database calls (concurrent calls
+  add up, so store can exceed total)
+- app: total minus store, the Python work
+- fallback: each slower fallback branch that ran (see instrumentation.py)
+
+Request durations and storage times are also added to the process metrics
+(/api/metrics/).
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics
+from .instrumentation import begin_request, end_request
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        stats, token = begin_request()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            end_request(token)
+        self._record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = begin_request()
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            end_request(token)
+        self._record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, response, stats, elapsed):
+        timings = [f'total;dur={elapsed * 1000:.1f}']
+        if stats.calls:
+            timings.append(f'store;dur={stats.seconds * 1000:.1f};desc="{stats.calls} calls, {stats.documents} docs"')
+        timings.append(f'app;dur={max(elapsed - stats.seconds, 0) * 1000:.1f}')
+        for branch in dict.fromkeys(stats.fallbacks):
+            timings.append(f'fallback;desc="{branch}"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        metrics.observe('http_request_seconds', elapsed, view=view, method=request.method)
+        metrics.observe('http_request_store_seconds', stats.seconds, view=view, method=request.method)
+        metrics.increment('http_responses', view=view, status=response.status_code)
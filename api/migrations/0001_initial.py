@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Challenge',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('size', models.PositiveSmallIntegerField(default=4)),
+                ('difficulty', models.CharField(default='medium', max_length=20)),
+                ('grid', models.JSONField()),
+                ('solutions', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Score',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('challenge_id', models.CharField(max_length=100)),
+                ('challenge_name', models.CharField(blank=True, max_length=200)),
+                ('user_id', models.CharField(max_length=128)),
+                ('user_name', models.CharField(max_length=200)),
+                ('user_email', models.CharField(blank=True, max_length=254)),
+                ('user_photo_url', models.URLField(blank=True, max_length=1000, null=True)),
+                ('score', models.IntegerField()),
+                ('found_words_count', models.IntegerField(default=0)),
+                ('total_words', models.IntegerField(default=0)),
+                ('time_elapsed', models.FloatField(default=0)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['challenge_id', '-score', '-id'], name='score_leaderboard_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+from math import isqrt
+
+from django.db import migrations, models
+
+# A frozen copy of the grid code format (boggle_grid) as of this migration,
+# so later changes to the live codec cannot change what it writes
+MULTI_LETTER_TILES = {'QU': 'q', 'ST': 's', 'TH': 't', 'IN': 'i', 'ER': 'e', 'HE': 'h', 'AN': 'a'}
+TILE_SYMBOLS = dict(MULTI_LETTER_TILES, **{letter: letter for letter in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'})
+SYMBOL_TILES = {symbol: tile.title() for tile, symbol in TILE_SYMBOLS.items()}
+ROW_SEPARATOR = '/'
+
+
+def encode_grid(grid):
+    if not grid or not grid[0]:
+        raise ValueError('Grid must have at least one tile')
+    width = len(grid[0])
+    rows = []
+    for row in grid:
+        if len(row) != width:
+            raise ValueError('Grid rows must have the same length')
+        symbols = [TILE_SYMBOLS.get(tile.upper()) if isinstance(tile, str) else None for tile in row]
+        if None in symbols:
+            raise ValueError(f'Row {row!r} has a tile without a grid code symbol')
+        rows.append(''.join(symbols))
+    if len(rows) == width:
+        return ''.join(rows)
+    if len(rows) == 1:
+        return rows[0] + ROW_SEPARATOR
+    return ROW_SEPARATOR.join(rows)
+
+
+def decode_grid(code):
+    if ROW_SEPARATOR in code:
+        lines = code.rstrip(ROW_SEPARATOR).split(ROW_SEPARATOR)
+    else:
+        size = isqrt(len(code))
+        lines = [code[row * size:(row + 1) * size] for row in range(size)]
+    return [[SYMBOL_TILES[symbol] for symbol in line] for line in lines]
+
+
+def encode_grids(apps, schema_editor):
+    Challenge = apps.get_model('api', 'Challenge')
+    for challenge in Challenge.objects.all():
+        challenge.grid_code = encode_grid(challenge.grid)
+        challenge.save(update_fields=['grid_code'])
+
+
+def decode_grids(apps, schema_editor):
+    Challenge = apps.get_model('api', 'Challenge')
+    for challenge in Challenge.objects.all():
+        challenge.grid = decode_grid(challenge.grid_code)
+        challenge.save(update_fields=['grid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        # Nullable while both fields exist, so the migration can be reversed
+        migrations.AlterField(
+            model_name='challenge',
+            name='grid',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='challenge',
+            name='grid_code',
+            field=models.CharField(default='', max_length=160),
+            preserve_default=False,
+        ),
+        migrations.RunPython(encode_grids, decode_grids),
+        migrations.RemoveField(
+            model_name='challenge',
+            name='grid',
+        ),
+        migrations.RenameField(
+            model_name='challenge',
+            old_name='grid_code',
+            new_name='grid',
+        ),
+    ]
@@ -1,3 +1,45 @@
+"""
+Database models for the 'database' storage backend (see storage/database.py)
+
+They mirror the Firestore 'challenges' and 'leaderboard' collections.
+"""
 from django.db import models
 
-# Create your models here.
+
+class Challenge(models.Model):
+    id = models.CharField(primary_key=True, max_length=100)
+    name = models.CharField(max_length=200)
+    size = models.PositiveSmallIntegerField(default=4)
+    difficulty = models.CharField(max_length=20, default='medium')
+    # Grid code, see boggle_grid (12x12 at most, with row separators)
+    grid = models.CharField(max_length=160)
+    solutions = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Score(models.Model):
+    """A leaderboard entry; ids are generated like Firestore document ids"""
+    id = models.CharField(primary_key=True, max_length=64)
+    challenge_id = models.CharField(max_length=100)
+    challenge_name = models.CharField(max_length=200, blank=True)
+    user_id = models.CharField(max_length=128)
+    user_name = models.CharField(max_length=200)
+    user_email = models.CharField(max_length=254, blank=True)
+    user_photo_url = models.URLField(max_length=1000, null=True, blank=True)
+    score = models.IntegerField()
+    found_words_count = models.IntegerField(default=0)
+    total_words = models.IntegerField(default=0)
+    time_elapsed = models.FloatField(default=0)
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # Leaderboard order: highest score first, then id (the page cursor)
+            models.Index(fields=['challenge_id', '-score', '-id'], name='score_leaderboard_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_name}: {self.score} ({self.challenge_id})'
@@ -0,0 +1,225 @@
+"""
+Write buffer for bulk score submissions
+
+Scores are queued in memory and written by a background flush thread with
+one Storage.add_scores call (Firestore WriteBatches, or a bulk insert) when
+settings.SCORE_BUFFER_MAX_BATCH scores are pending or
+settings.SCORE_BUFFER_FLUSH_INTERVAL seconds after the first queued score,
+whichever comes first, so queueing never waits for a write. With Firestore
+each flush then updates the summaries of the challenges it touched.
+
+Scores carry deterministic document ids (see storage.score_document_id),
+so a retried submission is dropped instead of being written twice.
+
+A failed write is split in halves down to single scores, so one score the
+store rejects does not hold back the others of its batch. Scores that could
+not be written are retried by the flush thread with exponential backoff,
+and after MAX_FLUSH_ATTEMPTS moved to dead_letters.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import metrics
+from .cache import invalidate_challenges
+from .storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+# Firestore rejects WriteBatches with more than 500 writes
+MAX_WRITE_BATCH = 500
+
+# Flush attempts before the scores of a failing batch are dropped
+MAX_FLUSH_ATTEMPTS = 3
+
+# Dropped scores kept per process for inspection
+MAX_DEAD_LETTERS = 1000
+
+
+class ScoreWriteBuffer:
+    """Coalesces queued scores into Firestore WriteBatches"""
+
+    def __init__(self, max_batch, flush_interval):
+        self.max_batch = min(max_batch, MAX_WRITE_BATCH)
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Signals the flush thread that _flush_at changed or the buffer closed
+        self._changed = threading.Condition(self._lock)
+        # time.monotonic() at which the flush thread writes the next batch
+        self._flush_at = None
+        self._thread = None
+        self._closed = False
+        # (document id, score data) of the scores dropped after MAX_FLUSH_ATTEMPTS
+        self.dead_letters = deque(maxlen=MAX_DEAD_LETTERS)
+
+    def add(self, scores):
+        """
+        Queue (document id, score data) pairs for the flush thread. Returns
+        the number queued; ids that are already pending are skipped
+        """
+        queued = 0
+        with self._lock:
+            for doc_id, score_data in scores:
+                if doc_id in self._pending:
+                    continue
+                self._pending[doc_id] = (score_data, 0)
+                queued += 1
+
+            if len(self._pending) >= self.max_batch:
+                self._schedule_flush(0)
+            else:
+                self._schedule_flush(self.flush_interval)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='score-buffer-flush', daemon=True)
+                self._thread.start()
+        return queued
+
+    def flush(self):
+        """Write all pending scores now, in the calling thread"""
+        with self._lock:
+            batches = []
+            while self._pending:
+                batches.append(self._take())
+        for batch in batches:
+            self._write(batch)
+
+    def close(self):
+        """Stop the flush thread and write the pending scores"""
+        with self._lock:
+            self._closed = True
+            self._changed.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        self.flush()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def _schedule_flush(self, delay):
+        """Move the next flush to at most delay seconds from now (lock held)"""
+        flush_at = time.monotonic() + delay
+        if self._pending and (self._flush_at is None or flush_at < self._flush_at):
+            self._flush_at = flush_at
+            self._changed.notify()
+
+    def _run(self):
+        """Flush thread: writes a batch whenever one is due, until close()"""
+        while True:
+            with self._lock:
+                while not self._closed:
+                    now = time.monotonic()
+                    if self._flush_at is not None and now >= self._flush_at:
+                        break
+                    self._changed.wait(None if self._flush_at is None else self._flush_at - now)
+                if self._closed:
+                    return
+                batch = self._take()
+            self._write(batch)
+
+    def _take(self):
+        """
+        Remove up to max_batch pending scores and reschedule the flush of
+        the others: now if they fill another batch (lock held)
+        """
+        doc_ids = list(self._pending)[:self.max_batch]
+        batch = {doc_id: self._pending.pop(doc_id) for doc_id in doc_ids}
+        self._flush_at = None
+        if len(self._pending) >= self.max_batch:
+            self._schedule_flush(0)
+        else:
+            self._schedule_flush(self.flush_interval)
+        return batch
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        written, failed = self._commit_isolating(batch)
+        metrics.observe('score_buffer_flush_seconds', time.perf_counter() - start)
+        metrics.observe('score_buffer_batch_size', written)
+        metrics.increment('score_buffer_duplicates', len(batch) - len(failed) - written)
+        if not failed:
+            return
+
+        retry = {}
+        for doc_id, (score_data, attempts) in failed.items():
+            if attempts + 1 < MAX_FLUSH_ATTEMPTS:
+                retry[doc_id] = (score_data, attempts + 1)
+            else:
+                logger.error('Dropped buffered score %s after %d attempts', doc_id, attempts + 1)
+                self.dead_letters.append((doc_id, score_data))
+        metrics.increment('score_buffer_dropped', len(failed) - len(retry))
+        if not retry:
+            return
+
+        backoff = self.flush_interval * 2 ** max(attempts for _, attempts in retry.values())
+        with self._lock:
+            for doc_id, item in retry.items():
+                self._pending.setdefault(doc_id, item)
+            self._schedule_flush(backoff)
+
+    def _commit_isolating(self, batch):
+        """
+        Write a batch. When that fails, its halves are written separately,
+        and so on down to single scores, so that one bad score does not hold
+        back the others; when both halves fail the store itself is failing
+        and the split stops. Returns (number written, {doc id: item} not written)
+        """
+        try:
+            return self._commit(batch), {}
+        except Exception:
+            logger.exception('Failed to write %d buffered scores', len(batch))
+            metrics.increment('score_buffer_flush_errors')
+        return self._commit_halves(batch)
+
+    def _commit_halves(self, batch):
+        if len(batch) == 1:
+            return 0, batch
+
+        items = list(batch.items())
+        halves = [dict(items[:len(items) // 2]), dict(items[len(items) // 2:])]
+        written = 0
+        failed = []
+        for half in halves:
+            try:
+                written += self._commit(half)
+            except Exception:
+                logger.exception('Failed to write %d buffered scores', len(half))
+                metrics.increment('score_buffer_flush_errors')
+                failed.append(half)
+
+        if not failed:
+            return written, {}
+        if len(failed) == len(halves):
+            return 0, batch
+        more, not_written = self._commit_halves(failed[0])
+        return written + more, not_written
+
+    def _commit(self, batch):
+        """Write the new scores of a batch; returns the number written"""
+        written, high_score = get_storage().add_scores(
+            (doc_id, score_data) for doc_id, (score_data, _) in batch.items())
+        if high_score:
+            invalidate_challenges()
+        return written
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_score_buffer():
+    """Get the process-wide score write buffer"""
+    global _buffer
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ScoreWriteBuffer(settings.SCORE_BUFFER_MAX_BATCH, settings.SCORE_BUFFER_FLUSH_INTERVAL)
+                atexit.register(_buffer.close)
+    return _buffer
@@ -0,0 +1,102 @@
+"""
+Solver service for running the Python Boggle solver inside Django
+"""
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+# The solver lives with the frontend sources (myboggle-app/src)
+if str(settings.BOGGLE_SOLVER_DIR) not in sys.path:
+    sys.path.append(str(settings.BOGGLE_SOLVER_DIR))
+
+from boggle_cache import SolveCache  # noqa: E402
+from boggle_grid import canonical_grid, decode_grid, encode_grid  # noqa: E402
+from boggle_index import DictionaryIndex  # noqa: E402
+from boggle_solver import Boggle  # noqa: E402
+
+_index = None
+_index_lock = threading.Lock()
+_solve_cache = None
+_solve_cache_lock = threading.Lock()
+
+
+def get_dictionary_index():
+    """Get the compiled dictionary index, loading it once per process"""
+    global _index
+
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DictionaryIndex.load_or_build(
+                    settings.BOGGLE_WORDLIST_PATH, settings.BOGGLE_INDEX_PATH)
+    return _index
+
+
+def get_solve_cache():
+    """Get the solve result cache, created once per process"""
+    global _solve_cache
+
+    if _solve_cache is None:
+        with _solve_cache_lock:
+            if _solve_cache is None:
+                _solve_cache = SolveCache(settings.SOLVE_CACHE_SIZE, settings.SOLVE_CACHE_PATH, settings.SOLVE_CACHE_DISK_SIZE)
+    return _solve_cache
+
+
+def get_solve_cache_stats():
+    """Get the solve cache counters (see SolveCache.stats), or None before the first solve"""
+    return _solve_cache.stats() if _solve_cache is not None else None
+
+
+def validate_grid(grid):
+    """Return an error message if grid (rows of tiles or a grid code) is not a usable board, else None"""
+    max_size = settings.BOGGLE_MAX_GRID_SIZE
+    if isinstance(grid, str):
+        try:
+            grid = decode_grid(grid)
+        except ValueError as e:
+            return str(e)
+    if not isinstance(grid, list) or not grid:
+        return 'grid must be a non-empty list of rows'
+    if len(grid) > max_size:
+        return f'grid can have at most {max_size} rows'
+    width = len(grid[0]) if isinstance(grid[0], list) else 0
+    for row in grid:
+        if not isinstance(row, list) or not row or len(row) != width:
+            return 'grid rows must be non-empty lists of equal length'
+        if len(row) > max_size:
+            return f'grid can have at most {max_size} columns'
+        for tile in row:
+            if not isinstance(tile, str) or not 1 <= len(tile) <= 2:
+                return 'grid tiles must be strings of one or two letters'
+    return None
+
+
+def solve_words(grid):
+    """Get the sorted words of a grid"""
+    return Boggle(grid, get_dictionary_index(), get_solve_cache()).getSolution(sort=True)
+
+
+def solve_grid(grid, include_paths=False):
+    """
+    Solve a grid with the shared index and return words, scores and timing.
+    With include_paths, also return the [row, col] cells spelling each word
+    """
+    index = get_dictionary_index()
+
+    start = time.perf_counter()
+    details = Boggle(grid, index, get_solve_cache()).getSolutionDetails(sort=True)
+    solve_time_ms = (time.perf_counter() - start) * 1000
+
+    scores = {item['word']: item['score'] for item in details}
+    result = {
+        'words': list(scores),
+        'scores': scores,
+        'totalScore': sum(scores.values()),
+        'solveTimeMs': round(solve_time_ms, 3),
+    }
+    if include_paths:
+        result['paths'] = {item['word']: item['path'] for item in details}
+    return result
@@ -0,0 +1,163 @@
+"""
+Storage backends for challenges and leaderboard entries
+
+The backend is chosen by settings.API_STORAGE_BACKEND:
+- 'firestore': Cloud Firestore (default), see storage/firestore.py
+- 'database': the Django database (settings.DATABASES), see storage/database.py
+
+Backends store grids as grid codes (see boggle_grid) and return data in the
+API format: challenges as built by challenge_response and leaderboard
+entries as built by leaderboard_entry.
+"""
+import hashlib
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from ..solver_service import decode_grid, encode_grid
+
+
+def challenge_response(challenge_id, challenge_data):
+    """
+    Build the API representation of a challenge document: the grid as rows
+    of tiles and as a grid code (see boggle_grid)
+    """
+    grid = challenge_data.get('grid', {})
+    if isinstance(grid, str):
+        grid_code = grid
+        grid_array = decode_grid(grid)
+    else:
+        # Older documents store the grid as an object of rows
+        if isinstance(grid, dict):
+            grid_array = [grid[key] for key in sorted(grid.keys(), key=lambda x: int(x))]
+        else:
+            grid_array = grid
+        try:
+            grid_code = encode_grid(grid_array)
+        except ValueError:
+            grid_code = None
+
+    return {
+        'id': challenge_id,
+        'name': challenge_data.get('name', challenge_id),
+        'size': challenge_data.get('size', 4),
+        'difficulty': challenge_data.get('difficulty', 'medium'),
+        'grid': grid_array,
+        'gridCode': grid_code,
+        'solutions': challenge_data.get('solutions', []),
+    }
+
+
+def sort_challenges(challenges):
+    """Sort challenges by challenge number"""
+    challenges.sort(key=lambda x: int(x['id'].replace('challenge-', '').replace('challenge', '0') or '0'))
+
+
+def get_score_value(score_data):
+    """Get the score of a leaderboard entry (older entries only have foundWordsCount)"""
+    return score_data.get('score') or score_data.get('foundWordsCount', 0)
+
+
+def get_player_name(score_data):
+    """Get the display name of the player of a leaderboard entry"""
+    return score_data.get('userName') or 'Unknown'
+
+
+def score_document_id(user_id, idempotency_key):
+    """Get the leaderboard document id for a client-supplied idempotency key"""
+    key = f'{user_id}:{idempotency_key}'.encode('utf-8')
+    return hashlib.sha256(key).hexdigest()[:40]
+
+
+def leaderboard_entry(score_id, user_id, user_name, score, time_elapsed, timestamp):
+    """Build a public leaderboard entry (no emails or photo URLs)"""
+    return {
+        'id': score_id,
+        'userId': user_id,
+        'userName': user_name,
+        'score': score,
+        'timeElapsed': time_elapsed,
+        'timestamp': timestamp,
+    }
+
+
+class Storage:
+    """
+    Interface of the storage backends. The async methods (a-prefixed, like
+    Django's QuerySet.aget) run the sync ones in a thread unless a backend
+    has a native async client
+    """
+    name = None
+
+    def list_challenges(self):
+        """Get all challenges with their highScore and highScorePlayer, sorted"""
+        raise NotImplementedError
+
+    def get_challenge(self, challenge_id):
+        """Get a challenge, or None if it does not exist"""
+        raise NotImplementedError
+
+    def save_challenges(self, challenges):
+        """Create or replace challenges given in the API format"""
+        raise NotImplementedError
+
+    def add_score(self, score_data, idempotency_key=None):
+        """
+        Add a score (see views._build_score_data; backends add the
+        timestamps). With an idempotency key, a retried submission is not
+        added again. Returns (created, is_high_score)
+        """
+        raise NotImplementedError
+
+    def add_scores(self, scores):
+        """
+        Add (score id, score data) pairs, skipping ids that already exist.
+        Returns (number written, whether one of them is a new high score)
+        """
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Open clients and connections ahead of the first request"""
+
+    def get_leaderboard(self, challenge_id, limit, cursor=None):
+        """
+        Get up to limit entries, highest scores first, after cursor, a
+        (score, score id) pair. Returns (entries, has_more)
+        """
+        raise NotImplementedError
+
+    async def alist_challenges(self):
+        return await sync_to_async(self.list_challenges)()
+
+    async def aget_challenge(self, challenge_id):
+        return await sync_to_async(self.get_challenge)(challenge_id)
+
+    async def aadd_score(self, score_data, idempotency_key=None):
+        return await sync_to_async(self.add_score)(score_data, idempotency_key)
+
+    async def aget_leaderboard(self, challenge_id, limit, cursor=None):
+        return await sync_to_async(self.get_leaderboard)(challenge_id, limit, cursor)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Get the configured storage backend"""
+    global _storage
+
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = settings.API_STORAGE_BACKEND
+                if backend == 'firestore':
+                    from .firestore import FirestoreStorage
+                    _storage = FirestoreStorage()
+                elif backend == 'database':
+                    from .database import DatabaseStorage
+                    _storage = DatabaseStorage()
+                else:
+                    raise ValueError(f'Unknown storage backend: {backend}')
+    return _storage
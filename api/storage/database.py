@@ -0,0 +1,132 @@
+"""
+Django database storage (models.Challenge and models.Score)
+
+Reads need no network round trip when the database is local (the default
+SQLite file), and leaderboard pages are range scans of the
+(challenge_id, -score, -id) index.
+"""
+import uuid
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Q, Subquery
+
+from ..models import Challenge, Score
+from ..solver_service import encode_grid
+from . import Storage, challenge_response, get_player_name, leaderboard_entry, score_document_id, sort_challenges
+
+LEADERBOARD_COLUMNS = ['id', 'user_id', 'user_name', 'score', 'time_elapsed', 'timestamp']
+
+
+def _score_model(score_id, score_data):
+    """Build a Score from a leaderboard document (timestamps are set by the database)"""
+    return Score(
+        id=score_id,
+        challenge_id=score_data['challengeId'],
+        challenge_name=score_data.get('challengeName') or '',
+        user_id=score_data['userId'],
+        user_name=score_data['userName'],
+        user_email=score_data.get('userEmail') or '',
+        user_photo_url=score_data.get('userPhotoURL'),
+        score=score_data['score'],
+        found_words_count=score_data.get('foundWordsCount', score_data['score']),
+        total_words=score_data.get('totalWords', 0),
+        time_elapsed=score_data.get('timeElapsed', 0),
+    )
+
+
+def _challenge_response(row):
+    return challenge_response(row.id, {
+        'name': row.name,
+        'size': row.size,
+        'difficulty': row.difficulty,
+        'grid': row.grid,
+        'solutions': row.solutions,
+    })
+
+
+def _high_scores(challenge_ids):
+    """Get {challenge_id: high score} of the challenges that have scores"""
+    rows = (Score.objects.filter(challenge_id__in=challenge_ids)
+            .values('challenge_id').annotate(high_score=Max('score')))
+    return {row['challenge_id']: row['high_score'] for row in rows}
+
+
+class DatabaseStorage(Storage):
+    name = 'the database'
+
+    def list_challenges(self):
+        best = Score.objects.filter(challenge_id=OuterRef('pk')).order_by('-score', '-id')
+        rows = Challenge.objects.annotate(
+            high_score=Subquery(best.values('score')[:1]),
+            high_score_player=Subquery(best.values('user_name')[:1]),
+        )
+
+        challenges = []
+        for row in rows:
+            challenge = _challenge_response(row)
+            challenge['highScore'] = row.high_score
+            challenge['highScorePlayer'] = get_player_name({'userName': row.high_score_player}) if row.high_score is not None else None
+            challenges.append(challenge)
+
+        sort_challenges(challenges)
+        return challenges
+
+    def get_challenge(self, challenge_id):
+        row = Challenge.objects.filter(pk=challenge_id).first()
+        if row is None:
+            return None
+        return _challenge_response(row)
+
+    def save_challenges(self, challenges):
+        with transaction.atomic():
+            for challenge in challenges:
+                Challenge.objects.update_or_create(id=challenge['id'], defaults={
+                    'name': challenge['name'],
+                    'size': challenge['size'],
+                    'difficulty': challenge['difficulty'],
+                    'grid': encode_grid(challenge['grid']),
+                    'solutions': challenge['solutions'],
+                })
+
+    def add_score(self, score_data, idempotency_key=None):
+        if idempotency_key:
+            score_id = score_document_id(score_data['userId'], idempotency_key)
+        else:
+            score_id = uuid.uuid4().hex
+
+        with transaction.atomic():
+            if idempotency_key and Score.objects.filter(pk=score_id).exists():
+                return False, False
+            previous_high = _high_scores([score_data['challengeId']]).get(score_data['challengeId'])
+            _score_model(score_id, score_data).save(force_insert=True)
+
+        return True, previous_high is None or score_data['score'] > previous_high
+
+    def add_scores(self, scores):
+        scores = dict(scores)
+
+        with transaction.atomic():
+            existing = set(Score.objects.filter(pk__in=list(scores)).values_list('pk', flat=True))
+            new_scores = [_score_model(score_id, score_data)
+                          for score_id, score_data in scores.items() if score_id not in existing]
+            if not new_scores:
+                return 0, False
+
+            previous_highs = _high_scores({score.challenge_id for score in new_scores})
+            Score.objects.bulk_create(new_scores)
+
+        high_score = any(
+            score.challenge_id not in previous_highs or score.score > previous_highs[score.challenge_id]
+            for score in new_scores
+        )
+        return len(new_scores), high_score
+
+    def get_leaderboard(self, challenge_id, limit, cursor=None):
+        scores_query = Score.objects.filter(challenge_id=challenge_id).order_by('-score', '-id')
+        if cursor is not None:
+            score, score_id = cursor
+            scores_query = scores_query.filter(Q(score__lt=score) | Q(score=score, id__lt=score_id))
+
+        # Read one extra entry to know whether there is a next page
+        rows = list(scores_query.values_list(*LEADERBOARD_COLUMNS)[:limit + 1])
+        return [leaderboard_entry(*row) for row in rows[:limit]], len(rows) > limit
@@ -0,0 +1,314 @@
+"""
+Cloud Firestore storage
+
+Challenges are in the 'challenges' collection and scores in 'leaderboard'.
+High scores and first leaderboard pages are read from the per-challenge
+summaries (see summaries.py). The async methods use the Firestore AsyncClient.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from firebase_admin import firestore
+
+from .. import firestore_calls, metrics
+from ..concurrency import fan_out, fan_out_async
+from ..firebase_service import get_async_firestore_db, get_firestore_db
+from ..instrumentation import record_fallback
+from ..solver_service import encode_grid
+from ..summaries import (
+    add_score,
+    add_score_async,
+    add_to_summary,
+    get_summaries,
+    get_summaries_async,
+    get_summary_ref,
+    summary_entry,
+)
+from . import Storage, challenge_response, get_score_value, leaderboard_entry, sort_challenges
+
+logger = logging.getLogger(__name__)
+
+# Leaderboard fields read from Firestore and returned by get_leaderboard
+LEADERBOARD_FIELDS = ['userId', 'userName', 'score', 'foundWordsCount', 'timeElapsed', 'timestamp']
+
+# Firestore rejects WriteBatches with more than 500 writes
+MAX_WRITE_BATCH = 500
+
+
+def _score_document(score_data):
+    """Build a leaderboard document, timestamped by the server"""
+    return {**score_data, 'timestamp': firestore.SERVER_TIMESTAMP, 'createdAt': firestore.SERVER_TIMESTAMP}
+
+
+def _leaderboard_entry(doc_id, score_data):
+    return leaderboard_entry(
+        doc_id,
+        score_data.get('userId'),
+        score_data.get('userName'),
+        get_score_value(score_data),
+        score_data.get('timeElapsed', 0),
+        score_data.get('timestamp'),
+    )
+
+
+def _query_high_score(db, challenge_id):
+    """Find the high score of a challenge by querying its leaderboard entries"""
+    high_score = None
+    high_score_player = None
+
+    try:
+        leaderboard_ref = db.collection('leaderboard')
+        # Try to get high score
+        high_score_query = leaderboard_ref.where('challengeId', '==', challenge_id).order_by('score', direction=firestore.Query.DESCENDING).limit(1)
+        high_score_docs = firestore_calls.stream(high_score_query, 'high_score')
+
+        if high_score_docs:
+            score_data = high_score_docs[0].to_dict()
+            high_score = score_data.get('score') or score_data.get('foundWordsCount')
+            high_score_player = score_data.get('userName') or score_data.get('userEmail', 'Unknown')
+    except Exception as e:
+        # If query fails, try without order_by
+        record_fallback('high_score_scan')
+        logger.warning('High score query of %s failed, scanning its scores: %s', challenge_id, e)
+        try:
+            all_scores_query = leaderboard_ref.where('challengeId', '==', challenge_id)
+            all_scores = firestore_calls.stream(all_scores_query, 'high_score_scan')
+
+            if all_scores:
+                max_score = -1
+                best_score_data = None
+                for score_doc in all_scores:
+                    score_data = score_doc.to_dict()
+                    score_value = score_data.get('score') or score_data.get('foundWordsCount', 0)
+                    if score_value > max_score:
+                        max_score = score_value
+                        best_score_data = score_data
+
+                if max_score >= 0 and best_score_data:
+                    high_score = max_score
+                    high_score_player = best_score_data.get('userName') or best_score_data.get('userEmail', 'Unknown')
+        except Exception:
+            record_fallback('high_score_scan_failed')
+            logger.exception('High score scan of %s failed', challenge_id)
+
+    return high_score, high_score_player
+
+
+async def _query_high_score_async(db, challenge_id):
+    """_query_high_score for the AsyncClient"""
+    leaderboard_ref = db.collection('leaderboard')
+    try:
+        high_score_query = leaderboard_ref.where('challengeId', '==', challenge_id).order_by('score', direction=firestore.Query.DESCENDING).limit(1)
+        score_docs = await firestore_calls.astream(high_score_query, 'high_score')
+    except Exception as e:
+        # If query fails, scan all entries of the challenge
+        record_fallback('high_score_scan')
+        logger.warning('High score query of %s failed, scanning its scores: %s', challenge_id, e)
+        all_scores_query = leaderboard_ref.where('challengeId', '==', challenge_id)
+        score_docs = await firestore_calls.astream(all_scores_query, 'high_score_scan')
+
+    if not score_docs:
+        return None, None
+    score_data = max((doc.to_dict() for doc in score_docs), key=get_score_value)
+    return get_score_value(score_data), score_data.get('userName') or score_data.get('userEmail', 'Unknown')
+
+
+def _summary_high_scores(challenge_ids, summaries):
+    """
+    Get {challenge_id: (high_score, player)} from the challenge summaries and
+    the ids of the challenges without a summary, whose high score is queried
+    """
+    high_scores = {
+        challenge_id: (summary.get('highScore'), summary.get('highScorePlayer'))
+        for challenge_id, summary in summaries.items() if summary is not None
+    }
+    unsummarized = [challenge_id for challenge_id in challenge_ids
+                    if challenge_id in summaries and summaries[challenge_id] is None]
+    return high_scores, unsummarized
+
+
+def _challenge_list(challenge_docs, high_scores):
+    """Build the sorted challenge list from challenge documents and their high scores"""
+    challenges = []
+
+    for doc in challenge_docs:
+        high_score, high_score_player = high_scores.get(doc.id, (None, None))
+
+        challenge = challenge_response(doc.id, doc.to_dict())
+        challenge['highScore'] = high_score
+        challenge['highScorePlayer'] = high_score_player
+        challenges.append(challenge)
+
+    sort_challenges(challenges)
+    return challenges
+
+
+def _leaderboard_query(db, challenge_id, cursor=None):
+    """Build the leaderboard query of a challenge, starting after cursor (works with both clients)"""
+    scores_query = (
+        db.collection('leaderboard')
+        .where('challengeId', '==', challenge_id)
+        .order_by('score', direction=firestore.Query.DESCENDING)
+        .order_by('__name__', direction=firestore.Query.DESCENDING)
+        .select(LEADERBOARD_FIELDS)
+    )
+    if cursor is not None:
+        scores_query = scores_query.start_after({'score': cursor[0], '__name__': cursor[1]})
+    return scores_query
+
+
+def _summary_page(summary, limit):
+    """Get (entries, has_more) for the first leaderboard page from a challenge summary"""
+    top_scores = summary.get('topScores', [])
+    scores = [_leaderboard_entry(entry.get('scoreId'), entry) for entry in top_scores[:limit]]
+    return scores, summary.get('scoreCount', len(top_scores)) > limit
+
+
+def _uses_summary(limit, cursor):
+    """Whether a leaderboard page is within the top scores of the challenge summary"""
+    return cursor is None and limit <= settings.LEADERBOARD_SUMMARY_SIZE
+
+
+class FirestoreStorage(Storage):
+    name = 'Firestore'
+
+    def list_challenges(self):
+        db = get_firestore_db()
+        challenge_docs = firestore_calls.stream(db.collection('challenges'), 'challenges')
+        challenge_ids = [doc.id for doc in challenge_docs]
+
+        # Get high scores from the challenge summaries (batched, concurrent reads)
+        summaries = get_summaries(db, challenge_ids)
+        high_scores, unsummarized = _summary_high_scores(challenge_ids, summaries)
+
+        # No scores submitted since summaries were introduced: query concurrently
+        if unsummarized:
+            record_fallback('high_score_queries')
+        results = fan_out(lambda challenge_id: _query_high_score(db, challenge_id), unsummarized)
+        for challenge_id, result in zip(unsummarized, results):
+            if result is not None:
+                high_scores[challenge_id] = result
+
+        return _challenge_list(challenge_docs, high_scores)
+
+    def get_challenge(self, challenge_id):
+        challenge_doc = firestore_calls.get(get_firestore_db().collection('challenges').document(challenge_id), 'challenge')
+        if not challenge_doc.exists:
+            return None
+        return challenge_response(challenge_id, challenge_doc.to_dict())
+
+    def save_challenges(self, challenges):
+        db = get_firestore_db()
+        challenges_ref = db.collection('challenges')
+
+        for start in range(0, len(challenges), MAX_WRITE_BATCH):
+            batch = db.batch()
+            for challenge in challenges[start:start + MAX_WRITE_BATCH]:
+                challenge_doc = {
+                    'name': challenge['name'],
+                    'size': challenge['size'],
+                    'grid': encode_grid(challenge['grid']),
+                    'solutions': challenge['solutions'],
+                    'difficulty': challenge['difficulty'],
+                    'createdAt': firestore.SERVER_TIMESTAMP,
+                }
+                batch.set(challenges_ref.document(challenge['id']), challenge_doc)
+            firestore_calls.commit(batch)
+
+    def warm_up(self):
+        get_firestore_db()
+
+    def add_score(self, score_data, idempotency_key=None):
+        return add_score(get_firestore_db(), _score_document(score_data), idempotency_key)
+
+    def add_scores(self, scores):
+        db = get_firestore_db()
+        scores = dict(scores)
+        leaderboard_ref = db.collection('leaderboard')
+        refs = [leaderboard_ref.document(doc_id) for doc_id in scores]
+
+        # Skip scores written by an earlier attempt of the same submission
+        existing = {doc.id for doc in firestore_calls.get_all(db, refs, 'scores') if doc.exists}
+        new_refs = [ref for ref in refs if ref.id not in existing]
+        if not new_refs:
+            return 0, False
+
+        for start in range(0, len(new_refs), MAX_WRITE_BATCH):
+            write_batch = db.batch()
+            for ref in new_refs[start:start + MAX_WRITE_BATCH]:
+                write_batch.set(ref, _score_document(scores[ref.id]))
+            firestore_calls.commit(write_batch)
+
+        now = datetime.now(timezone.utc)
+        entries = defaultdict(list)
+        for ref in new_refs:
+            score_data = scores[ref.id]
+            entries[score_data['challengeId']].append(summary_entry(ref.id, score_data, now))
+
+        high_score = False
+        for challenge_id, challenge_entries in entries.items():
+            try:
+                high_score = add_to_summary(db, challenge_id, challenge_entries) or high_score
+            except Exception:
+                logger.exception('Failed to update the summary of %s', challenge_id)
+                record_fallback('summary_update_failed')
+                metrics.increment('score_buffer_summary_errors')
+        return len(new_refs), high_score
+
+    def get_leaderboard(self, challenge_id, limit, cursor=None):
+        db = get_firestore_db()
+
+        # First page: read the top scores from the challenge summary
+        if _uses_summary(limit, cursor):
+            summary_doc = firestore_calls.get(get_summary_ref(db, challenge_id), 'summary')
+            if summary_doc.exists:
+                return _summary_page(summary_doc.to_dict(), limit)
+            record_fallback('leaderboard_without_summary')
+
+        # Deeper pages: indexed query, projected to the public fields
+        # Read one extra entry to know whether there is a next page
+        docs = firestore_calls.stream(_leaderboard_query(db, challenge_id, cursor).limit(limit + 1), 'leaderboard')
+        return [_leaderboard_entry(doc.id, doc.to_dict()) for doc in docs[:limit]], len(docs) > limit
+
+    async def alist_challenges(self):
+        db = get_async_firestore_db()
+        challenge_docs = await firestore_calls.astream(db.collection('challenges'), 'challenges')
+        challenge_ids = [doc.id for doc in challenge_docs]
+
+        summaries = await get_summaries_async(db, challenge_ids)
+        high_scores, unsummarized = _summary_high_scores(challenge_ids, summaries)
+        if unsummarized:
+            record_fallback('high_score_queries')
+
+        async def query_high_score(challenge_id):
+            return await _query_high_score_async(db, challenge_id)
+
+        results = await fan_out_async(query_high_score, unsummarized)
+        for challenge_id, result in zip(unsummarized, results):
+            if result is not None:
+                high_scores[challenge_id] = result
+
+        return _challenge_list(challenge_docs, high_scores)
+
+    async def aget_challenge(self, challenge_id):
+        challenge_doc = await firestore_calls.aget(get_async_firestore_db().collection('challenges').document(challenge_id), 'challenge')
+        if not challenge_doc.exists:
+            return None
+        return challenge_response(challenge_id, challenge_doc.to_dict())
+
+    async def aadd_score(self, score_data, idempotency_key=None):
+        return await add_score_async(get_async_firestore_db(), _score_document(score_data), idempotency_key)
+
+    async def aget_leaderboard(self, challenge_id, limit, cursor=None):
+        db = get_async_firestore_db()
+
+        if _uses_summary(limit, cursor):
+            summary_doc = await firestore_calls.aget(get_summary_ref(db, challenge_id), 'summary')
+            if summary_doc.exists:
+                return _summary_page(summary_doc.to_dict(), limit)
+            record_fallback('leaderboard_without_summary')
+
+        docs = await firestore_calls.astream(_leaderboard_query(db, challenge_id, cursor).limit(limit + 1), 'leaderboard')
+        return [_leaderboard_entry(doc.id, doc.to_dict()) for doc in docs[:limit]], len(docs) > limit
@@ -0,0 +1,230 @@
+"""
+Per-challenge high-score summaries
+
+Each challenge has a document in 'challenge_summaries' (same id as the
+challenge) holding its current high score and its top scores:
+
+    {
+        'challengeId': 'challenge-1',
+        'highScore': 12,
+        'highScorePlayer': 'User Name',
+        'scoreCount': 42,
+        'topScores': [{'scoreId', 'userId', 'userName', ...}, ...],
+    }
+
+The summary is updated in the same transaction that adds a score to
+'leaderboard', so high scores and leaderboards are a single document read.
+Transactions never create a summary: rebuild_summary (the
+rebuild_summaries command) does, and until then readers query the
+leaderboard.
+
+The *_async functions are the equivalents for the Firestore AsyncClient,
+used by the async views.
+"""
+from datetime import datetime, timezone
+
+from django.conf import settings
+from firebase_admin import firestore
+
+from . import firestore_calls
+from .concurrency import fan_out, fan_out_async
+from .instrumentation import record_fallback, store_call
+from .storage import get_player_name, get_score_value, score_document_id
+
+SUMMARY_COLLECTION = 'challenge_summaries'
+
+
+def summary_entry(score_id, score_data, timestamp=None):
+    """Build a topScores entry from a leaderboard document"""
+    return {
+        'scoreId': score_id,
+        'userId': score_data.get('userId'),
+        'userName': score_data.get('userName'),
+        'score': get_score_value(score_data),
+        'timeElapsed': score_data.get('timeElapsed', 0),
+        'timestamp': timestamp if timestamp is not None else score_data.get('timestamp'),
+    }
+
+
+def merge_top_scores(top_scores, entries):
+    """
+    Merge new entries into a top-scores list, ordered like the leaderboard
+    query: score, then document id, both descending
+    """
+    merged = list({entry['scoreId']: entry for entry in list(top_scores) + list(entries)}.values())
+    merged.sort(key=lambda entry: (entry['score'], entry['scoreId']), reverse=True)
+    return merged[:settings.LEADERBOARD_SUMMARY_SIZE]
+
+
+def build_summary(challenge_id, top_scores, score_count):
+    """Build a summary document from its top scores"""
+    best = top_scores[0] if top_scores else None
+    return {
+        'challengeId': challenge_id,
+        'highScore': best['score'] if best else None,
+        'highScorePlayer': get_player_name(best) if best else None,
+        'scoreCount': score_count,
+        'topScores': top_scores,
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }
+
+
+def get_summary_ref(db, challenge_id):
+    """Get the summary document reference of a challenge"""
+    return db.collection(SUMMARY_COLLECTION).document(challenge_id)
+
+
+def _summary_chunks(challenge_ids):
+    size = settings.FIRESTORE_BATCH_GET_SIZE
+    return [challenge_ids[i:i + size] for i in range(0, len(challenge_ids), size)]
+
+
+def get_summaries(db, challenge_ids):
+    """
+    Read the summaries of many challenges with batched reads of
+    settings.FIRESTORE_BATCH_GET_SIZE documents, issued concurrently.
+    Returns {challenge_id: summary or None if it does not exist}; challenges
+    whose read failed or timed out are left out
+    """
+    def read_summaries(chunk):
+        refs = [get_summary_ref(db, challenge_id) for challenge_id in chunk]
+        return firestore_calls.get_all(db, refs, 'summaries', timeout=settings.FIRESTORE_CALL_TIMEOUT)
+
+    summaries = {}
+    for docs in fan_out(read_summaries, _summary_chunks(challenge_ids)):
+        for doc in docs or []:
+            summaries[doc.id] = doc.to_dict() if doc.exists else None
+    return summaries
+
+
+async def get_summaries_async(db, challenge_ids):
+    """get_summaries for the AsyncClient"""
+    async def read_summaries(chunk):
+        refs = [get_summary_ref(db, challenge_id) for challenge_id in chunk]
+        return await firestore_calls.aget_all(db, refs, 'summaries', timeout=settings.FIRESTORE_CALL_TIMEOUT)
+
+    summaries = {}
+    for docs in await fan_out_async(read_summaries, _summary_chunks(challenge_ids)):
+        for doc in docs or []:
+            summaries[doc.id] = doc.to_dict() if doc.exists else None
+    return summaries
+
+
+def _apply_to_summary(transaction, db, challenge_id, entries):
+    """
+    Merge topScores entries into a challenge summary inside a transaction.
+    Returns True if one of the entries is a new high score.
+
+    A challenge without a summary (no score since summaries were introduced)
+    is left without one: seeding it would read every leaderboard document of
+    the challenge inside the transaction. Readers fall back to leaderboard
+    queries until rebuild_summaries creates it, and its entries count as a
+    possible new high score
+    """
+    summary_ref = get_summary_ref(db, challenge_id)
+    summary_doc = firestore_calls.get(summary_ref, 'summary', transaction=transaction)
+    if not summary_doc.exists:
+        record_fallback('summary_missing')
+        return True
+
+    summary = summary_doc.to_dict()
+    previous_high = summary.get('highScore')
+    top_scores = merge_top_scores(summary['topScores'], entries)
+    transaction.set(summary_ref, build_summary(challenge_id, top_scores, summary['scoreCount'] + len(entries)))
+
+    best = max(entry['score'] for entry in entries)
+    return previous_high is None or best > previous_high
+
+
+@firestore.transactional
+def _add_score(transaction, db, score_ref, score_data, idempotent):
+    if idempotent and firestore_calls.get(score_ref, 'score', transaction=transaction).exists:
+        return False, False
+
+    entry = summary_entry(score_ref.id, score_data, datetime.now(timezone.utc))
+    is_high_score = _apply_to_summary(transaction, db, score_data['challengeId'], [entry])
+    transaction.set(score_ref, score_data)
+    return True, is_high_score
+
+
+def add_score(db, score_data, idempotency_key=None):
+    """
+    Add a score to the leaderboard and update its challenge summary in one
+    transaction. With an idempotency key, a retried submission is not added
+    again. Returns (created, is_high_score)
+    """
+    leaderboard_ref = db.collection('leaderboard')
+    if idempotency_key:
+        score_ref = leaderboard_ref.document(score_document_id(score_data['userId'], idempotency_key))
+    else:
+        score_ref = leaderboard_ref.document()
+    with store_call('add_score'):
+        return _add_score(db.transaction(), db, score_ref, score_data, bool(idempotency_key))
+
+
+async def _apply_to_summary_async(transaction, db, challenge_id, entries):
+    """_apply_to_summary for the AsyncClient"""
+    summary_ref = get_summary_ref(db, challenge_id)
+    summary_doc = await firestore_calls.aget(summary_ref, 'summary', transaction=transaction)
+    if not summary_doc.exists:
+        record_fallback('summary_missing')
+        return True
+
+    summary = summary_doc.to_dict()
+    previous_high = summary.get('highScore')
+    top_scores = merge_top_scores(summary['topScores'], entries)
+    transaction.set(summary_ref, build_summary(challenge_id, top_scores, summary['scoreCount'] + len(entries)))
+
+    best = max(entry['score'] for entry in entries)
+    return previous_high is None or best > previous_high
+
+
+@firestore.async_transactional
+async def _add_score_async(transaction, db, score_ref, score_data, idempotent):
+    if idempotent and (await firestore_calls.aget(score_ref, 'score', transaction=transaction)).exists:
+        return False, False
+
+    entry = summary_entry(score_ref.id, score_data, datetime.now(timezone.utc))
+    is_high_score = await _apply_to_summary_async(transaction, db, score_data['challengeId'], [entry])
+    transaction.set(score_ref, score_data)
+    return True, is_high_score
+
+
+async def add_score_async(db, score_data, idempotency_key=None):
+    """add_score for the AsyncClient"""
+    leaderboard_ref = db.collection('leaderboard')
+    if idempotency_key:
+        score_ref = leaderboard_ref.document(score_document_id(score_data['userId'], idempotency_key))
+    else:
+        score_ref = leaderboard_ref.document()
+    with store_call('add_score'):
+        return await _add_score_async(db.transaction(), db, score_ref, score_data, bool(idempotency_key))
+
+
+@firestore.transactional
+def _add_to_summary(transaction, db, challenge_id, entries):
+    return _apply_to_summary(transaction, db, challenge_id, entries)
+
+
+def add_to_summary(db, challenge_id, entries):
+    """
+    Merge the topScores entries of already written leaderboard documents into
+    a challenge summary. Returns True if one of them is a new high score
+    """
+    with store_call('add_to_summary'):
+        return _add_to_summary(db.transaction(), db, challenge_id, entries)
+
+
+def _summarize_scores(db, challenge_id):
+    """Build a summary from all leaderboard entries of a challenge"""
+    scores_query = db.collection('leaderboard').where('challengeId', '==', challenge_id)
+    scores_docs = firestore_calls.stream(scores_query, 'summary_scan')
+    entries = [summary_entry(doc.id, doc.to_dict()) for doc in scores_docs]
+    return build_summary(challenge_id, merge_top_scores([], entries), len(entries))
+
+
+def rebuild_summary(db, challenge_id):
+    """Recompute and store a challenge summary from its leaderboard entries"""
+    summary = _summarize_scores(db, challenge_id)
+    get_summary_ref(db, challenge_id).set(summary)
+    return summary
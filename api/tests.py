@@ -1,3 +1,951 @@
-from django.test import TestCase
+"""
+API tests, run on the 'database' storage backend: `python manage.py test api`
+"""
+import gzip
+import importlib
+import io
+import itertools
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import answers, cache, http_cache, storage
+from .models import Challenge, Score
+from .score_buffer import MAX_FLUSH_ATTEMPTS, ScoreWriteBuffer
+from .solver_service import canonical_grid, decode_grid, encode_grid, get_dictionary_index
+from .storage import get_storage, score_document_id
+
+# On sys.path through api.solver_service
+import boggle_cache  # noqa: E402
+from boggle_boards import roll_dice  # noqa: E402
+from boggle_cache import SolveCache  # noqa: E402
+from boggle_grid import grid_symmetries  # noqa: E402
+from boggle_index import DictionaryIndex, _JsonStream, iter_wordlist  # noqa: E402
+from boggle_solver import Boggle, board_word_filters, map_paths, neighbour_table  # noqa: E402
+
+GRID = [['C', 'A', 'T'], ['S', 'E', 'R'], ['Qu', 'I', 'T']]
+SOLUTIONS = ['ACE', 'ACT', 'CAT', 'EAT', 'SEA', 'TEA']
+
+
+def make_challenge(number=1, solutions=SOLUTIONS):
+    return {
+        'id': f'challenge-{number}',
+        'name': f'Challenge {number}',
+        'size': 3,
+        'difficulty': 'medium',
+        'grid': GRID,
+        'solutions': solutions,
+    }
+
+
+def make_score(score, user='user-1', challenge_id='challenge-1', **fields):
+    """A leaderboard document as built by views._build_score_data"""
+    return {
+        'challengeId': challenge_id,
+        'challengeName': 'Challenge 1',
+        'userId': user,
+        'userName': user.title(),
+        'userEmail': '',
+        'userPhotoURL': None,
+        'score': score,
+        'foundWordsCount': score,
+        'totalWords': len(SOLUTIONS),
+        'timeElapsed': 30,
+        **fields,
+    }
+
+
+def score_request(user='user-1', **fields):
+    """The body of a score submission for challenge-1; fields set to None are left out"""
+    data = {'challengeId': 'challenge-1', 'userId': user, 'userName': user.title(), 'words': ['cat', 'act'], **fields}
+    return {key: value for key, value in data.items() if value is not None}
+
+
+@override_settings(API_STORAGE_BACKEND='database', CHALLENGE_LIST_CACHE={'BACKEND': 'local', 'TTL': 60})
+class DatabaseTestCase(TestCase):
+    """Runs with fresh database storage, challenge list cache and solution sets"""
+
+    def setUp(self):
+        self._reset()
+        self.addCleanup(self._reset)
+        get_storage().save_challenges([make_challenge()])
+        self.client = APIClient()
+
+    @staticmethod
+    def _reset():
+        storage._storage = None
+        cache._cache = None
+        answers._solution_sets = None
+
+
+class DatabaseStorageTests(DatabaseTestCase):
+
+    def test_add_score_with_idempotency_key_is_added_once(self):
+        self.assertEqual(get_storage().add_score(make_score(3), 'key-1'), (True, True))
+        self.assertEqual(get_storage().add_score(make_score(3), 'key-1'), (False, False))
+        self.assertEqual(Score.objects.count(), 1)
+        self.assertEqual(Score.objects.get().id, score_document_id('user-1', 'key-1'))
+
+    def test_same_idempotency_key_of_another_user_is_a_new_score(self):
+        get_storage().add_score(make_score(3), 'key-1')
+        created, _ = get_storage().add_score(make_score(2, user='user-2'), 'key-1')
+        self.assertTrue(created)
+        self.assertEqual(Score.objects.count(), 2)
+
+    def test_add_score_high_score_flag(self):
+        store = get_storage()
+        self.assertTrue(store.add_score(make_score(3))[1])
+        self.assertFalse(store.add_score(make_score(2))[1])
+        self.assertFalse(store.add_score(make_score(3))[1])
+        self.assertTrue(store.add_score(make_score(4))[1])
+        self.assertTrue(store.add_score(make_score(1, challenge_id='challenge-2'))[1])
+
+    def test_add_scores_skips_existing_ids(self):
+        store = get_storage()
+        self.assertEqual(store.add_scores([('a', make_score(2)), ('b', make_score(1))]), (2, True))
+        self.assertEqual(store.add_scores([('a', make_score(5)), ('c', make_score(1))]), (1, False))
+        self.assertEqual(store.add_scores([('a', make_score(5))]), (0, False))
+        self.assertEqual(Score.objects.count(), 3)
+        self.assertEqual(Score.objects.get(pk='a').score, 2)
+
+    def test_leaderboard_pages_follow_keyset_cursors(self):
+        store = get_storage()
+        scores = [5, 3, 3, 3, 1, 0, 3]
+        store.add_scores([(f'score-{i}', make_score(score, user=f'user-{i}')) for i, score in enumerate(scores)])
+        expected = sorted(((score, f'score-{i}') for i, score in enumerate(scores)), reverse=True)
+
+        pages = []
+        cursor = None
+        while True:
+            entries, has_more = store.get_leaderboard('challenge-1', 2, cursor)
+            pages.append([(entry['score'], entry['id']) for entry in entries])
+            if not has_more:
+                break
+            cursor = (entries[-1]['score'], entries[-1]['id'])
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual([item for page in pages for item in page], expected)
+
+    def test_leaderboard_entries_are_public(self):
+        get_storage().add_score(make_score(3, userEmail='player@example.com'))
+        entries, has_more = get_storage().get_leaderboard('challenge-1', 10)
+        self.assertFalse(has_more)
+        self.assertEqual(set(entries[0]), {'id', 'userId', 'userName', 'score', 'timeElapsed', 'timestamp'})
+
+    def test_list_challenges_has_high_scores(self):
+        store = get_storage()
+        store.save_challenges([make_challenge(2), make_challenge(10)])
+        store.add_score(make_score(2, user='ann'))
+        store.add_score(make_score(4, user='bob'))
+
+        challenges = store.list_challenges()
+        self.assertEqual([c['id'] for c in challenges], ['challenge-1', 'challenge-2', 'challenge-10'])
+        self.assertEqual((challenges[0]['highScore'], challenges[0]['highScorePlayer']), (4, 'Bob'))
+        self.assertEqual((challenges[1]['highScore'], challenges[1]['highScorePlayer']), (None, None))
+        self.assertEqual(challenges[0]['grid'], GRID)
+
+    def test_save_challenges_replaces_existing_ones(self):
+        get_storage().save_challenges([make_challenge(solutions=['CAT'])])
+        self.assertEqual(get_storage().get_challenge('challenge-1')['solutions'], ['CAT'])
+        self.assertIsNone(get_storage().get_challenge('challenge-2'))
+
+
+class DatabaseViewTests(DatabaseTestCase):
+
+    def test_list_challenges(self):
+        response = self.client.get('/api/challenges/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([challenge['id'] for challenge in json.loads(response.content)], ['challenge-1'])
+
+    def test_get_challenge(self):
+        response = self.client.get('/api/challenges/challenge-1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['name'], response.json()['grid']), ('Challenge 1', GRID))
+
+    def test_get_missing_challenge_is_404(self):
+        self.assertEqual(self.client.get('/api/challenges/challenge-9/').status_code, 404)
+
+    def test_submitted_scores_are_on_the_leaderboard(self):
+        self.assertEqual(self.client.post('/api/scores/', score_request('user-1'), format='json').status_code, 201)
+        self.client.post('/api/scores/', score_request('user-2', score=3, words=['cat', 'act', 'tea']), format='json')
+
+        response = self.client.get('/api/leaderboard/challenge-1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(entry['userName'], entry['score']) for entry in response.json()], [('User-2', 3), ('User-1', 2)])
+        self.assertEqual(Score.objects.get(user_id='user-1').challenge_id, 'challenge-1')
+
+
+def baseline_solution(grid, words):
+    """
+    The solver before the compiled index (recursive search over sets of
+    words and prefixes), as the reference for the current one
+    """
+    dict_set = {word.upper() for word in words}
+    prefixes = {word[:i] for word in dict_set for i in range(1, len(word) + 1)}
+    rows, cols = len(grid), len(grid[0])
+    solutions = set()
+
+    def dfs(row, col, visited, current_word):
+        if current_word not in prefixes:
+            return
+        if len(current_word) >= 3 and current_word in dict_set:
+            solutions.add(current_word)
+        for dr in (-1, 0, 1):
+            for dc in (-1, 0, 1):
+                r, c = row + dr, col + dc
+                if 0 <= r < rows and 0 <= c < cols and (r, c) not in visited:
+                    dfs(r, c, visited | {(r, c)}, current_word + grid[r][c].upper())
+
+    for r in range(rows):
+        for c in range(cols):
+            dfs(r, c, {(r, c)}, grid[r][c].upper())
+    return solutions
+
+
+class DictionaryIndexTests(SimpleTestCase):
+    words = ['cat', 'Cats', 'act', 'CAT', 'at', 'tea', 'seat', 'quit', 'quite', 'tire', 'rite', 'dog']
+
+    def test_contains_the_words(self):
+        index = DictionaryIndex.from_words(self.words)
+        self.assertEqual(len(index), 11)
+        for word in ['CAT', 'cats', 'AT', 'quite']:
+            self.assertIn(word, index)
+        for word in ['CA', 'CATSS', 'DOGS', '', 'caf\u00e9']:
+            self.assertNotIn(word, index)
+
+    def test_version_identifies_the_word_set(self):
+        self.assertEqual(DictionaryIndex.from_words(['cat', 'act']).version, DictionaryIndex.from_words(['ACT', 'cat', 'act']).version)
+        self.assertNotEqual(DictionaryIndex.from_words(['cat', 'act']).version, DictionaryIndex.from_words(['cat']).version)
+
+    def test_saved_index_is_loaded_memory_mapped(self):
+        index = DictionaryIndex.from_words(self.words)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'words.dawg'
+            index.save(path)
+            loaded = DictionaryIndex.load(path)
+            try:
+                self.assertEqual((loaded.version, len(loaded)), (index.version, len(index)))
+                self.assertEqual(Boggle(GRID, loaded).getSolution(sort=True), Boggle(GRID, index).getSolution(sort=True))
+            finally:
+                loaded.close()
+
+    def test_solutions_match_the_baseline_solver(self):
+        expected = baseline_solution(GRID, self.words)
+        self.assertEqual(expected, {'CAT', 'QUIT', 'QUITE', 'RITE', 'SEAT', 'TEA', 'TIRE'})
+        self.assertEqual(set(Boggle(GRID, self.words).getSolution()), expected)
+        self.assertEqual(set(Boggle(GRID, DictionaryIndex.from_words(self.words)).getSolution()), expected)
+
+
+    def test_word_list_is_compiled_for_the_board_until_another_is_solved(self):
+        solver = Boggle(GRID, self.words + ['zebra', 'dogs'])
+        self.assertEqual(solver.getSolution(sort=True), ['CAT', 'QUIT', 'QUITE', 'RITE', 'SEAT', 'TEA', 'TIRE'])
+        self.assertNotIn('DOG', solver._get_index())
+
+        # A rotated board has the same letters and shares the small index
+        solver.setGrid([list(row) for row in zip(*GRID[::-1])])
+        self.assertEqual(len(solver.getSolution()), 7)
+        self.assertIsNone(solver._index)
+
+        solver.setGrid([['D', 'O'], ['G', 'S']])
+        self.assertEqual(solver.getSolution(sort=True), ['DOG', 'DOGS'])
+        self.assertEqual(len(solver._index), 13)
+
+class SolveViewTests(SimpleTestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_solve(self):
+        response = self.client.post('/api/solve/', {'grid': GRID}, format='json')
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertIn('CAT', result['words'])
+        self.assertEqual(result['words'], sorted(result['words']))
+        self.assertEqual(result['scores']['CAT'], 1)
+        self.assertEqual(result['totalScore'], sum(result['scores'].values()))
+
+    def test_invalid_solve_requests_are_400(self):
+        max_size = settings.BOGGLE_MAX_GRID_SIZE
+        for body in [[['A']], 'CAT', {}, {'grid': []}, {'grid': [['A', 'B'], ['C']]}, {'grid': [['ABC']]},
+                     {'grid': [['A', 1]]}, {'grid': [['A'] * (max_size + 1)]}]:
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post('/api/solve/', body, format='json').status_code, 400)
+
+
+class SolverTests(SimpleTestCase):
+
+    def test_neighbour_table(self):
+        table = neighbour_table(3, 4)
+        self.assertEqual(table[0], (1, 4, 5))
+        self.assertEqual(table[5], (0, 1, 2, 4, 6, 8, 9, 10))
+        self.assertEqual(table[11], (6, 7, 10))
+
+    def test_solutions_match_the_baseline_solver(self):
+        index = get_dictionary_index()
+        rng = random.Random(20)
+        for size in [4, 4, 4, 5, 5, 6]:
+            grid = roll_dice(size, rng)
+            with self.subTest(grid=encode_grid(grid)):
+                # The words that could be on the board keep the baseline fast
+                words = list(iter_wordlist(settings.BOGGLE_WORDLIST_PATH, **board_word_filters(grid)))
+                expected = baseline_solution(grid, words)
+                self.assertEqual(set(Boggle(grid, index).getSolution()), expected)
+                self.assertEqual(set(Boggle(grid, words).getSolution()), expected)
+
+    def test_solver_is_reusable(self):
+        solver = Boggle(GRID, DictionaryIndexTests.words)
+        first = solver.getSolution(sort=True)
+        solver.setGrid(roll_dice(4, random.Random(1)))
+        solver.getSolution()
+        solver.setGrid(GRID)
+        self.assertEqual(solver.getSolution(sort=True), first)
+
+
+class PathAssertions:
+
+    def assertPathsSpell(self, grid, found):
+        """Check that each path of found ({word: cell indexes}) is a chain of adjacent, distinct cells spelling the word"""
+        cols = len(grid[0])
+        for word, path in found.items():
+            self.assertEqual(len(set(path)), len(path), word)
+            for a, b in zip(path, path[1:]):
+                self.assertLessEqual(max(abs(a // cols - b // cols), abs(a % cols - b % cols)), 1, word)
+            self.assertEqual(''.join(grid[cell // cols][cell % cols].upper() for cell in path), word)
+
+
+class SolutionDetailsTests(PathAssertions, SimpleTestCase):
+
+    def test_paths_spell_their_words(self):
+        grid = roll_dice(5, random.Random(3))
+        found = Boggle(grid, get_dictionary_index())._search()
+        self.assertTrue(found)
+        self.assertPathsSpell(grid, found)
+
+    def test_solution_details(self):
+        details = Boggle(GRID, DictionaryIndexTests.words).getSolutionDetails(sort=True)
+        self.assertEqual([item['word'] for item in details], ['CAT', 'QUIT', 'QUITE', 'RITE', 'SEAT', 'TEA', 'TIRE'])
+        self.assertEqual(details[0], {'word': 'CAT', 'path': [[0, 0], [0, 1], [0, 2]], 'score': 1})
+        self.assertEqual(details[2]['score'], 2)
+
+    def test_solve_view_paths(self):
+        client = APIClient()
+        result = client.post('/api/solve/', {'grid': GRID, 'paths': True}, format='json').json()
+        self.assertEqual(set(result['paths']), set(result['words']))
+        self.assertEqual(result['paths']['CAT'], [[0, 0], [0, 1], [0, 2]])
+        self.assertNotIn('paths', client.post('/api/solve/', {'grid': GRID}, format='json').json())
+
+
+class ChallengeListCacheTests(DatabaseTestCase):
+
+    def test_local_cache_expires(self):
+        local_cache = cache.LocalMemoryCache(ttl=60)
+        local_cache.set('key', 'value')
+        self.assertEqual(local_cache.get('key'), 'value')
+        with mock.patch('api.cache.time.monotonic', return_value=cache.time.monotonic() + 61):
+            self.assertIsNone(local_cache.get('key'))
+
+    def test_list_is_served_from_the_cache(self):
+        self.client.get('/api/challenges/')
+        get_storage().save_challenges([make_challenge(2)])
+        self.assertEqual(len(self.client.get('/api/challenges/').json()), 1)
+
+        cache.invalidate_challenges()
+        self.assertEqual(len(self.client.get('/api/challenges/').json()), 2)
+
+    def test_new_high_score_refreshes_the_list(self):
+        self.assertIsNone(self.client.get('/api/challenges/').json()[0]['highScore'])
+        self.client.post('/api/scores/', score_request(score=3, words=['cat', 'act', 'tea']), format='json')
+        self.assertEqual(self.client.get('/api/challenges/').json()[0]['highScore'], 3)
+
+        # A lower score keeps the cached list
+        get_storage().save_challenges([make_challenge(2)])
+        self.client.post('/api/scores/', score_request('user-2', score=1, words=['cat']), format='json')
+        self.assertEqual(len(self.client.get('/api/challenges/').json()), 1)
+
+    @override_settings(CHALLENGE_LIST_CACHE={'BACKEND': 'django', 'ALIAS': 'default', 'TTL': 60})
+    def test_django_cache_backend(self):
+        self.assertIsInstance(cache.get_challenge_cache(), cache.DjangoCache)
+        self.client.get('/api/challenges/')
+        self.assertEqual(cache.get_cached_challenges()[0][0]['id'], 'challenge-1')
+        cache.invalidate_challenges()
+        self.assertIsNone(cache.get_cached_challenges())
+
+
+class LeaderboardViewTests(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for user, words in [('user-1', ['cat']), ('user-2', ['cat', 'act', 'tea']), ('user-3', ['cat', 'act'])]:
+            self.client.post('/api/scores/', score_request(user, score=len(words), words=words), format='json')
+
+    def test_pages(self):
+        response = self.client.get('/api/leaderboard/challenge-1/?limit=2')
+        self.assertEqual([entry['score'] for entry in response.json()], [3, 2])
+        cursor = response['X-Next-Cursor']
+        self.assertEqual(cursor, f"2,{response.json()[1]['id']}")
+
+        response = self.client.get('/api/leaderboard/challenge-1/', {'limit': 2, 'after': cursor})
+        self.assertEqual([entry['userId'] for entry in response.json()], ['user-1'])
+        self.assertNotIn('X-Next-Cursor', response)
+
+    def test_entries_have_no_private_fields(self):
+        entry = self.client.get('/api/leaderboard/challenge-1/').json()[0]
+        self.assertNotIn('userEmail', entry)
+        self.assertNotIn('userPhotoURL', entry)
+
+    def test_bad_parameters_are_400(self):
+        max_size = settings.LEADERBOARD_MAX_PAGE_SIZE
+        for query in ['limit=0', f'limit={max_size + 1}', 'limit=ten', 'after=3', 'after=three,abc']:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/leaderboard/challenge-1/?{query}').status_code, 400)
+
+
+class SubmitScoreTests(DatabaseTestCase):
+
+    def test_idempotency_key(self):
+        self.assertEqual(self.client.post('/api/scores/', score_request(idempotencyKey='game-1'), format='json').status_code, 201)
+        response = self.client.post('/api/scores/', score_request(idempotencyKey='game-1'), format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'Score already submitted')
+        self.assertEqual(Score.objects.get().id, score_document_id('user-1', 'game-1'))
+
+    def test_invalid_fields_are_400(self):
+        cases = [
+            ({'challengeId': None}, 'Missing required field: challengeId'),
+            ({'userName': ''}, 'userName must be a non-empty string'),
+            ({'userId': 7}, 'userId must be a non-empty string'),
+            ({'score': True}, 'score must be a non-negative integer'),
+            ({'score': -1}, 'score must be a non-negative integer'),
+            ({'score': '2'}, 'score must be a non-negative integer'),
+            ({'totalWords': 2.5}, 'totalWords must be a non-negative integer'),
+            ({'timeElapsed': 'slow'}, 'timeElapsed must be a non-negative number'),
+        ]
+        for fields, error in cases:
+            with self.subTest(fields=fields):
+                response = self.client.post('/api/scores/', score_request(**fields), format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], error)
+        self.assertEqual(Score.objects.count(), 0)
+
+
+class BulkScoreViewTests(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.buffer = ScoreWriteBuffer(max_batch=100, flush_interval=60)
+        self.addCleanup(self.buffer.close)
+        patcher = mock.patch('api.views.get_score_buffer', return_value=self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_scores_are_queued_and_written(self):
+        scores = [score_request('user-1', idempotencyKey='k'), score_request('user-2')]
+        response = self.client.post('/api/scores/bulk/', {'scores': scores}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.json()['accepted'], response.json()['queued']), (2, 2))
+        self.assertEqual(response.json()['ids'][0], score_document_id('user-1', 'k'))
+        self.assertEqual(Score.objects.count(), 0)
+
+        self.buffer.flush()
+        self.assertEqual(Score.objects.count(), 2)
+
+        # A retried request is not written twice
+        response = self.client.post('/api/scores/bulk/', scores[:1], format='json')
+        self.assertEqual(response.status_code, 202)
+        self.buffer.flush()
+        self.assertEqual(Score.objects.count(), 2)
+
+    def test_invalid_requests_are_400(self):
+        bodies = [
+            {'scores': []},
+            {'scores': 'all'},
+            [score_request('user-1')] * (settings.SCORE_BULK_MAX_SIZE + 1),
+            [score_request('user-1'), score_request('user-2', score=-5)],
+            [score_request('user-1'), 'score'],
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                self.assertEqual(self.client.post('/api/scores/bulk/', body, format='json').status_code, 400)
+        self.assertEqual(self.buffer.pending_count(), 0)
+
+
+class FakeScoreStorage:
+    """
+    Keeps the scores of add_scores in a dict, and the threads that called
+    it. Calls fail while failures is positive, or when they include a
+    rejected id
+    """
+
+    def __init__(self, rejected=(), failures=0):
+        self.scores = {}
+        self.threads = []
+        self.rejected = set(rejected)
+        self.failures = failures
+
+    def add_scores(self, scores):
+        scores = dict(scores)
+        self.threads.append(threading.current_thread())
+        if self.failures:
+            self.failures -= 1
+            raise ValueError('unavailable')
+        if self.rejected & set(scores):
+            raise ValueError('rejected')
+        new_scores = {doc_id: data for doc_id, data in scores.items() if doc_id not in self.scores}
+        self.scores.update(new_scores)
+        return len(new_scores), bool(new_scores)
+
+
+class ScoreWriteBufferTests(SimpleTestCase):
+
+    def setUp(self):
+        self.store = FakeScoreStorage()
+        self.invalidate_challenges = mock.Mock()
+        for target, value in [('get_storage', lambda: self.store), ('invalidate_challenges', self.invalidate_challenges)]:
+            patcher = mock.patch(f'api.score_buffer.{target}', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.buffer = ScoreWriteBuffer(max_batch=3, flush_interval=60)
+        self.addCleanup(self.buffer.close)
+
+    def wait_for_scores(self, count):
+        deadline = time.monotonic() + 5
+        while len(self.store.scores) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_flush_thread_writes_full_batches(self):
+        self.assertEqual(self.buffer.add([('a', make_score(1)), ('b', make_score(2))]), 2)
+        self.assertEqual(self.store.scores, {})
+        self.assertGreater(self.buffer._flush_at, time.monotonic() + 30)
+
+        self.buffer.add([('c', make_score(3)), ('d', make_score(4))])
+        self.wait_for_scores(3)
+        self.assertEqual(sorted(self.store.scores), ['a', 'b', 'c'])
+        self.assertEqual(self.store.threads, [self.buffer._thread])
+        self.assertEqual(self.buffer.pending_count(), 1)
+
+        self.buffer.close()
+        self.assertEqual(len(self.store.scores), 4)
+        self.assertFalse(self.buffer._thread.is_alive())
+
+    def test_flush_thread_writes_after_the_interval(self):
+        self.buffer.flush_interval = 0.05
+        self.buffer.add([('a', make_score(1))])
+        self.wait_for_scores(1)
+        self.assertEqual(list(self.store.scores), ['a'])
+
+    def test_pending_ids_are_queued_once(self):
+        self.assertEqual(self.buffer.add([('a', make_score(1)), ('a', make_score(2))]), 1)
+        self.assertEqual(self.buffer.add([('a', make_score(3))]), 0)
+        self.buffer.flush()
+        self.assertEqual(self.store.scores['a']['score'], 1)
+
+    def test_new_high_score_invalidates_the_challenge_list(self):
+        self.buffer.add([('a', make_score(1))])
+        self.buffer.flush()
+        self.invalidate_challenges.assert_called_once_with()
+
+    def test_bad_score_does_not_hold_back_its_batch(self):
+        self.store.rejected = {'bad'}
+        with self.assertLogs('api.score_buffer', 'ERROR'):
+            self.buffer.add([('a', make_score(1)), ('bad', make_score(2)), ('b', make_score(3))])
+            self.buffer.flush()
+            self.assertEqual(sorted(self.store.scores), ['a', 'b'])
+            self.assertEqual(self.buffer.pending_count(), 1)
+
+            for _ in range(MAX_FLUSH_ATTEMPTS - 1):
+                self.buffer.flush()
+
+        self.assertEqual(self.buffer.pending_count(), 0)
+        self.assertEqual([doc_id for doc_id, _ in self.buffer.dead_letters], ['bad'])
+
+    def test_failed_write_is_retried(self):
+        self.store.failures = 3
+        with self.assertLogs('api.score_buffer', 'ERROR'):
+            self.buffer.add([('a', make_score(1)), ('b', make_score(2))])
+            self.buffer.flush()
+            self.assertEqual(self.buffer.pending_count(), 2)
+            self.buffer.flush()
+
+        self.assertEqual(sorted(self.store.scores), ['a', 'b'])
+        self.assertFalse(self.buffer.dead_letters)
+
+
+class AnswerValidationTests(DatabaseTestCase):
+
+    def test_solutions_are_only_sent_when_asked_for(self):
+        self.assertNotIn('solutions', json.loads(self.client.get('/api/challenges/').content)[0])
+        self.assertNotIn('solutions', self.client.get('/api/challenges/challenge-1/').json())
+
+        challenges = json.loads(self.client.get('/api/challenges/?fields=solutions').content)
+        self.assertEqual(challenges, [{'id': 'challenge-1', 'solutions': SOLUTIONS}])
+        challenge = self.client.get('/api/challenges/challenge-1/?fields=name,solutions').json()
+        self.assertEqual(challenge, {'id': 'challenge-1', 'name': 'Challenge 1', 'solutions': SOLUTIONS})
+        self.assertEqual(self.client.get('/api/challenges/challenge-1/?fields=answers').status_code, 400)
+
+    def test_check_words(self):
+        response = self.client.post('/api/challenges/challenge-1/check/', {'words': ['cat', ' dog', 'CAT', 'tea']}, format='json')
+        self.assertEqual(response.json(), {'valid': ['CAT', 'TEA'], 'invalid': ['DOG'], 'score': 2})
+
+    def test_check_words_errors(self):
+        for challenge_id, body, status in [('challenge-1', {'words': 'cat'}, 400), ('challenge-1', ['cat'], 400),
+                                           ('challenge-1', {'words': ['a'] * (settings.CHECK_WORDS_MAX_SIZE + 1)}, 400),
+                                           ('challenge-9', {'words': ['cat']}, 404)]:
+            with self.subTest(challenge_id=challenge_id, body=body):
+                response = self.client.post(f'/api/challenges/{challenge_id}/check/', body, format='json')
+                self.assertEqual(response.status_code, status)
+
+    def test_score_is_the_number_of_found_solutions(self):
+        words = ['cat', 'act', 'dog', 'CAT']
+        check = self.client.post('/api/challenges/challenge-1/check/', {'words': words}, format='json').json()
+        response = self.client.post('/api/scores/', score_request(words=words), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Deprecation', response)
+        score = Score.objects.get()
+        self.assertEqual((score.score, score.found_words_count), (check['score'], 2))
+
+    def test_claimed_score_must_match_the_words(self):
+        response = self.client.post('/api/scores/', score_request(score=3), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'score 3 does not match the 2 found words')
+        self.assertEqual(self.client.post('/api/scores/', score_request(score=2), format='json').status_code, 201)
+
+    def test_invalid_words_are_400(self):
+        for fields, error in [({'words': None}, 'Missing required field: score (or words)'),
+                              ({'words': 'cat'}, 'words must be a list'),
+                              ({'challengeId': 'challenge-9'}, 'Challenge not found')]:
+            with self.subTest(fields=fields):
+                response = self.client.post('/api/scores/', score_request(**fields), format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.json()['error'].startswith(error), response.json())
+        self.assertEqual(Score.objects.count(), 0)
+
+    def test_score_without_words_is_deprecated(self):
+        response = self.client.post('/api/scores/', score_request(score=5, words=None), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Deprecation'], 'true')
+        self.assertIn('warning', response.json())
+        self.assertEqual(Score.objects.get().score, 5)
+
+        with override_settings(SCORE_WORDS_REQUIRED=True):
+            response = self.client.post('/api/scores/', score_request('user-2', score=5, words=None), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Missing required field: words')
+
+
+class GridCodeTests(DatabaseTestCase):
+
+    def test_round_trip(self):
+        for grid, code in [(GRID, 'CATSERqIT'), ([['T', 'E'], ['qu', 'a']], 'TEqA'),
+                           ([['A', 'B', 'St']], 'ABs/'), ([['A', 'B'], ['C', 'D'], ['E', 'F']], 'AB/CD/EF')]:
+            with self.subTest(code=code):
+                self.assertEqual(encode_grid(grid), code)
+                self.assertEqual(encode_grid(decode_grid(code)), code)
+        self.assertEqual(decode_grid('TEqA'), [['T', 'E'], ['Qu', 'A']])
+
+    def test_invalid_grids_and_codes(self):
+        for grid in [[], [['A', 'B'], ['C']], [['A', '1']], [['ABC']]]:
+            with self.subTest(grid=grid), self.assertRaises(ValueError):
+                encode_grid(grid)
+        for code in ['ABC', 'AB/C', 'A?CD', '']:
+            with self.subTest(code=code), self.assertRaises(ValueError):
+                decode_grid(code)
+
+    def test_challenges_are_stored_as_grid_codes(self):
+        self.assertEqual(Challenge.objects.get().grid, 'CATSERqIT')
+        challenge = self.client.get('/api/challenges/challenge-1/').json()
+        self.assertEqual((challenge['grid'], challenge['gridCode']), (GRID, 'CATSERqIT'))
+        self.assertEqual(json.loads(self.client.get('/api/challenges/').content)[0]['gridCode'], 'CATSERqIT')
+
+    def test_solve_a_grid_code(self):
+        words = self.client.post('/api/solve/', {'grid': GRID}, format='json').json()['words']
+        self.assertEqual(self.client.post('/api/solve/', {'grid': 'CATSERqIT'}, format='json').json()['words'], words)
+        self.assertIn('SCAT', self.client.post('/api/solve/', {'grid': 'CATS'}, format='json').json()['words'])
+        self.assertEqual(self.client.post('/api/solve/', {'grid': 'CAT'}, format='json').status_code, 400)
+
+    def test_migration_codec_matches(self):
+        migration = importlib.import_module('api.migrations.0002_challenge_grid_code')
+        for grid in [GRID, [['T', 'E'], ['qu', 'a']], [['A', 'B', 'St']], [['A', 'B'], ['C', 'D'], ['E', 'F']],
+                     roll_dice(6, random.Random(3))]:
+            with self.subTest(grid=grid):
+                code = encode_grid(grid)
+                self.assertEqual(migration.encode_grid(grid), code)
+                self.assertEqual(migration.decode_grid(code), decode_grid(code))
+
+
+def transform_grid(grid, perm):
+    """Get the grid whose cell i is cell perm[i] of grid"""
+    cols = len(grid[0])
+    cells = [tile for row in grid for tile in row]
+    return [[cells[perm[row * cols + col]] for col in range(cols)] for row in range(len(grid))]
+
+
+class CanonicalGridTests(PathAssertions, SimpleTestCase):
+
+    def setUp(self):
+        self.grid = roll_dice(4, random.Random(7))
+
+    def test_symmetric_boards_share_a_canonical_code(self):
+        code, perm = canonical_grid(self.grid)
+        self.assertEqual(encode_grid(transform_grid(self.grid, perm)), code)
+        for symmetry in grid_symmetries(4, 4):
+            with self.subTest(symmetry=symmetry):
+                board = transform_grid(self.grid, symmetry)
+                board_code, board_perm = canonical_grid(board)
+                self.assertEqual(board_code, code)
+                self.assertEqual(encode_grid(transform_grid(board, board_perm)), code)
+
+    def test_rectangular_boards_have_four_symmetries(self):
+        self.assertEqual(len(grid_symmetries(3, 4)), 4)
+        self.assertEqual(len(grid_symmetries(4, 4)), 8)
+        self.assertEqual(canonical_grid([['B', 'A', 'C']])[0], canonical_grid([['C', 'A', 'B']])[0])
+
+    def test_map_paths(self):
+        self.assertEqual(map_paths({'CAT': (0, 1, 2)}, [5, 6, 7, 8]), {'CAT': (5, 6, 7)})
+
+    def test_cached_paths_are_remapped_to_each_board(self):
+        solve_cache = SolveCache(max_entries=16)
+        index = get_dictionary_index()
+        expected = Boggle(self.grid, index, solve_cache)._search()
+
+        for symmetry in grid_symmetries(4, 4):
+            with self.subTest(symmetry=symmetry):
+                board = transform_grid(self.grid, symmetry)
+                found = Boggle(board, index, solve_cache)._search()
+                self.assertEqual(set(found), set(expected))
+                self.assertPathsSpell(board, found)
+
+        stats = solve_cache.stats()
+        self.assertEqual((stats['misses'], stats['hits'], stats['entries']), (1, 8, 1))
+
+
+class SolveCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'solves.sqlite3'
+        # A distinct 'stored' time for every read and write
+        patcher = mock.patch.object(boggle_cache, 'time', mock.Mock(time=mock.Mock(side_effect=itertools.count())))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def open_cache(self, **options):
+        solve_cache = SolveCache(path=self.path, **options)
+        self.addCleanup(solve_cache.close)
+        return solve_cache
+
+    def test_results_are_shared_through_the_file(self):
+        self.open_cache().set('v1', 'CATSERqIT', {'CAT': (0, 1, 2)})
+        solve_cache = self.open_cache()
+        self.assertEqual(solve_cache.get('v1', 'CATSERqIT'), {'CAT': (0, 1, 2)})
+        self.assertIsNone(solve_cache.get('v2', 'CATSERqIT'))
+        self.assertEqual(solve_cache.get('v1', 'CATSERqIT'), {'CAT': (0, 1, 2)})
+        stats = solve_cache.stats()
+        self.assertEqual((stats['hits'], stats['diskHits'], stats['misses']), (1, 1, 1))
+
+    def test_least_recently_used_results_are_pruned(self):
+        writer = self.open_cache(max_disk_entries=10)
+        for number in range(10):
+            writer.set('v1', f'grid-{number}', {})
+        self.assertIsNotNone(self.open_cache().get('v1', 'grid-0'))
+        writer.set('v1', 'grid-10', {})
+
+        reader = self.open_cache()
+        self.assertIsNotNone(reader.get('v1', 'grid-0'))
+        self.assertIsNone(reader.get('v1', 'grid-1'))
+        self.assertIsNotNone(reader.get('v1', 'grid-10'))
+
+    def test_file_errors_are_misses_and_skipped_writes(self):
+        solve_cache = self.open_cache()
+        solve_cache._db = mock.Mock(execute=mock.Mock(side_effect=sqlite3.OperationalError('disk I/O error')))
+        self.assertIsNone(solve_cache.get('v1', 'CATSERqIT'))
+        solve_cache.set('v1', 'CATSERqIT', {'CAT': (0, 1, 2)})
+        self.assertEqual(solve_cache.get('v1', 'CATSERqIT'), {'CAT': (0, 1, 2)})
+        stats = solve_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['diskErrors']), (1, 1, 2))
+        solve_cache._db = None
+
+    def test_memory_hits_do_not_wait_for_the_file(self):
+        solve_cache = self.open_cache()
+        solve_cache.set('v1', 'CATSERqIT', {'CAT': (0, 1, 2)})
+        with solve_cache._db_lock:
+            self.assertEqual(solve_cache.get('v1', 'CATSERqIT'), {'CAT': (0, 1, 2)})
+
+
+class JsonWordListTests(SimpleTestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        # Small chunks put chunk boundaries inside strings, escapes and values
+        patcher = mock.patch.object(_JsonStream, '_CHUNK_SIZE', 5)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read(self, content, name='words.json', **filters):
+        path = self.dir / name
+        path.write_text(content, encoding='utf-8')
+        return list(iter_wordlist(path, **filters))
+
+    def test_words_object(self):
+        document = {'name': 'test', 'meta': {'words': ['NOT', 'THESE'], 'n': [1, 2.5]},
+                    'words': ['cat', 'caf\u00e9', 'say "hi"', 'back\\slash', 'tab\tbed', 'dog'],
+                    'after': None}
+        self.assertEqual(self.read(json.dumps(document)), document['words'])
+        self.assertEqual(self.read(json.dumps(document, indent=3, ensure_ascii=False)), document['words'])
+
+    def test_bare_list_skips_other_values(self):
+        self.assertEqual(self.read('[ "cat" ,1, {"a": "b"}, null ,"dog"\n]'), ['cat', 'dog'])
+
+    def test_empty_documents(self):
+        self.assertEqual(self.read('[]'), [])
+        self.assertEqual(self.read(' { } '), [])
+        self.assertEqual(self.read('{"words": []}'), [])
+
+    def test_matches_the_json_module(self):
+        path = settings.BOGGLE_WORDLIST_PATH
+        with mock.patch.object(_JsonStream, '_CHUNK_SIZE', 1 << 16):
+            streamed = list(iter_wordlist(path))
+        with open(path, encoding='utf-8') as f:
+            document = json.load(f)
+        words = document['words'] if isinstance(document, dict) else document
+        self.assertEqual(streamed, [word for word in words if isinstance(word, str)])
+
+    def test_invalid_documents_raise(self):
+        for content in ['{"words": ["cat" "dog"]}', '["cat", "dog"', '{"words" ["cat"]}']:
+            with self.subTest(content=content), self.assertRaises(ValueError):
+                self.read(content)
+
+    def test_filters(self):
+        words = ['at', 'cat', 'cats', 'dog', 'Tact', 'scattered']
+        self.assertEqual(self.read(json.dumps(words), min_length=3, max_length=4, letters='CATS'), ['cat', 'cats', 'Tact'])
+
+    def test_text_word_list(self):
+        self.assertEqual(self.read('cat\n\n  dog  \n', name='words.txt'), ['cat', 'dog'])
+
+    def test_index_from_a_streamed_word_list(self):
+        path = self.dir / 'words.json'
+        path.write_text(json.dumps({'words': ['tea', 'cat', 'act', 'cat']}), encoding='utf-8')
+        index = DictionaryIndex.from_wordlist(path)
+        self.assertEqual(len(index), 3)
+        self.assertIn('CAT', index)
+        self.assertNotIn('DOG', index)
+
+    def test_values_across_chunks(self):
+        stream = _JsonStream(io.StringIO('[12345678, "abcdefgh", [1, [2]], "x"]'))
+        self.assertEqual(list(stream.items()), [12345678, 'abcdefgh', [1, [2]], 'x'])
+
+
+class LargeBoardTests(SimpleTestCase):
+
+    def test_large_boards_match_the_baseline_solver(self):
+        words = ['TEA', 'TEAS', 'EATS', 'SEAT', 'SEATS', 'STATE', 'TASTE', 'ESTATES', 'TATTLE']
+        rng = random.Random(12)
+        for size in [8, 12]:
+            grid = [[rng.choice('TEAS') for _ in range(size)] for _ in range(size)]
+            with self.subTest(size=size):
+                expected = baseline_solution(grid, words)
+                self.assertTrue(expected)
+                self.assertEqual(set(Boggle(grid, words).getSolution()), expected)
+
+    def test_solve_a_12x12_board(self):
+        grid = roll_dice(12, random.Random(5))
+        result = APIClient().post('/api/solve/', {'grid': grid}, format='json').json()
+        self.assertEqual(set(result['words']), set(Boggle(grid, get_dictionary_index()).getSolution()))
+        self.assertGreater(len(result['words']), 100)
+
+
+class ConditionalRequestTests(DatabaseTestCase):
+
+    def test_challenge_list(self):
+        response = self.client.get('/api/challenges/')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.SCORES_MAX_AGE}')
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get('/api/challenges/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        response = self.client.get('/api/challenges/', headers={'If-None-Match': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_challenge_list_changes_with_a_new_high_score(self):
+        etag = self.client.get('/api/challenges/')['ETag']
+        self.client.post('/api/scores/', score_request(), format='json')
+        response = self.client.get('/api/challenges/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_challenge(self):
+        response = self.client.get('/api/challenges/challenge-1/')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={settings.CHALLENGE_MAX_AGE}')
+        response = self.client.get('/api/challenges/challenge-1/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_leaderboard(self):
+        self.client.post('/api/scores/', score_request(), format='json')
+        response = self.client.get('/api/leaderboard/challenge-1/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/leaderboard/challenge-1/', headers={'If-None-Match': etag}).status_code, 304)
+
+        # A new score changes the ETag
+        self.client.post('/api/scores/', score_request('user-2'), format='json')
+        self.assertEqual(self.client.get('/api/leaderboard/challenge-1/', headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_etags_are_strong_hashes_of_the_data(self):
+        first = self.client.get('/api/challenges/challenge-1/')['ETag']
+        self.assertTrue(first.startswith('"') and first.endswith('"'))
+        cache.invalidate_challenges()
+        self.assertEqual(self.client.get('/api/challenges/challenge-1/')['ETag'], first)
+
+
+class ChallengeListPayloadTests(DatabaseTestCase):
+
+    def test_fields(self):
+        response = self.client.get('/api/challenges/?fields=name,highScore')
+        self.assertEqual(json.loads(response.content), [{'id': 'challenge-1', 'name': 'Challenge 1', 'highScore': None}])
+
+    def test_unknown_field_is_400(self):
+        response = self.client.get('/api/challenges/?fields=name,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Unknown fields: password'})
+
+    def test_gzip(self):
+        response = self.client.get('/api/challenges/?fields=name', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content))[0]['name'], 'Challenge 1')
+
+    def test_each_variant_has_its_own_etag(self):
+        etags = {self.client.get(f'/api/challenges/{query}', headers=headers)['ETag']
+                 for query in ['', '?fields=name'] for headers in [{}, {'Accept-Encoding': 'gzip'}]}
+        self.assertEqual(len(etags), 4)
+
+        response = self.client.get('/api/challenges/?fields=name', headers={'Accept-Encoding': 'gzip'})
+        response = self.client.get('/api/challenges/?fields=name',
+                                   headers={'Accept-Encoding': 'gzip', 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_bodies_are_built_once_per_list_version(self):
+        challenges, etag, _ = cache.cache_challenges(get_storage().list_challenges())
+        body = cache.challenge_list_payload(challenges, etag, ('id',), 'gzip')
+        self.assertIs(cache.challenge_list_payload(challenges, etag, ('id',), 'gzip'), body)
+        self.assertEqual(json.loads(gzip.decompress(body)), [{'id': 'challenge-1'}])
+
+    def test_choose_encoding(self):
+        preferred = http_cache.ENCODINGS[0]
+        for accept, encoding in [('', None), ('gzip', 'gzip'), ('gzip;q=0', None), ('identity', None),
+                                 ('*', preferred), ('br, gzip', preferred), ('GZIP;q=0.5, *;q=0', 'gzip')]:
+            with self.subTest(accept=accept):
+                request = mock.Mock(headers={'Accept-Encoding': accept})
+                self.assertEqual(http_cache.choose_encoding(request), encoding)
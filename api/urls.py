@@ -1,13 +1,24 @@
 """
 URL configuration for API app
 """
+from django.conf import settings
 from django.urls import path
 from . import views
 
+# Firestore-bound views: async versions under an ASGI server
+if settings.API_ASYNC_VIEWS:
+    from . import async_views as firestore_views
+else:
+    firestore_views = views
+
 urlpatterns = [
-    path('challenges/', views.list_challenges, name='list_challenges'),
-    path('challenges/<str:challenge_id>/', views.get_challenge, name='get_challenge'),
-    path('leaderboard/<str:challenge_id>/', views.get_leaderboard, name='get_leaderboard'),
-    path('scores/', views.submit_score, name='submit_score'),
+    path('challenges/', firestore_views.list_challenges, name='list_challenges'),
+    path('challenges/<str:challenge_id>/', firestore_views.get_challenge, name='get_challenge'),
+    path('challenges/<str:challenge_id>/check/', views.check_challenge_words, name='check_challenge_words'),
+    path('leaderboard/<str:challenge_id>/', firestore_views.get_leaderboard, name='get_leaderboard'),
+    path('scores/', firestore_views.submit_score, name='submit_score'),
+    path('scores/bulk/', views.submit_scores_bulk, name='submit_scores_bulk'),
+    path('solve/', views.solve, name='solve'),
+    path('metrics/', views.metrics_endpoint, name='metrics'),
 ]
 
@@ -1,203 +1,380 @@
 """
 API views for Boggle challenges and leaderboard
 """
+import hmac
+import math
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .firebase_service import get_firestore_db
-from firebase_admin import firestore
+from . import metrics, solver_service
+from .answers import check_words, get_solution_set
+from .cache import cache_challenges, challenge_list_payload, get_cached_challenges, invalidate_challenges
+from .http_cache import choose_encoding, conditional_response, data_etag, variant_etag
+from .score_buffer import get_score_buffer
+from .storage import get_storage, score_document_id
+
+# Fields of the challenges in /api/challenges/ (see storage.challenge_response)
+CHALLENGE_FIELDS = ('id', 'name', 'size', 'difficulty', 'grid', 'gridCode', 'solutions', 'highScore', 'highScorePlayer')
+
+# Fields sent without ?fields=: the solutions are only sent when asked for,
+# as they are the answers the submitted words are checked against
+DEFAULT_CHALLENGE_FIELDS = tuple(field for field in CHALLENGE_FIELDS if field != 'solutions')
+
+def _parse_challenge_fields(query_params):
+    """
+    Get the challenge fields requested with ?fields=a,b as a tuple (id is
+    always included), or DEFAULT_CHALLENGE_FIELDS; raises ValueError
+    """
+    fields = query_params.get('fields')
+    if not fields:
+        return DEFAULT_CHALLENGE_FIELDS
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested - set(CHALLENGE_FIELDS)
+    if unknown:
+        raise ValueError(f'Unknown fields: {", ".join(sorted(unknown))}')
+    requested.add('id')
+    return tuple(field for field in CHALLENGE_FIELDS if field in requested)
+
+def _project_challenge(challenge, fields):
+    """Get the given fields of a challenge"""
+    return {field: challenge[field] for field in fields if field in challenge}
+
+def _challenge_list_response(request, cached, fields):
+    """
+    Serve a cached (challenges, etag, last_modified) challenge list as a
+    pre-serialized body, compressed when the client accepts it
+    """
+    challenges, etag, last_modified = cached
+    encoding = choose_encoding(request)
+    
+    def build_response():
+        body = challenge_list_payload(challenges, etag, fields, encoding)
+        response = HttpResponse(body, content_type='application/json', status=status.HTTP_200_OK)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        return response
+    
+    response = conditional_response(request, build_response, variant_etag(etag, '.'.join(fields or ()), encoding),
+                                    settings.SCORES_MAX_AGE, last_modified)
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
 
 @api_view(['GET'])
 def list_challenges(request):
-    """Get list of all challenges with high scores"""
+    """
+    Get list of all challenges with high scores
+
+    ?fields=id,name,highScore returns only those fields (e.g. without the
+    grids, for the lobby). The solutions are only included when listed
+    """
     try:
-        db = get_firestore_db()
-        challenges_ref = db.collection('challenges')
-        challenges = []
+        try:
+            fields = _parse_challenge_fields(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        for doc in challenges_ref.stream():
-            challenge_data = doc.to_dict()
-            challenge_id = doc.id
-            
-            # Get high score for this challenge
-            high_score = None
-            high_score_player = None
-            
-            try:
-                leaderboard_ref = db.collection('leaderboard')
-                # Try to get high score
-                high_score_query = leaderboard_ref.where('challengeId', '==', challenge_id).order_by('score', direction=firestore.Query.DESCENDING).limit(1)
-                high_score_docs = list(high_score_query.stream())
-                
-                if high_score_docs:
-                    score_data = high_score_docs[0].to_dict()
-                    high_score = score_data.get('score') or score_data.get('foundWordsCount')
-                    high_score_player = score_data.get('userName') or score_data.get('userEmail', 'Unknown')
-            except Exception as e:
-                # If query fails, try without order_by
-                try:
-                    all_scores_query = leaderboard_ref.where('challengeId', '==', challenge_id)
-                    all_scores = list(all_scores_query.stream())
-                    
-                    if all_scores:
-                        max_score = -1
-                        best_score_data = None
-                        for score_doc in all_scores:
-                            score_data = score_doc.to_dict()
-                            score_value = score_data.get('score') or score_data.get('foundWordsCount', 0)
-                            if score_value > max_score:
-                                max_score = score_value
-                                best_score_data = score_data
-                        
-                        if max_score >= 0 and best_score_data:
-                            high_score = max_score
-                            high_score_player = best_score_data.get('userName') or best_score_data.get('userEmail', 'Unknown')
-                except:
-                    pass
-            
-            # Convert grid object to 2D array
-            grid = challenge_data.get('grid', {})
-            if isinstance(grid, dict):
-                grid_array = []
-                sorted_keys = sorted(grid.keys(), key=lambda x: int(x))
-                for key in sorted_keys:
-                    grid_array.append(grid[key])
-            else:
-                grid_array = grid
-            
-            challenges.append({
-                'id': challenge_id,
-                'name': challenge_data.get('name', challenge_id),
-                'size': challenge_data.get('size', 4),
-                'difficulty': challenge_data.get('difficulty', 'medium'),
-                'grid': grid_array,
-                'solutions': challenge_data.get('solutions', []),
-                'highScore': high_score,
-                'highScorePlayer': high_score_player,
-            })
-        
-        # Sort by challenge number
-        challenges.sort(key=lambda x: int(x['id'].replace('challenge-', '').replace('challenge', '0') or '0'))
-        
-        return Response(challenges, status=status.HTTP_200_OK)
+        cached = get_cached_challenges()
+        if cached is None:
+            cached = cache_challenges(get_storage().list_challenges())
+        
+        return _challenge_list_response(request, cached, fields)
     
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
 def get_challenge(request, challenge_id):
-    """Get a specific challenge by ID"""
+    """Get a specific challenge by ID (takes ?fields= like list_challenges)"""
     try:
-        db = get_firestore_db()
-        challenge_doc = db.collection('challenges').document(challenge_id).get()
+        try:
+            fields = _parse_challenge_fields(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        if not challenge_doc.exists:
+        challenge = get_storage().get_challenge(challenge_id)
+        
+        if challenge is None:
             return Response({'error': 'Challenge not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        challenge_data = challenge_doc.to_dict()
-        
-        # Convert grid object to 2D array
-        grid = challenge_data.get('grid', {})
-        if isinstance(grid, dict):
-            grid_array = []
-            sorted_keys = sorted(grid.keys(), key=lambda x: int(x))
-            for key in sorted_keys:
-                grid_array.append(grid[key])
-        else:
-            grid_array = grid
-        
-        return Response({
-            'id': challenge_id,
-            'name': challenge_data.get('name', challenge_id),
-            'size': challenge_data.get('size', 4),
-            'difficulty': challenge_data.get('difficulty', 'medium'),
-            'grid': grid_array,
-            'solutions': challenge_data.get('solutions', []),
-        }, status=status.HTTP_200_OK)
+        challenge = _project_challenge(challenge, fields)
+        return conditional_response(request, lambda: Response(challenge, status=status.HTTP_200_OK),
+                                    data_etag(challenge), settings.CHALLENGE_MAX_AGE)
     
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+def check_challenge_words(request, challenge_id):
+    """
+    Check words against the stored solutions of a challenge
+
+    Body: {"words": [...]}. Returns the valid and invalid words and the
+    score they would get on the leaderboard (see check_words)
+    """
+    try:
+        words = request.data.get('words') if isinstance(request.data, dict) else None
+        if not isinstance(words, list):
+            return Response({'error': 'words must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(words) > settings.CHECK_WORDS_MAX_SIZE:
+            return Response({'error': f'At most {settings.CHECK_WORDS_MAX_SIZE} words per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        solutions = get_solution_set(challenge_id)
+        if solutions is None:
+            return Response({'error': 'Challenge not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response(check_words(solutions, words), status=status.HTTP_200_OK)
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# Sent with the responses to scores submitted without their words
+SCORE_WITHOUT_WORDS_WARNING = 'Scores without their words are deprecated and will be rejected: send the found words'
+
+def _validate_found_words(data, score_data):
+    """
+    Score the found words: the score is the number of them that are
+    solutions of the challenge (see check_words), and a claimed score must
+    match it. Returns an error or None.
+
+    Until settings.SCORE_WORDS_REQUIRED is set, a score without its words
+    is still stored as claimed (deprecated, see SCORE_WITHOUT_WORDS_WARNING)
+    """
+    words = data.get('words')
+    if words is None:
+        if settings.SCORE_WORDS_REQUIRED:
+            return 'Missing required field: words'
+        if 'score' not in data:
+            return 'Missing required field: score (or words)'
+        metrics.increment('scores_without_words')
+        return None
+    if not isinstance(words, list) or len(words) > settings.CHECK_WORDS_MAX_SIZE:
+        return f'words must be a list of at most {settings.CHECK_WORDS_MAX_SIZE} words'
+    
+    solutions = get_solution_set(score_data['challengeId'])
+    if solutions is None:
+        return 'Challenge not found'
+    
+    result = check_words(solutions, words)
+    if 'score' in data and data['score'] != result['score']:
+        return f'score {data["score"]} does not match the {result["score"]} found words'
+    score_data['score'] = result['score']
+    score_data['foundWordsCount'] = len(result['valid'])
+    return None
+
+# Numeric fields of a submitted score and their accepted types
+SCORE_NUMBER_FIELDS = {
+    'score': int,
+    'foundWordsCount': int,
+    'totalWords': int,
+    'timeElapsed': (int, float),
+}
+
+def _build_score_data(data):
+    """Validate a submitted score and build its leaderboard document; returns (score_data, error)"""
+    if not isinstance(data, dict):
+        return None, 'Score must be an object'
+    
+    # Validate required fields (the score is computed from the words, see _validate_found_words)
+    required_fields = ['challengeId', 'userId', 'userName']
+    for field in required_fields:
+        if field not in data:
+            return None, f'Missing required field: {field}'
+    for field in ['challengeId', 'userId', 'userName']:
+        if not isinstance(data[field], str) or not data[field]:
+            return None, f'{field} must be a non-empty string'
+    
+    # Numbers are checked here: a bad one must not reach (and fail) a shared write batch
+    for field, types in SCORE_NUMBER_FIELDS.items():
+        value = data.get(field, 0)
+        if isinstance(value, bool) or not isinstance(value, types) or not 0 <= value < math.inf:
+            return None, f'{field} must be a non-negative {"integer" if types is int else "number"}'
+    
+    # Create score document
+    score_data = {
+        'challengeId': data['challengeId'],
+        'challengeName': data.get('challengeName', ''),
+        'userId': data['userId'],
+        'userName': data['userName'],
+        'userEmail': data.get('userEmail', ''),
+        'userPhotoURL': data.get('userPhotoURL'),
+        'score': data.get('score', 0),
+        'foundWordsCount': data.get('foundWordsCount', data.get('score', 0)),
+        'totalWords': data.get('totalWords', 0),
+        'timeElapsed': data.get('timeElapsed', 0),
+    }
+    return score_data, None
+
+def _score_response(scores, body, status_code, response_class=Response):
+    """Build the response to submitted scores (one or a list), flagged as deprecated if one has no words"""
+    if any(isinstance(data, dict) and 'words' not in data for data in (scores if isinstance(scores, list) else [scores])):
+        body['warning'] = SCORE_WITHOUT_WORDS_WARNING
+        response = response_class(body, status=status_code)
+        response['Deprecation'] = 'true'
+        return response
+    return response_class(body, status=status_code)
+
 @api_view(['POST'])
 def submit_score(request):
-    """Submit a score to the leaderboard"""
+    """
+    Submit a score to the leaderboard
+
+    The score is the number of found words (words) that are solutions of
+    the challenge. An optional idempotencyKey makes retries safe: a score
+    with the same userId and key is only added once
+    """
     try:
         data = request.data
-        db = get_firestore_db()
-        
-        # Validate required fields
-        required_fields = ['challengeId', 'userId', 'userName', 'score']
-        for field in required_fields:
-            if field not in data:
-                return Response({'error': f'Missing required field: {field}'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Create score document
-        score_data = {
-            'challengeId': data['challengeId'],
-            'challengeName': data.get('challengeName', ''),
-            'userId': data['userId'],
-            'userName': data['userName'],
-            'userEmail': data.get('userEmail', ''),
-            'userPhotoURL': data.get('userPhotoURL'),
-            'score': data['score'],
-            'foundWordsCount': data.get('foundWordsCount', data['score']),
-            'totalWords': data.get('totalWords', 0),
-            'timeElapsed': data.get('timeElapsed', 0),
-            'timestamp': firestore.SERVER_TIMESTAMP,
-            'createdAt': firestore.SERVER_TIMESTAMP,
-        }
-        
-        # Add to leaderboard
-        leaderboard_ref = db.collection('leaderboard')
-        leaderboard_ref.add(score_data)
-        
-        return Response({'success': True, 'message': 'Score submitted successfully'}, status=status.HTTP_201_CREATED)
+        score_data, error = _build_score_data(data)
+        if not error:
+            error = _validate_found_words(data, score_data)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Add to leaderboard (and update the challenge summary)
+        created, is_high_score = get_storage().add_score(score_data, data.get('idempotencyKey'))
+        if not created:
+            return _score_response(data, {'success': True, 'message': 'Score already submitted'}, status.HTTP_200_OK)
+        
+        # Refresh the challenge list if this is a new high score
+        if is_high_score:
+            invalidate_challenges()
+        
+        return _score_response(data, {'success': True, 'message': 'Score submitted successfully'}, status.HTTP_201_CREATED)
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+def submit_scores_bulk(request):
+    """
+    Queue many scores for a batched leaderboard write
+
+    Body: a list of scores (or {"scores": [...]}) in the submit_score format.
+    Scores with an idempotencyKey are written at most once, even when the
+    request is retried. Scores are written within settings.SCORE_BUFFER_FLUSH_INTERVAL
+    seconds, so the response is 202 Accepted
+    """
+    try:
+        scores = request.data.get('scores') if isinstance(request.data, dict) else request.data
+        if not isinstance(scores, list) or not scores:
+            return Response({'error': 'Expected a non-empty list of scores'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(scores) > settings.SCORE_BULK_MAX_SIZE:
+            return Response({'error': f'At most {settings.SCORE_BULK_MAX_SIZE} scores per request'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        items = []
+        for position, data in enumerate(scores):
+            score_data, error = _build_score_data(data)
+            if not error:
+                error = _validate_found_words(data, score_data)
+            if error:
+                return Response({'error': f'Score {position}: {error}'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            key = data.get('idempotencyKey')
+            doc_id = score_document_id(data['userId'], key) if key else uuid.uuid4().hex
+            items.append((doc_id, score_data))
+        
+        queued = get_score_buffer().add(items)
+        
+        return _score_response(scores, {
+            'success': True,
+            'accepted': len(items),
+            'queued': queued,
+            'ids': [doc_id for doc_id, _ in items],
+        }, status.HTTP_202_ACCEPTED)
     
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _parse_leaderboard_cursor(after):
+    """Parse an ?after=<score>,<docId> cursor into (score, doc_id)"""
+    score, separator, doc_id = after.partition(',')
+    if not separator or not doc_id:
+        raise ValueError('after must be <score>,<docId>')
+    score = float(score)
+    return (int(score) if score.is_integer() else score), doc_id
+
+def _parse_leaderboard_params(query_params):
+    """Get (limit, cursor) from the leaderboard query parameters; raises ValueError"""
+    limit = int(query_params.get('limit', 10))
+    if not 1 <= limit <= settings.LEADERBOARD_MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {settings.LEADERBOARD_MAX_PAGE_SIZE}')
+    after = query_params.get('after')
+    return limit, (_parse_leaderboard_cursor(after) if after else None)
+
+def _set_next_cursor(response, scores, has_more):
+    """Return the cursor of the next page in the X-Next-Cursor header"""
+    if has_more and scores:
+        response['X-Next-Cursor'] = f"{scores[-1]['score']},{scores[-1]['id']}"
+
 @api_view(['GET'])
 def get_leaderboard(request, challenge_id):
-    """Get leaderboard for a specific challenge"""
+    """
+    Get leaderboard for a specific challenge, highest scores first
+
+    Query parameters:
+    - limit: page size (default 10, at most settings.LEADERBOARD_MAX_PAGE_SIZE)
+    - after: cursor of the last entry of the previous page, <score>,<docId>
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    Responses have an ETag for conditional requests (see http_cache.py)
+    """
     try:
-        db = get_firestore_db()
-        leaderboard_ref = db.collection('leaderboard')
+        try:
+            limit, cursor = _parse_leaderboard_params(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Get scores for this challenge
-        scores_query = leaderboard_ref.where('challengeId', '==', challenge_id).order_by('score', direction=firestore.Query.DESCENDING).limit(10)
+        scores, has_more = get_storage().get_leaderboard(challenge_id, limit, cursor)
         
-        scores = []
-        try:
-            for doc in scores_query.stream():
-                score_data = doc.to_dict()
-                scores.append({
-                    'userId': score_data.get('userId'),
-                    'userName': score_data.get('userName'),
-                    'userEmail': score_data.get('userEmail'),
-                    'userPhotoURL': score_data.get('userPhotoURL'),
-                    'score': score_data.get('score') or score_data.get('foundWordsCount'),
-                    'timeElapsed': score_data.get('timeElapsed', 0),
-                    'timestamp': score_data.get('timestamp'),
-                })
-        except:
-            # If order_by fails, get all and sort manually
-            all_scores_query = leaderboard_ref.where('challengeId', '==', challenge_id)
-            all_scores = []
-            for doc in all_scores_query.stream():
-                score_data = doc.to_dict()
-                all_scores.append({
-                    'userId': score_data.get('userId'),
-                    'userName': score_data.get('userName'),
-                    'userEmail': score_data.get('userEmail'),
-                    'userPhotoURL': score_data.get('userPhotoURL'),
-                    'score': score_data.get('score') or score_data.get('foundWordsCount', 0),
-                    'timeElapsed': score_data.get('timeElapsed', 0),
-                    'timestamp': score_data.get('timestamp'),
-                })
-            all_scores.sort(key=lambda x: x['score'], reverse=True)
-            scores = all_scores[:10]
-        
-        return Response(scores, status=status.HTTP_200_OK)
+        def build_response():
+            response = Response(scores, status=status.HTTP_200_OK)
+            _set_next_cursor(response, scores, has_more)
+            return response
+        
+        return conditional_response(request, build_response, data_etag([scores, has_more]), settings.SCORES_MAX_AGE)
     
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+def solve(request):
+    """Solve a grid with the server-side solver"""
+    try:
+        if not isinstance(request.data, dict):
+            return Response({'error': 'Expected an object with a grid'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        grid = request.data.get('grid')
+        error = solver_service.validate_grid(grid)
+        if error:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+        
+        include_paths = bool(request.data.get('paths', False))
+        return Response(solver_service.solve_grid(grid, include_paths), status=status.HTTP_200_OK)
+    
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@require_GET
+def metrics_endpoint(request):
+    """
+    Process metrics in the Prometheus text format. With settings.METRICS_TOKEN
+    set, requests need an 'Authorization: Bearer <token>' header
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+    
+    gauges = []
+    solve_cache_stats = solver_service.get_solve_cache_stats()
+    if solve_cache_stats is not None:
+        gauges.append(('solve_cache_hits', {'layer': 'memory'}, solve_cache_stats['hits']))
+        gauges.append(('solve_cache_hits', {'layer': 'disk'}, solve_cache_stats['diskHits']))
+        gauges.append(('solve_cache_misses', {}, solve_cache_stats['misses']))
+        gauges.append(('solve_cache_disk_errors', {}, solve_cache_stats['diskErrors']))
+        gauges.append(('solve_cache_entries', {}, solve_cache_stats['entries']))
+    return HttpResponse(metrics.render_prometheus(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
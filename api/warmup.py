@@ -0,0 +1,74 @@
+"""
+Process warm-up
+
+The first request of a fresh process used to pay for the slow first-use work:
+importing the URLconf and views and the storage backend, initializing the
+Firebase Admin SDK and its Firestore client, and loading the solver's
+dictionary index. warm_up does it up front:
+- gunicorn.conf.py calls it in each worker once the application is loaded
+  (after the fork: Firestore's gRPC channels must not be shared across it)
+- with API_WARM_UP=True, AppConfig.ready calls it, for servers without that
+  hook (runserver, uvicorn)
+
+The time of each step is logged and observed as the startup_seconds metric
+(/api/metrics/), so the cold start of a worker is measurable after restarts.
+"""
+import logging
+import time
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _load_urls():
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+
+
+def _warm_storage():
+    from .storage import get_storage
+
+    get_storage().warm_up()
+
+
+def _load_dictionary():
+    from .solver_service import get_dictionary_index
+
+    get_dictionary_index()
+
+
+WARM_UP_STEPS = [
+    ('urls', _load_urls),
+    ('storage', _warm_storage),
+    ('dictionary', _load_dictionary),
+]
+
+
+def warm_up(boot_started=None):
+    """
+    Run the warm-up steps; a failed step is logged and left to the first
+    request. boot_started (a time.perf_counter value, e.g. taken when the
+    worker was forked) adds the application load time before warm-up.
+    Returns {step: seconds}
+    """
+    start = time.perf_counter()
+    timings = {}
+    if boot_started is not None:
+        timings['boot'] = start - boot_started
+
+    for step, func in WARM_UP_STEPS:
+        step_start = time.perf_counter()
+        try:
+            func()
+        except Exception:
+            logger.exception('Warm-up step %s failed', step)
+            metrics.increment('startup_errors', step=step)
+        timings[step] = time.perf_counter() - step_start
+
+    timings['total'] = time.perf_counter() - (start if boot_started is None else boot_started)
+    for step, seconds in timings.items():
+        metrics.observe('startup_seconds', seconds, step=step)
+    logger.info('Warm-up done: %s', ', '.join(f'{step} {seconds * 1000:.0f} ms' for step, seconds in timings.items()))
+    return timings
@@ -0,0 +1,152 @@
+"""
+API benchmark: requests/sec of the sync views under gunicorn (WSGI) and of
+the async views under gunicorn with uvicorn workers (ASGI)
+
+Needs the Firestore emulator (firebase emulators:start --only firestore):
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python benchmarks/bench_api_async.py
+
+The emulator is seeded with --challenges challenges of --scores scores each,
+and the challenge list cache is disabled so every request reads Firestore.
+The benchmark fails if a server answers with errors.
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+SERVERS = {
+    'wsgi': ['boggle_backend.wsgi', '--worker-class', 'gthread', '--threads', '8'],
+    'asgi': ['boggle_backend.asgi', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+}
+
+
+def seed(challenges, scores, rng):
+    """Write the benchmark challenges and scores to the emulator"""
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'boggle_backend.settings')
+    django.setup()
+
+    from api.firebase_service import get_firestore_db
+    from api.summaries import rebuild_summary
+
+    db = get_firestore_db()
+    # Ids must be challenge-<number>: the challenge list is sorted by that number
+    challenge_ids = [f'challenge-{number}' for number in range(1, challenges + 1)]
+    for challenge_id in challenge_ids:
+        batch = db.batch()
+        batch.set(db.collection('challenges').document(challenge_id), {
+            'name': challenge_id,
+            'size': 4,
+            'difficulty': 'medium',
+            'grid': {str(row): [rng.choice('ABCDEFGHIKLMNOPRST') for _ in range(4)] for row in range(4)},
+        })
+        for number in range(scores):
+            batch.set(db.collection('leaderboard').document(f'{challenge_id}-{number}'), {
+                'challengeId': challenge_id,
+                'userId': f'user-{number}',
+                'userName': f'Player {number}',
+                'score': rng.randint(0, 100),
+                'timeElapsed': rng.randint(10, 300),
+            })
+        batch.commit()
+        rebuild_summary(db, challenge_id)
+    return challenge_ids
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server did not start on port {port}')
+
+
+def run_load(urls, concurrency, duration):
+    """
+    Request urls round-robin from concurrency threads; returns (requests,
+    errors, first error). Error statuses count as errors
+    """
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        done = errors = 0
+        first_error = None
+        position = offset
+        while time.monotonic() < deadline:
+            url = urls[position % len(urls)]
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response:
+                    response.read()
+                done += 1
+            except Exception as e:
+                errors += 1
+                first_error = first_error or f'{url}: {e}'
+            position += 1
+        return done, errors, first_error
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(client, range(concurrency)))
+    first_error = next((error for _, _, error in results if error), None)
+    return sum(result[0] for result in results), sum(result[1] for result in results), first_error
+
+
+def bench_server(name, args, challenge_ids):
+    env = dict(os.environ, CHALLENGE_CACHE_TTL='0', API_ASYNC_VIEWS=str(name == 'asgi'))
+    command = ['gunicorn', *SERVERS[name], '--bind', f'127.0.0.1:{args.port}', '--workers', str(args.workers)]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(args.port)
+        base = f'http://127.0.0.1:{args.port}/api'
+        endpoints = {
+            'challenges': [f'{base}/challenges/'],
+            'challenge': [f'{base}/challenges/{challenge_id}/' for challenge_id in challenge_ids],
+            'leaderboard': [f'{base}/leaderboard/{challenge_id}/' for challenge_id in challenge_ids],
+            'leaderboard-page': [f'{base}/leaderboard/{challenge_id}/?limit=50' for challenge_id in challenge_ids],
+        }
+        for endpoint, urls in endpoints.items():
+            run_load(urls, args.concurrency, 1)  # warm up
+            requests, errors, first_error = run_load(urls, args.concurrency, args.duration)
+            if errors:
+                raise RuntimeError(f'{name} {endpoint}: {errors} of {requests + errors} requests failed, e.g. {first_error}')
+            print(f'{name}  {endpoint:17}{requests / args.duration:9.1f} req/s')
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--challenges', type=int, default=50)
+    parser.add_argument('--scores', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS))
+    args = parser.parse_args()
+
+    if not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        parser.error('Set FIRESTORE_EMULATOR_HOST to the address of the Firestore emulator')
+
+    challenge_ids = seed(args.challenges, args.scores, random.Random(args.seed))
+    for name in args.servers:
+        bench_server(name, args, challenge_ids)
+
+
+if __name__ == '__main__':
+    main()
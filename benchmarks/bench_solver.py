@@ -0,0 +1,51 @@
+"""
+Solver benchmark: average solve time on seeded random 4x4, 5x5 and 6x6 boards
+
+Usage: python benchmarks/bench_solver.py [--boards 200] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+SOLVER_DIR = Path(__file__).resolve().parent.parent / 'myboggle-app' / 'src'
+sys.path.insert(0, str(SOLVER_DIR))
+
+from boggle_index import DictionaryIndex  # noqa: E402
+from boggle_solver import Boggle  # noqa: E402
+
+LETTERS = 'ABCDEFGHIJKLMNOPRSTUVWY'
+
+
+def random_grids(size, count, rng):
+    return [[[rng.choice(LETTERS) for _ in range(size)] for _ in range(size)]
+            for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--boards', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 5, 6])
+    args = parser.parse_args()
+
+    index = DictionaryIndex.load_or_build(SOLVER_DIR / 'full-wordlist.json')
+    rng = random.Random(args.seed)
+
+    for size in args.sizes:
+        grids = random_grids(size, args.boards, rng)
+        solver = Boggle(dictionary=index)
+        words = 0
+        start = time.perf_counter()
+        for grid in grids:
+            solver.setGrid(grid)
+            words += len(solver.getSolution())
+        elapsed = time.perf_counter() - start
+        print(f'{size}x{size}: {args.boards / elapsed:8.1f} solves/s  '
+              f'{elapsed / args.boards * 1000:7.3f} ms/solve  '
+              f'{words / args.boards:6.1f} words/board')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Solver scaling benchmark: solve time by board size, from 4x4 to 12x12
+
+Boards are seeded random letters drawn by English letter frequency (like
+`generate_challenges --board random`), so large boards have realistic word
+counts.
+
+Usage: python benchmarks/bench_solver_scaling.py [--boards 50] [--sizes 4 6 8 10 12]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+SOLVER_DIR = Path(__file__).resolve().parent.parent / 'myboggle-app' / 'src'
+sys.path.insert(0, str(SOLVER_DIR))
+
+from boggle_boards import random_letters  # noqa: E402
+from boggle_index import DictionaryIndex  # noqa: E402
+from boggle_solver import Boggle  # noqa: E402
+
+def scaling_grids(size, count, rng):
+    return [random_letters(size, rng) for _ in range(count)]
+
+
+def time_solves(solver, grids):
+    """Solve each grid; returns the solve times in ms and the number of words found"""
+    times = []
+    words = 0
+    for grid in grids:
+        solver.setGrid(grid)
+        start = time.perf_counter()
+        words += len(solver.getSolution())
+        times.append((time.perf_counter() - start) * 1000)
+    return times, words
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--boards', type=int, default=50, help='Boards per size')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 5, 6, 8, 10, 12])
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = DictionaryIndex.load_or_build(SOLVER_DIR / 'full-wordlist.json')
+    print(f'Index: {len(index)} words, loaded in {(time.perf_counter() - start) * 1000:.1f} ms')
+
+    rng = random.Random(args.seed)
+    solver = Boggle(dictionary=index)
+    print(f'{"size":>7} {"mean ms":>9} {"p50 ms":>9} {"p95 ms":>9} {"max ms":>9} {"words":>7}')
+    for size in args.sizes:
+        times, words = time_solves(solver, scaling_grids(size, args.boards, rng))
+        times.sort()
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f'{size:>4}x{size:<2} {statistics.mean(times):9.2f} {statistics.median(times):9.2f} '
+              f'{p95:9.2f} {times[-1]:9.2f} {words / args.boards:7.0f}')
+
+
+if __name__ == '__main__':
+    main()
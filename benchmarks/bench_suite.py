@@ -0,0 +1,383 @@
+"""
+Benchmark suite: solver and API metrics as JSON, compared against a baseline
+
+Solver: index build and load time, solves/s, solve latency and peak RSS on
+4x4, 5x5, 6x6 and large boards with the bundled ENABLE list, using the board
+cases of bench_solver_scaling.py (letter frequency boards of every size) and
+bench_solver.py (uniform letters, up to 6x6). API: latency of
+list_challenges, get_leaderboard and submit_score through the Django views,
+with 10, 1k and 100k seeded scores, against the database backend on an
+in-memory SQLite database (or the Firestore emulator with --store firestore),
+and the cold start of a fresh process: URLconf and view imports, warm-up
+(api/warmup.py) and the first request.
+Every task runs in a fresh process, so peak RSS is the task's own.
+
+    python benchmarks/bench_suite.py --output results.json
+    python benchmarks/bench_suite.py --baseline results.json   # flags regressions
+    python benchmarks/bench_suite.py --results new.json --baseline old.json
+
+The exit status is 1 when a metric is worse than the baseline by more than
+--threshold (a fraction, default 0.2).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASE_DIR = BENCHMARKS_DIR.parent
+SOLVER_DIR = BASE_DIR / 'myboggle-app' / 'src'
+WORDLIST_PATH = SOLVER_DIR / 'full-wordlist.json'
+
+SOLVER_SIZES = [4, 5, 6, 8, 12]
+# Sizes also solved with the uniform boards of bench_solver.py
+UNIFORM_SIZES = [4, 5, 6]
+SCORE_COUNTS = [10, 1000, 100000]
+CHALLENGES = 20
+SEED_BATCH_SIZE = 500
+
+def metric(value, unit, better='lower'):
+    return {'value': round(value, 6), 'unit': unit, 'better': better}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def latency_metrics(prefix, times_ms):
+    times_ms = sorted(times_ms)
+    return {
+        f'{prefix}.p50_ms': metric(statistics.median(times_ms), 'ms'),
+        f'{prefix}.p95_ms': metric(percentile(times_ms, 0.95), 'ms'),
+    }
+
+
+# Solver tasks (run in fresh processes)
+
+def bench_index_build():
+    sys.path.insert(0, str(SOLVER_DIR))
+    from boggle_index import DictionaryIndex
+
+    start = time.perf_counter()
+    index = DictionaryIndex.from_wordlist(WORDLIST_PATH)
+    elapsed = time.perf_counter() - start
+    return {
+        'solver.index_build.seconds': metric(elapsed, 's'),
+        'solver.index_build.peak_rss_mb': metric(peak_rss_mb(), 'MB'),
+        'solver.index.nodes': metric(index.node_count, 'nodes', 'none'),
+    }
+
+
+def bench_index_load():
+    sys.path.insert(0, str(SOLVER_DIR))
+    from boggle_index import DictionaryIndex
+
+    DictionaryIndex.load_or_build(WORDLIST_PATH).close()
+    start = time.perf_counter()
+    DictionaryIndex.load(WORDLIST_PATH.with_suffix('.dawg'))
+    return {'solver.index_load.ms': metric((time.perf_counter() - start) * 1000, 'ms')}
+
+
+def bench_solves(case, size, boards, seed):
+    """
+    Time solves of the boards of a case: 'letter_frequency' boards from
+    bench_solver_scaling.py (metrics solver.<size>x<size>.*) or 'uniform'
+    boards from bench_solver.py (solver.uniform.<size>x<size>.*)
+    """
+    sys.path[:0] = [str(SOLVER_DIR), str(BENCHMARKS_DIR)]
+    import bench_solver
+    import bench_solver_scaling
+    from boggle_index import DictionaryIndex
+    from boggle_solver import Boggle
+
+    solver = Boggle(dictionary=DictionaryIndex.load_or_build(WORDLIST_PATH))
+    rng = random.Random(seed + size)
+    if case == 'uniform':
+        grids = bench_solver.random_grids(size, boards, rng)
+        prefix = f'solver.uniform.{size}x{size}'
+    else:
+        grids = bench_solver_scaling.scaling_grids(size, boards, rng)
+        prefix = f'solver.{size}x{size}'
+    times_ms, words = bench_solver_scaling.time_solves(solver, grids)
+
+    results = {
+        f'{prefix}.solves_per_s': metric(len(grids) / (sum(times_ms) / 1000), 'solves/s', 'higher'),
+        f'{prefix}.words_per_board': metric(words / len(grids), 'words', 'none'),
+        f'{prefix}.peak_rss_mb': metric(peak_rss_mb(), 'MB'),
+    }
+    results.update(latency_metrics(prefix, times_ms))
+    return results
+
+
+# API tasks (run in fresh processes)
+
+def _setup_django(store):
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'boggle_backend.settings'
+    os.environ['API_STORAGE_BACKEND'] = 'database' if store == 'database' else 'firestore'
+    # Measure the views and the store, not the challenge list cache
+    os.environ['CHALLENGE_CACHE_TTL'] = '0'
+
+    import django
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    setup_test_environment()
+    if store == 'database':
+        from django.db import connection
+
+        # An in-memory SQLite database for the sqlite backend
+        connection.creation.create_test_db(verbosity=0)
+    elif not os.environ.get('FIRESTORE_EMULATOR_HOST'):
+        raise RuntimeError('Set FIRESTORE_EMULATOR_HOST to benchmark the Firestore store')
+
+
+def _seed(score_count, seed):
+    """Write CHALLENGES challenges and score_count scores spread over them"""
+    from api.solver_service import solve_words
+    from api.storage import get_storage
+    from api.views import _build_score_data
+    from boggle_boards import random_letters  # on sys.path through api.solver_service
+
+    storage = get_storage()
+    rng = random.Random(seed)
+    challenges = []
+    for number in range(1, CHALLENGES + 1):
+        grid = random_letters(4, rng)
+        challenges.append({
+            'id': f'challenge-{number}',
+            'name': f'Challenge {number}',
+            'size': 4,
+            'grid': grid,
+            'solutions': solve_words(grid),
+            'difficulty': 'medium',
+        })
+    storage.save_challenges(challenges)
+
+    for start in range(0, score_count, SEED_BATCH_SIZE):
+        batch = []
+        for number in range(start, min(start + SEED_BATCH_SIZE, score_count)):
+            score_data, _ = _build_score_data({
+                'challengeId': challenges[number % CHALLENGES]['id'],
+                'userId': f'user-{number}',
+                'userName': f'Player {number}',
+                'score': rng.randint(0, 200),
+                'timeElapsed': rng.randint(10, 300),
+            })
+            batch.append((f'seed-{number}', score_data))
+        storage.add_scores(batch)
+
+
+def _timed_requests(request, count):
+    request(0)  # warm up
+    times_ms = []
+    for number in range(count):
+        start = time.perf_counter()
+        response = request(number)
+        times_ms.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{response.status_code}: {response.content[:200]!r}')
+    return times_ms
+
+
+def bench_api(store, score_count, requests, seed):
+    _setup_django(store)
+    from django.test import Client
+
+    start = time.perf_counter()
+    _seed(score_count, seed)
+    seed_seconds = time.perf_counter() - start
+
+    client = Client()
+    challenge_id = 'challenge-1'
+    solutions = client.get(f'/api/challenges/{challenge_id}/?fields=solutions').json()['solutions']
+    first_page = client.get(f'/api/leaderboard/{challenge_id}/?limit=10')
+    next_cursor = first_page.get('X-Next-Cursor')
+
+    timings = {
+        'list_challenges': _timed_requests(lambda number: client.get('/api/challenges/'), requests),
+        'get_leaderboard': _timed_requests(
+            lambda number: client.get(f'/api/leaderboard/{challenge_id}/?limit=10'), requests),
+        'submit_score': _timed_requests(lambda number: client.post('/api/scores/', {
+            'challengeId': challenge_id,
+            'userId': f'bench-user-{number}',
+            'userName': f'Bench {number}',
+            'timeElapsed': 60,
+            'words': solutions[:number % (len(solutions) + 1)],
+        }, content_type='application/json'), requests),
+    }
+    if next_cursor:
+        timings['get_leaderboard_page2'] = _timed_requests(
+            lambda number: client.get(f'/api/leaderboard/{challenge_id}/?limit=10&after={next_cursor}'), requests)
+
+    results = {f'api.{store}.{score_count}.seed_seconds': metric(seed_seconds, 's', 'none')}
+    for endpoint, times_ms in timings.items():
+        results.update(latency_metrics(f'api.{store}.{score_count}.{endpoint}', times_ms))
+    return results
+
+
+def bench_cold_start(store):
+    _setup_django(store)
+    from django.test import Client
+    from django.urls import resolve
+
+    start = time.perf_counter()
+    resolve('/api/challenges/')  # imports the URLconf and views, like a first request would
+    import_seconds = time.perf_counter() - start
+
+    from api.warmup import warm_up
+
+    warm_up_seconds = warm_up()['total']
+
+    start = time.perf_counter()
+    response = Client().get('/api/challenges/')
+    first_request_ms = (time.perf_counter() - start) * 1000
+    if response.status_code >= 400:
+        raise RuntimeError(f'{response.status_code}: {response.content[:200]!r}')
+
+    prefix = f'api.{store}.cold_start'
+    return {
+        f'{prefix}.import_seconds': metric(import_seconds, 's'),
+        f'{prefix}.warm_up_seconds': metric(warm_up_seconds, 's'),
+        f'{prefix}.first_request_ms': metric(first_request_ms, 'ms'),
+    }
+
+
+def clear_firestore_emulator():
+    """Delete every document in the Firestore emulator"""
+    import urllib.request
+
+    project_id = os.environ.get('FIREBASE_PROJECT_ID', 'demo-boggle')
+    url = (f'http://{os.environ["FIRESTORE_EMULATOR_HOST"]}/emulator/v1/projects/'
+           f'{project_id}/databases/(default)/documents')
+    urllib.request.urlopen(urllib.request.Request(url, method='DELETE')).close()
+
+
+def run_task(func, *args):
+    """Run a benchmark task in a fresh (spawned) process"""
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(func, *args).result()
+
+
+def run_suites(args):
+    results = {}
+    if 'solver' in args.suites:
+        print('solver: index build', file=sys.stderr)
+        results.update(run_task(bench_index_build))
+        results.update(run_task(bench_index_load))
+        for size in args.sizes:
+            print(f'solver: {size}x{size}', file=sys.stderr)
+            boards = args.boards if size <= 6 else max(1, args.boards // 5)
+            results.update(run_task(bench_solves, 'letter_frequency', size, boards, args.seed))
+            if size in UNIFORM_SIZES:
+                results.update(run_task(bench_solves, 'uniform', size, boards, args.seed))
+
+    if 'api' in args.suites:
+        print(f'api: {args.store}, cold start', file=sys.stderr)
+        if args.store == 'firestore':
+            clear_firestore_emulator()
+        results.update(run_task(bench_cold_start, args.store))
+        for score_count in args.scores:
+            print(f'api: {args.store}, {score_count} scores', file=sys.stderr)
+            if args.store == 'firestore':
+                clear_firestore_emulator()
+            results.update(run_task(bench_api, args.store, score_count, args.requests, args.seed))
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Print each metric against the baseline; returns the names of the regressions"""
+    regressions = []
+    print(f'{"metric":52} {"baseline":>12} {"current":>12} {"change":>8}')
+    for name, current in sorted(results['metrics'].items()):
+        previous = baseline['metrics'].get(name)
+        if previous is None or not previous['value']:
+            print(f'{name:52} {"-":>12} {current["value"]:12.3f}')
+            continue
+
+        change = (current['value'] - previous['value']) / previous['value']
+        worse = {'lower': change, 'higher': -change}.get(current['better'], 0)
+        flag = ''
+        if worse > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif worse < -threshold:
+            flag = '  improved'
+        print(f'{name:52} {previous["value"]:12.3f} {current["value"]:12.3f} {change:+8.1%}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--suites', nargs='+', choices=['solver', 'api'], default=['solver', 'api'])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SOLVER_SIZES)
+    parser.add_argument('--boards', type=int, default=200, help='Boards per size (a fifth for sizes above 6)')
+    parser.add_argument('--store', choices=['database', 'firestore'], default='database')
+    parser.add_argument('--scores', type=int, nargs='+', default=SCORE_COUNTS, help='Seeded score counts')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--results', help='Compare this results file instead of running the suites')
+    parser.add_argument('--baseline', help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.results:
+        with open(args.results) as f:
+            results = json.load(f)
+    else:
+        results = {
+            'meta': {
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'args': {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'results', 'baseline', 'threshold')},
+            },
+            'metrics': run_suites(args),
+        }
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        if not args.output:
+            print(json.dumps(results, indent=2, sort_keys=True))
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}: {", ".join(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
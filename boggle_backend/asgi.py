@@ -9,8 +9,15 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'boggle_backend.settings')
 
 application = get_asgi_application()
+
+# WhiteNoise is left out of the async middleware stack (see settings), so
+# static files (the admin's and DRF's) are served here
+if 'whitenoise.middleware.WhiteNoiseMiddleware' not in settings.MIDDLEWARE:
+    application = ASGIStaticFilesHandler(application)
@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -76,6 +77,9 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Response headers readable by the frontend
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor']
+
 ROOT_URLCONF = 'boggle_backend.urls'
 
 TEMPLATES = [
@@ -148,6 +152,103 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # WhiteNoise configuration for serving static files
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Caches
+# Set CACHE_DIR to share cached data between workers through the file system
+
+if os.environ.get('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Challenge list cache used by /api/challenges/ ('local' or 'django').
+# 'local' is per process: a new high score drops the list only in the worker
+# that took it, and the others serve theirs until the TTL expires. Use
+# 'django' with a shared cache (CACHE_DIR) to drop it in every worker
+CHALLENGE_LIST_CACHE = {
+    'BACKEND': os.environ.get('CHALLENGE_CACHE_BACKEND', 'local'),
+    'ALIAS': 'default',
+    'TTL': int(os.environ.get('CHALLENGE_CACHE_TTL', '60')),
+}
+
+# Cache-Control max-age (seconds) of the API reads, see api/http_cache.py:
+# challenges do not change; the challenge list and leaderboards change with scores
+CHALLENGE_MAX_AGE = int(os.environ.get('CHALLENGE_MAX_AGE', '3600'))
+SCORES_MAX_AGE = int(os.environ.get('SCORES_MAX_AGE', '5'))
+
+# Number of top scores kept in each challenge_summaries document
+LEADERBOARD_SUMMARY_SIZE = int(os.environ.get('LEADERBOARD_SUMMARY_SIZE', '10'))
+
+# Bulk score submissions (/api/scores/bulk/) are written in batches of up to
+# SCORE_BUFFER_MAX_BATCH scores, at most SCORE_BUFFER_FLUSH_INTERVAL seconds later
+SCORE_BULK_MAX_SIZE = 500
+SCORE_BUFFER_MAX_BATCH = int(os.environ.get('SCORE_BUFFER_MAX_BATCH', '200'))
+SCORE_BUFFER_FLUSH_INTERVAL = float(os.environ.get('SCORE_BUFFER_FLUSH_INTERVAL', '1.0'))
+
+# Answer checks against stored challenge solutions (/api/challenges/<id>/check/
+# and the "words" of submitted scores)
+CHECK_WORDS_MAX_SIZE = 1000
+# Reject scores submitted without their words; until then they are stored as
+# claimed, with a deprecation warning
+SCORE_WORDS_REQUIRED = os.environ.get('SCORE_WORDS_REQUIRED', 'False') == 'True'
+SOLUTION_CACHE_TTL = int(os.environ.get('SOLUTION_CACHE_TTL', '300'))
+
+# Largest ?limit= accepted by /api/leaderboard/<challenge_id>/
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+# Concurrent Firestore reads (e.g. high scores in /api/challenges/)
+FIRESTORE_FANOUT_WORKERS = int(os.environ.get('FIRESTORE_FANOUT_WORKERS', '8'))
+FIRESTORE_BATCH_GET_SIZE = int(os.environ.get('FIRESTORE_BATCH_GET_SIZE', '100'))
+FIRESTORE_CALL_TIMEOUT = float(os.environ.get('FIRESTORE_CALL_TIMEOUT', '10'))
+
+# Where challenges and scores are stored: 'firestore' or 'database' (the
+# models in api/models.py, in DATABASES above; run `manage.py migrate`)
+API_STORAGE_BACKEND = os.environ.get('API_STORAGE_BACKEND', 'firestore')
+
+# Serve the challenge, leaderboard and score endpoints with the async views
+# (api/async_views.py); requires an ASGI server, e.g.
+# gunicorn boggle_backend.asgi -k uvicorn.workers.UvicornWorker
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', 'False') == 'True'
+
+# WhiteNoise's middleware is sync-only: in the ASGI stack Django would run each
+# async view through one shared thread, serializing the requests of a worker.
+# The ASGI application serves static files itself (see asgi.py)
+if API_ASYNC_VIEWS:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Initialize storage and load the dictionary index when Django starts
+# (api/warmup.py). gunicorn workers always warm up (see gunicorn.conf.py); this
+# is for other servers, as it also runs for every management command
+API_WARM_UP = os.environ.get('API_WARM_UP', 'False') == 'True'
+
+# Boggle solver (myboggle-app/src/boggle_solver.py) used by /api/solve/
+# The word list is compiled into a memory-mapped index next to it on first use
+
+BOGGLE_SOLVER_DIR = BASE_DIR / 'myboggle-app' / 'src'
+BOGGLE_WORDLIST_PATH = Path(os.environ.get('BOGGLE_WORDLIST_PATH', BOGGLE_SOLVER_DIR / 'full-wordlist.json'))
+BOGGLE_INDEX_PATH = os.environ.get('BOGGLE_INDEX_PATH') or BOGGLE_WORDLIST_PATH.with_suffix('.dawg')
+BOGGLE_MAX_GRID_SIZE = int(os.environ.get('BOGGLE_MAX_GRID_SIZE', '12'))
+
+# Prometheus metrics at /api/metrics/; with METRICS_TOKEN set, scrapers must
+# send 'Authorization: Bearer <token>'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Solve results are cached per process for the SOLVE_CACHE_SIZE most recently
+# solved boards and, with SOLVE_CACHE_PATH, in a SQLite file shared by the
+# workers that survives restarts, which keeps the SOLVE_CACHE_DISK_SIZE most
+# recently used results (/api/solve/ is public, so the file must be bounded)
+SOLVE_CACHE_SIZE = int(os.environ.get('SOLVE_CACHE_SIZE', '4096'))
+SOLVE_CACHE_PATH = os.environ.get('SOLVE_CACHE_PATH') or None
+SOLVE_CACHE_DISK_SIZE = int(os.environ.get('SOLVE_CACHE_DISK_SIZE', '100000'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
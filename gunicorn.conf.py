@@ -0,0 +1,21 @@
+"""
+Gunicorn configuration (picked up automatically from the working directory)
+"""
+import time
+
+
+def post_fork(server, worker):
+    """Note when the worker started, to measure its cold start"""
+    worker.boot_started = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """
+    Initialize storage and load the solver's dictionary index before the
+    worker takes requests (see api/warmup.py)
+    """
+    from api.warmup import warm_up
+
+    timings = warm_up(boot_started=getattr(worker, 'boot_started', None))
+    worker.log.info('Worker warm in %.0f ms (%s)', timings['total'] * 1000,
+                    ', '.join(f'{step} {seconds * 1000:.0f} ms' for step, seconds in timings.items() if step != 'total'))
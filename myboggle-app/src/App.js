@@ -138,22 +138,10 @@ function App() {
     return () => unsubscribe();
   }, []);
 
-  // Load dictionary and puzzles on mount
+  // Load puzzles on mount (grids are solved by the Django API)
   useEffect(() => {
     const loadData = async () => {
       try {
-        // Load dictionary
-        const dictResponse = await fetch('/full-wordlist.json');
-        const dictData = await dictResponse.json();
-        const words = dictData.words || [];
-        setDictionary(words);
-        
-        // Create a Set for fast dictionary lookups
-        const dictSet = new Set(words.map(word => word.toUpperCase()));
-        setDictionarySet(dictSet);
-        
-        console.log(`Full word list loaded: ${words.length} words from dictionary`);
-
         // Load puzzles (optional - for backward compatibility)
         try {
           const puzzlesResponse = await fetch('/Boggle_Solutions_Endpoint.json');
@@ -173,6 +161,40 @@ function App() {
     loadData();
   }, []);
 
+  // Load the full word list, only needed when the API solver is unavailable
+  const loadDictionary = async () => {
+    if (dictionary.length > 0) {
+      return dictionary;
+    }
+    const dictResponse = await fetch('/full-wordlist.json');
+    const dictData = await dictResponse.json();
+    const words = dictData.words || [];
+    setDictionary(words);
+
+    // Create a Set for fast dictionary lookups
+    const dictSet = new Set(words.map(word => word.toUpperCase()));
+    setDictionarySet(dictSet);
+
+    console.log(`Full word list loaded: ${words.length} words from dictionary`);
+    return words;
+  };
+
+  // Solve a grid with the Django API, falling back to the local solver
+  const solveGrid = async (newGrid) => {
+    try {
+      const result = await api.solveGrid(newGrid);
+      console.log(`Solved on server in ${result.solveTimeMs} ms. Found ${result.words.length} valid words.`);
+      return result.words;
+    } catch (error) {
+      console.warn('Server solve failed, solving locally:', error);
+      const words = await loadDictionary();
+      const solver = new BoggleSolver(newGrid, words);
+      const solutions = solver.getSolution();
+      console.log(`Using full dictionary (${words.length} words) to solve grid. Found ${solutions.length} valid words.`);
+      return solutions;
+    }
+  };
+
   // Handle Start/Stop button
   const handleStartStop = () => {
     if (gameStarted) {
@@ -188,36 +210,27 @@ function App() {
     let solutions;
 
     try {
-      // Ensure dictionary is loaded
-      if (!dictionary || dictionary.length === 0) {
-        setMessage('Dictionary not loaded yet. Please wait...');
-        setLoading(false);
-        return;
-      }
-
       if (selectedChallenge) {
         // Use challenge from Django API
         newGrid = selectedChallenge.grid;
         setGridSize(selectedChallenge.size);
-        // Use full dictionary to find all possible words
-        const solver = new BoggleSolver(newGrid, dictionary);
-        solutions = solver.getSolution();
-        console.log(`Using full dictionary (${dictionary.length} words) to solve challenge "${selectedChallenge.name}". Found ${solutions.length} valid words.`);
       } else if (selectedPuzzle !== null && puzzles[selectedPuzzle]) {
         // Use pre-made puzzle
         setSelectedChallenge(null);
         const puzzle = puzzles[selectedPuzzle];
         newGrid = puzzle.grid;
-        const solver = new BoggleSolver(newGrid, dictionary);
-        solutions = solver.getSolution();
-        console.log(`Using full dictionary (${dictionary.length} words) to solve puzzle. Found ${solutions.length} valid words.`);
       } else {
         // Generate random puzzle
         setSelectedChallenge(null);
         newGrid = generateRandomGrid(gridSize);
-        const solver = new BoggleSolver(newGrid, dictionary);
-        solutions = solver.getSolution();
-        console.log(`Using full dictionary (${dictionary.length} words) to solve random grid. Found ${solutions.length} valid words.`);
+      }
+
+      if (selectedChallenge && selectedChallenge.solutions && selectedChallenge.solutions.length > 0) {
+        // Challenges only come with their solutions when asked for (?fields=)
+        solutions = selectedChallenge.solutions;
+      } else {
+        // Find all possible words with the full dictionary
+        solutions = await solveGrid(newGrid);
       }
 
       setGrid(newGrid);
@@ -253,10 +266,10 @@ function App() {
           userName: user.displayName || user.email,
           userEmail: user.email,
           userPhotoURL: user.photoURL || null,
-          score: foundWords.length,
-          foundWordsCount: foundWords.length,
           totalWords: allValidWords.length,
           timeElapsed: timeElapsed,
+          // The server scores the words that are solutions of the challenge
+          words: foundWords,
         };
 
         await api.submitScore(scoreData);
@@ -317,10 +330,14 @@ function App() {
     if (foundWords.includes(guess)) {
       setMessage(`Already found "${guess}"!`);
       setTimeout(() => setMessage(''), 2000);
-    } else if (!dictionarySet.has(guess)) {
-      // First check if word exists in full dictionary
+    } else if (dictionarySet.size > 0 && !dictionarySet.has(guess)) {
+      // First check if word exists in full dictionary (when loaded locally)
       setMessage(`"${guess}" is not a valid word in the dictionary`);
       setTimeout(() => setMessage(''), 2000);
+    } else if (dictionarySet.size === 0 && !allValidWords.includes(guess)) {
+      // Server-solved grid: every valid word is in the solution list
+      setMessage(`"${guess}" is not a valid word on this grid`);
+      setTimeout(() => setMessage(''), 2000);
     } else if (!allValidWords.includes(guess)) {
       // Word is in dictionary but can't be formed from current grid
       setMessage(`"${guess}" is a valid word but cannot be formed from this grid`);
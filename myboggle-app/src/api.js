@@ -64,6 +64,21 @@ export const api = {
     return response.json();
   },
 
+  // Solve a grid on the server (avoids downloading the full word list)
+  async solveGrid(grid) {
+    const response = await fetch(buildUrl('solve/'), {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ grid }),
+    });
+    if (!response.ok) {
+      throw new Error('Failed to solve grid');
+    }
+    return response.json();
+  },
+
   // Get leaderboard for a challenge
   async getLeaderboard(challengeId) {
     const response = await fetch(buildUrl(`leaderboard/${challengeId}/`));
@@ -0,0 +1,95 @@
+"""
+Batch solving of many Boggle grids across a process pool.
+
+Every worker memory-maps the same compiled dictionary index file, so the
+index pages are shared through the OS page cache instead of being copied
+into each process.
+"""
+import itertools
+import json
+import multiprocessing
+import os
+
+from boggle_index import DictionaryIndex
+from boggle_solver import Boggle, score_word
+
+_worker_solver = None
+
+
+def _init_worker(index_path):
+    global _worker_solver
+    _worker_solver = Boggle(dictionary=DictionaryIndex.load(index_path))
+
+
+def _solve_item(item):
+    key, grid = item
+    _worker_solver.setGrid(grid)
+    words = _worker_solver.getSolution(sort=True)
+    return {
+        "id": key,
+        "words": words,
+        "totalScore": sum(score_word(word) for word in words),
+    }
+
+
+def _as_items(grids):
+    """
+    Normalize grids to (id, grid) pairs. A grid may be a list of rows or a
+    dict with "grid" and an optional "id"; missing ids are the position
+    """
+    for position, grid in enumerate(grids):
+        if isinstance(grid, dict):
+            yield grid.get("id", position), grid["grid"]
+        else:
+            yield position, grid
+
+
+def iter_jsonl_grids(path):
+    """
+    Yield the grids of a JSONL file (one grid or {"id", "grid"} per line)
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def solve_batch(grids, index_path, processes=None, chunksize=32,
+                ordered=True, max_pending=None):
+    """
+    Solve an iterable of grids and yield one result dict per grid:
+    {"id", "words", "totalScore"}.
+
+    index_path is a compiled index file (see DictionaryIndex.save) that each
+    worker maps on start-up. processes defaults to the CPU count; with 1
+    the grids are solved in this process. Results are yielded in input order
+    unless ordered is False, which lets fast grids overtake slow ones.
+
+    The pool reads grids as fast as it can dispatch them, far ahead of the
+    results. With max_pending, grids are instead drawn in rounds of at most
+    that many, the next round only once the results of the last one have
+    been consumed, so a generator of grids is not run far past the point
+    where the caller stops.
+    """
+    index_path = str(index_path)
+    items = _as_items(grids)
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1:
+        _init_worker(index_path)
+        for item in items:
+            yield _solve_item(item)
+        return
+
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(index_path,)) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        if max_pending is None:
+            yield from imap(_solve_item, items, chunksize)
+            return
+        while True:
+            round_items = list(itertools.islice(items, max_pending))
+            if not round_items:
+                return
+            yield from imap(_solve_item, round_items, chunksize)
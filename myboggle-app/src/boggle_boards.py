@@ -0,0 +1,64 @@
+"""
+Random Boggle boards.
+
+roll_dice shakes the Boggle dice into a grid (the classic dice for 4x4, the
+Big Boggle dice, with repeats, for other sizes) and random_letters draws
+every tile independently by English letter frequency, so large boards have
+realistic word counts. Both take a random.Random, so seeded boards are
+reproducible:
+
+    grid = roll_dice(4, random.Random(1))
+"""
+
+# Classic 4x4 Boggle dice
+CLASSIC_DICE = [
+    "AAEEGN", "ABBJOO", "ACHOPS", "AFFKPS", "AOOTTW", "CIMOTU", "DEILRX",
+    "DELRVY", "DISTTY", "EEGHNW", "EEINSU", "EHRTVW", "EIOSST", "ELRTTY",
+    "HIMNQU", "HLNNRZ",
+]
+
+# Big Boggle 5x5 dice (also rolled, with repeats, for other sizes)
+BIG_DICE = [
+    "AAAFRS", "AAEEEE", "AAFIRS", "ADENNN", "AEEEEM", "AEEGMU", "AEGMNN",
+    "AFIRSY", "BJKQXZ", "CCENST", "CEIILT", "CEILPT", "CEIPST", "DDHNOT",
+    "DHHLOR", "DHLNOR", "DHLNOR", "EIIITT", "EMOTTT", "ENSSSU", "FIPRSY",
+    "GORRVW", "IPRRRY", "NOOTUW", "OOOTTU",
+]
+
+# English letter frequencies (percent) for random boards
+LETTER_WEIGHTS = {
+    "A": 8.2, "B": 1.5, "C": 2.8, "D": 4.3, "E": 12.7, "F": 2.2, "G": 2.0,
+    "H": 6.1, "I": 7.0, "J": 0.2, "K": 0.8, "L": 4.0, "M": 2.4, "N": 6.7,
+    "O": 7.5, "P": 1.9, "Q": 0.1, "R": 6.0, "S": 6.3, "T": 9.1, "U": 2.8,
+    "V": 1.0, "W": 2.4, "X": 0.2, "Y": 2.0, "Z": 0.1,
+}
+
+
+def _tile(letter):
+    # The Q face of Boggle dice reads "Qu"
+    return "Qu" if letter == "Q" else letter
+
+
+def _rows(tiles, size):
+    return [tiles[row * size:(row + 1) * size] for row in range(size)]
+
+
+def roll_dice(size, rng):
+    """
+    Shake the dice into a size x size grid
+    """
+    dice = CLASSIC_DICE if size == 4 else BIG_DICE
+    cells = size * size
+    rolled = rng.sample(dice * -(-cells // len(dice)), cells)
+    return _rows([_tile(rng.choice(die)) for die in rolled], size)
+
+
+def random_letters(size, rng):
+    """
+    Draw every tile of a size x size grid independently by English letter
+    frequency
+    """
+    letters = rng.choices(list(LETTER_WEIGHTS),
+                          weights=list(LETTER_WEIGHTS.values()),
+                          k=size * size)
+    return _rows([_tile(letter) for letter in letters], size)
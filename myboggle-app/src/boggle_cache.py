@@ -0,0 +1,195 @@
+"""
+Cache of solve results for the Boggle solver.
+
+Results are keyed by the version of the dictionary index (the digest of its
+word set) and the canonical code of the board (see boggle_grid.canonical_grid),
+so rotated or reflected boards share one entry and a rebuilt dictionary never
+serves stale words. The most recently used results are kept
+in memory up to max_entries; with a path, results are also written to a
+SQLite file that outlives the process and is shared by every process that
+opens it. The file keeps about max_disk_entries results: the least recently
+used are deleted every few writes. Reading or writing the file never fails a
+solve: errors count as a miss or a skipped write (see stats).
+
+    cache = SolveCache(max_entries=4096, path="solves.sqlite3")
+    Boggle(grid, index, cache=cache).getSolution()
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Most writes between two deletions of the oldest results on disk
+MAX_PRUNE_INTERVAL = 256
+
+
+class SolveCache:
+    """
+    Thread-safe LRU cache of {word: cell path} solve results, with an
+    optional SQLite layer
+    """
+
+    def __init__(self, max_entries=4096, path=None, max_disk_entries=100000):
+        self.max_entries = max_entries
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+        self._prune_interval = max(1, min(MAX_PRUNE_INTERVAL,
+                                          max_disk_entries // 10))
+        self._writes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_errors = 0
+        self._entries = OrderedDict()
+        # _lock guards the memory layer and the counters, _db_lock the SQLite
+        # connection, so memory hits never wait for disk reads or writes
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False,
+                                       isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in
+                       self._db.execute("PRAGMA table_info(solves)")]
+            if columns and "stored" not in columns:
+                # Written before results were evicted: start over
+                self._db.execute("DROP TABLE solves")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS solves ("
+                "dictionary TEXT NOT NULL, grid TEXT NOT NULL, "
+                "result TEXT NOT NULL, stored REAL NOT NULL, "
+                "PRIMARY KEY (dictionary, grid)) WITHOUT ROWID")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS solves_stored ON solves (stored)")
+
+    def get(self, version, grid_code):
+        """
+        Return the cached result for a grid solved with a dictionary
+        version, or None on a miss
+        """
+        key = (version, grid_code)
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return found
+
+        found = self._load(key)
+        with self._lock:
+            if found is not None:
+                self._remember(key, found)
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def set(self, version, grid_code, found):
+        """
+        Store the result of a solve
+        """
+        key = (version, grid_code)
+        with self._lock:
+            self._remember(key, found)
+        self._store(key, found)
+
+    def _load(self, key):
+        """
+        Read a result from the SQLite file and mark it as recently used, or
+        return None if it is not there or the file cannot be read
+        """
+        with self._db_lock:
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT result FROM solves WHERE dictionary = ? AND "
+                    "grid = ?", key).fetchone()
+                if row is None:
+                    return None
+                # Pruning deletes the least recently used results
+                self._db.execute(
+                    "UPDATE solves SET stored = ? WHERE dictionary = ? AND "
+                    "grid = ?", (time.time(),) + key)
+            except sqlite3.Error:
+                self._disk_error()
+                return None
+        return {word: tuple(path) for word, path in json.loads(row[0]).items()}
+
+    def _store(self, key, found):
+        """
+        Write a result to the SQLite file; a failed write is skipped
+        """
+        result = json.dumps(found, separators=(",", ":"))
+        with self._db_lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO solves VALUES (?, ?, ?, ?)",
+                    key + (result, time.time()))
+                self._writes += 1
+                if self._writes % self._prune_interval == 0:
+                    self._prune()
+            except sqlite3.Error:
+                self._disk_error()
+
+    def _disk_error(self):
+        with self._lock:
+            self.disk_errors += 1
+
+    def _prune(self):
+        """
+        Delete the least recently used results on disk beyond
+        max_disk_entries (database lock held)
+        """
+        count = self._db.execute("SELECT COUNT(*) FROM solves").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM solves WHERE (dictionary, grid) IN ("
+                "SELECT dictionary, grid FROM solves ORDER BY stored "
+                "LIMIT ?)", (count - self.max_disk_entries,))
+
+    def _remember(self, key, found):
+        self._entries[key] = found
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Return the hit, miss and disk error counters and the number of
+        entries in memory
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "diskErrors": self.disk_errors,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        """
+        Drop every cached result, in memory and on disk
+        """
+        with self._lock:
+            self._entries.clear()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM solves")
+
+    def close(self):
+        """
+        Close the SQLite file
+        """
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        return len(self._entries)
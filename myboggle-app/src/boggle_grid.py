@@ -0,0 +1,160 @@
+"""
+Compact text encoding of Boggle grids.
+
+A grid is encoded as one symbol per tile, row by row. Letters are their own
+(upper-case) symbol and the multi-letter tiles of the Boggle dice sets are
+single lower-case symbols, so an n x n board is always n * n characters:
+
+    [["T", "E"], ["Qu", "A"]]  <->  "TEqA"
+
+Square grids need no separators (the size is the square root of the
+length). Rectangular grids separate their rows with "/" (a single row ends
+with one). Codes are plain
+ASCII strings, so they are small to store and hashable as cache keys.
+
+Rotating or reflecting a board does not change its words, so
+canonical_grid picks one code for all 8 rotations and reflections of a
+square grid (4 for a rectangle) to share solve results between them.
+"""
+from functools import lru_cache
+from math import isqrt
+
+# Multi-letter tiles and their symbols
+MULTI_LETTER_TILES = {
+    "QU": "q",
+    "ST": "s",
+    "TH": "t",
+    "IN": "i",
+    "ER": "e",
+    "HE": "h",
+    "AN": "a",
+}
+
+_TILE_SYMBOLS = dict(MULTI_LETTER_TILES)
+_TILE_SYMBOLS.update((letter, letter) for letter in
+                     "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_SYMBOL_TILES = {symbol: tile.title() for tile, symbol in
+                 _TILE_SYMBOLS.items()}
+
+ROW_SEPARATOR = "/"
+
+
+def encode_grid(grid):
+    """
+    Encode a grid (a list of rows of tiles) as a grid code. A grid code is
+    returned in its normalized form. Raises ValueError for tiles that have
+    no symbol or rows of different lengths
+    """
+    if isinstance(grid, str):
+        grid = decode_grid(grid)
+    if not grid or not grid[0]:
+        raise ValueError("Grid must have at least one tile")
+
+    width = len(grid[0])
+    rows = []
+    for row in grid:
+        if len(row) != width:
+            raise ValueError("Grid rows must have the same length")
+        symbols = []
+        for tile in row:
+            symbol = _TILE_SYMBOLS.get(tile.upper()) \
+                if isinstance(tile, str) else None
+            if symbol is None:
+                raise ValueError(f"Tile {tile!r} has no grid code symbol")
+            symbols.append(symbol)
+        rows.append("".join(symbols))
+    return _join_rows(rows)
+
+
+def _join_rows(rows):
+    """
+    Join rows of symbols into a grid code
+    """
+    if len(rows) == len(rows[0]):
+        return "".join(rows)
+    if len(rows) == 1:
+        return rows[0] + ROW_SEPARATOR
+    return ROW_SEPARATOR.join(rows)
+
+
+def _code_rows(code):
+    """
+    Split a grid code into its rows of symbols
+    """
+    if ROW_SEPARATOR in code:
+        lines = code.rstrip(ROW_SEPARATOR).split(ROW_SEPARATOR)
+        if len({len(line) for line in lines}) != 1 or not lines[0]:
+            raise ValueError("Grid code rows must have the same length")
+        return lines
+
+    size = isqrt(len(code))
+    if not code or size * size != len(code):
+        raise ValueError(
+            "A grid code without row separators must be square")
+    return [code[row * size:(row + 1) * size] for row in range(size)]
+
+
+def decode_grid(code):
+    """
+    Decode a grid code into a list of rows of tiles ("Qu" for "q").
+    Raises ValueError for invalid codes
+    """
+    lines = _code_rows(code)
+    try:
+        return [[_SYMBOL_TILES[symbol] for symbol in line] for line in lines]
+    except KeyError as e:
+        raise ValueError(f"Invalid grid code symbol {e.args[0]!r}") from None
+
+
+@lru_cache(maxsize=None)
+def grid_symmetries(rows, cols):
+    """
+    Return the rotations and reflections of a rows x cols grid that keep its
+    shape, identity first, as cell permutations: cell i (row * cols + col)
+    of the transformed grid is cell perm[i] of the original
+    """
+    last_row, last_col = rows - 1, cols - 1
+    # (row, col) of a transformed grid -> (row, col) of the original
+    transforms = [
+        lambda r, c: (r, c),
+        lambda r, c: (last_row - r, last_col - c),
+        lambda r, c: (r, last_col - c),
+        lambda r, c: (last_row - r, c),
+    ]
+    if rows == cols:
+        transforms += [
+            lambda r, c: (last_col - c, r),
+            lambda r, c: (c, last_row - r),
+            lambda r, c: (c, r),
+            lambda r, c: (last_col - c, last_row - r),
+        ]
+
+    symmetries = []
+    for transform in transforms:
+        perm = tuple(row * cols + col for row, col in
+                     (transform(r, c) for r in range(rows)
+                      for c in range(cols)))
+        if perm not in symmetries:
+            symmetries.append(perm)
+    return tuple(symmetries)
+
+
+def canonical_grid(grid):
+    """
+    Return the canonical code of a grid (a list of rows or a grid code):
+    the smallest code among its rotations and reflections, and the
+    permutation (see grid_symmetries) that turns the grid into it.
+    Raises ValueError like encode_grid
+    """
+    lines = _code_rows(encode_grid(grid))
+    rows, cols = len(lines), len(lines[0])
+    symbols = "".join(lines)
+
+    best, best_perm = None, None
+    for perm in grid_symmetries(rows, cols):
+        candidate = "".join([symbols[cell] for cell in perm])
+        if best is None or candidate < best:
+            best, best_perm = candidate, perm
+
+    return _join_rows([best[row * cols:(row + 1) * cols]
+                       for row in range(rows)]), best_perm
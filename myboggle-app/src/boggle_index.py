@@ -0,0 +1,498 @@
+"""
+Compiled dictionary index for the Boggle solver.
+
+The word list is compiled once into a minimized DAWG (directed acyclic word
+graph) and stored as a flat table of 32-bit integers: one row per node, with
+26 edges and the node's required-letters mask. Each edge entry packs the row
+offset of the child node and a flag that marks the end of a word:
+
+    entry = (child_row_offset << 1) | is_word
+
+An entry of 0 means there is no edge for that letter. The mask has bit i set
+if every word below the node uses letter i after it, so a solver can skip
+nodes that need letters its board does not have. The table is written to
+a small binary file and memory-mapped when loaded, so every solver in every
+process on the machine walks the same pages instead of rebuilding prefix sets.
+"""
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+
+ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+ALPHABET_SIZE = len(ALPHABET)
+LETTER_CODES = {letter: code for code, letter in enumerate(ALPHABET)}
+# bytes.translate table from A-Z to their letter codes
+_LETTER_CODE_BYTES = bytes.maketrans(ALPHABET.encode("ascii"),
+                                     bytes(range(ALPHABET_SIZE)))
+ALL_LETTERS = (1 << ALPHABET_SIZE) - 1
+
+# A node row holds its 26 edges, then its required-letters mask
+ROW_SIZE = ALPHABET_SIZE + 1
+MASK_COLUMN = ALPHABET_SIZE
+
+ROOT = 0
+
+_MAGIC = b"BGLDAWG\x00"
+_FORMAT_VERSION = 2
+# magic, format version, node count, word count, dictionary digest
+_HEADER = struct.Struct("<8sIII20s")
+_HEADER_SIZE = 64
+
+
+def letter_mask(letters):
+    """
+    Return the bitmask of the A-Z letters in a string (bit i for letter i)
+    """
+    mask = 0
+    for letter in letters.upper():
+        code = LETTER_CODES.get(letter)
+        if code is not None:
+            mask |= 1 << code
+    return mask
+
+
+def encode_word(word):
+    """
+    Return the letter codes of a word, or None if it uses non A-Z letters
+    """
+    word = word.upper()
+    if word.isascii() and word.isalpha():
+        return list(word.encode("ascii").translate(_LETTER_CODE_BYTES))
+    codes = []
+    for letter in word:
+        code = LETTER_CODES.get(letter)
+        if code is None:
+            return None
+        codes.append(code)
+    return codes
+
+
+class UnsortedWordsError(ValueError):
+    """
+    Raised by DawgBuilder.add for a word that is out of sorted order
+    """
+
+
+class _BuildNode:
+    # Edges lead to the unchecked child node of the last word or, once the
+    # child is minimized, hold its packed index entry
+    __slots__ = ("edges", "final")
+
+    def __init__(self):
+        self.edges = {}
+        self.final = False
+
+    def signature(self):
+        return (self.final, tuple(sorted(self.edges.items())))
+
+
+class DawgBuilder:
+    """
+    Incremental builder for a minimized DAWG (Daciuk et al., 2000).
+
+    Words must be added in sorted order. Equivalent suffix states are merged
+    as soon as they can no longer change and are then kept only as their
+    packed edges, so memory stays proportional to the size of the minimized
+    graph rather than the full trie.
+    """
+
+    def __init__(self):
+        self.root = _BuildNode()
+        self.word_count = 0
+        self._register = {}
+        self._unchecked = []
+        self._previous = None
+        self._digest = hashlib.sha1()
+        self._next_row = 1
+
+    def add(self, word):
+        """
+        Add one word; words that are not plain A-Z letters are skipped
+        """
+        word = word.upper()
+        codes = encode_word(word)
+        if not codes:
+            return
+        if self._previous is not None:
+            if word == self._previous:
+                return
+            if word < self._previous:
+                raise UnsortedWordsError(
+                    "Words must be added in sorted order: "
+                    f"{word!r} after {self._previous!r}")
+
+        common = 0
+        if self._previous is not None:
+            limit = min(len(word), len(self._previous))
+            while common < limit and word[common] == self._previous[common]:
+                common += 1
+
+        self._minimize(common)
+
+        node = self._unchecked[-1][2] if self._unchecked else self.root
+        for code in codes[common:]:
+            child = _BuildNode()
+            node.edges[code] = child
+            self._unchecked.append((node, code, child))
+            node = child
+        node.final = True
+
+        self._previous = word
+        self.word_count += 1
+        self._digest.update(word.encode("ascii") + b"\n")
+
+    def _minimize(self, down_to):
+        while len(self._unchecked) > down_to:
+            parent, code, child = self._unchecked.pop()
+            key = child.signature()
+            row = self._register.get(key)
+            if row is None:
+                row = self._next_row
+                self._next_row += 1
+                self._register[key] = row
+            parent.edges[code] = ((row * ROW_SIZE) << 1) | child.final
+
+    def finish(self):
+        """
+        Minimize the remaining states and return a DictionaryIndex
+        """
+        self._minimize(0)
+        node_count = self._next_row
+
+        edges = array("I", [0]) * (node_count * ROW_SIZE)
+        # Children are registered before their parents, so their masks are
+        # known when a parent's mask is computed; the root comes last
+        rows = [(row, final, node_edges)
+                for (final, node_edges), row in self._register.items()]
+        rows.append((ROOT, False, tuple(self.root.edges.items())))
+        for row, final, node_edges in rows:
+            base = row * ROW_SIZE
+            # Letters used by every word below: none if a word ends here
+            mask = 0 if final else ALL_LETTERS
+            for code, entry in node_edges:
+                edges[base + code] = entry
+                mask &= (1 << code) | edges[(entry >> 1) + MASK_COLUMN]
+            edges[base + MASK_COLUMN] = mask
+
+        self._register = {}
+        return DictionaryIndex(edges, node_count, self.word_count,
+                               self._digest.digest())
+
+
+class _JsonStream:
+    """
+    Incremental reader of the values of a JSON document, so the items of a
+    large array can be consumed without loading the whole document
+    """
+    _CHUNK_SIZE = 1 << 16
+    _decoder = json.JSONDecoder()
+    # An array item that is a string without escapes, and what follows it
+    _PLAIN_ITEM = re.compile(r'\s*"([^"\\]*)"\s*([,\]])')
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+
+    def _fill(self):
+        chunk = self.f.read(self._CHUNK_SIZE)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """
+        Skip whitespace and return the next character ("" at the end)
+        """
+        while True:
+            buffer = self.buffer
+            while self.pos < len(buffer) and buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(buffer):
+                return buffer[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in the JSON word list")
+        self.pos += 1
+
+    def value(self):
+        """
+        Read the next complete value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A value that ends with the buffer may go on in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """
+        Yield the values of the array that starts at the current position
+        """
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        match_item = self._PLAIN_ITEM.match
+        while True:
+            match = match_item(self.buffer, self.pos)
+            if match is not None:
+                self.pos = match.end()
+                yield match[1]
+                if match[2] == "]":
+                    return
+                continue
+
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError("Expected ',' or ']' in the JSON word list")
+
+
+def _iter_json_words(f):
+    """
+    Stream the words of a JSON word list: the "words" array of an object or
+    a bare array
+    """
+    stream = _JsonStream(f)
+    if stream.peek() == "[":
+        yield from stream.items()
+        return
+
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key == "words" and stream.peek() == "[":
+            yield from stream.items()
+        else:
+            stream.value()
+        char = stream.peek()
+        stream.pos += 1
+        if char == "}":
+            return
+        if char != ",":
+            raise ValueError("Expected ',' or '}' in the JSON word list")
+
+
+def _iter_text_words(f):
+    for line in f:
+        word = line.strip()
+        if word:
+            yield word
+
+
+def filter_words(words, min_length=None, max_length=None, letters=None):
+    """
+    Yield the words (skipping non-strings) that are at least min_length
+    and at most max_length long and only use letters in letters (e.g. the
+    letters of one board)
+    """
+    if letters is not None:
+        # Deleting the allowed letters leaves "" for words made of them only
+        allowed = str.maketrans("", "", "".join(letters).upper())
+
+    for word in words:
+        if not isinstance(word, str):
+            continue
+        if min_length is not None and len(word) < min_length:
+            continue
+        if max_length is not None and len(word) > max_length:
+            continue
+        if letters is not None and word.upper().translate(allowed):
+            continue
+        yield word
+
+
+def iter_wordlist(path, min_length=None, max_length=None, letters=None):
+    """
+    Stream the words of a JSON word list ({"words": [...]} or a bare list)
+    or a plain-text file with one word per line, without loading the whole
+    file, filtered like filter_words
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        words = _iter_json_words(f) if path.suffix == ".json" \
+            else _iter_text_words(f)
+        yield from filter_words(words, min_length, max_length, letters)
+
+
+class DictionaryIndex:
+    """
+    Read-only compiled dictionary shared by any number of solves
+    """
+
+    def __init__(self, edges, node_count, word_count, digest,
+                 path=None, _mmap=None, _view=None):
+        self.edges = edges
+        self.node_count = node_count
+        self.word_count = word_count
+        self.digest = digest
+        self.path = path
+        self._mmap = _mmap
+        self._view = _view
+
+    @property
+    def version(self):
+        """
+        Hex digest identifying the exact word set compiled into the index
+        """
+        return self.digest.hex()
+
+    @classmethod
+    def from_words(cls, words):
+        """
+        Compile an index in memory from any iterable of words
+        """
+        return cls.from_sorted_words(sorted(set(w.upper() for w in words)))
+
+    @classmethod
+    def from_sorted_words(cls, words):
+        """
+        Compile an index in memory from words in sorted order (duplicates
+        allowed), one at a time. Raises ValueError for unsorted words
+        """
+        builder = DawgBuilder()
+        for word in words:
+            builder.add(word)
+        return builder.finish()
+
+    @classmethod
+    def from_wordlist(cls, path, min_length=None, max_length=None,
+                      letters=None):
+        """
+        Compile an index in memory from a word list file, filtered like
+        iter_wordlist. Sorted lists (like ENABLE) are streamed straight
+        into the builder; other lists are sorted first
+        """
+        filters = dict(min_length=min_length, max_length=max_length,
+                       letters=letters)
+        try:
+            return cls.from_sorted_words(iter_wordlist(path, **filters))
+        except UnsortedWordsError:
+            return cls.from_words(iter_wordlist(path, **filters))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Memory-map a compiled index file
+        """
+        path = Path(path)
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, node_count, word_count, digest = \
+            _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            mm.close()
+            raise ValueError(f"{path} is not a compatible dictionary index")
+
+        size = node_count * ROW_SIZE * 4
+        view = memoryview(mm)[_HEADER_SIZE:_HEADER_SIZE + size]
+        if sys.byteorder == "little":
+            edges = view.cast("I")
+        else:
+            edges = array("I")
+            edges.frombytes(view)
+            edges.byteswap()
+        return cls(edges, node_count, word_count, digest,
+                   path=path, _mmap=mm, _view=view)
+
+    @classmethod
+    def load_or_build(cls, wordlist_path, index_path=None):
+        """
+        Load the compiled index for a word list, (re)building it first if
+        it is missing or older than the word list
+        """
+        wordlist_path = Path(wordlist_path)
+        index_path = Path(index_path) if index_path else \
+            wordlist_path.with_suffix(".dawg")
+        try:
+            if index_path.stat().st_mtime >= wordlist_path.stat().st_mtime:
+                return cls.load(index_path)
+        except (OSError, ValueError):
+            pass
+        cls.from_wordlist(wordlist_path).save(index_path)
+        return cls.load(index_path)
+
+    def save(self, path):
+        """
+        Write the index to disk atomically
+        """
+        path = Path(path)
+        edges = array("I")
+        edges.frombytes(self.edges.tobytes())
+        if sys.byteorder != "little":
+            edges.byteswap()
+        header = _HEADER.pack(_MAGIC, _FORMAT_VERSION, self.node_count,
+                              self.word_count, self.digest)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.ljust(_HEADER_SIZE, b"\x00"))
+                f.write(edges.tobytes())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def close(self):
+        """
+        Release the memory map of a file-backed index
+        """
+        if self._mmap is not None:
+            if isinstance(self.edges, memoryview):
+                self.edges.release()
+            self._view.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __reduce__(self):
+        # File-backed indexes are re-mapped by the receiving process instead
+        # of copying the table through a pickle
+        if self.path is not None:
+            return (DictionaryIndex.load, (str(self.path),))
+        return (DictionaryIndex, (self.edges, self.node_count,
+                                  self.word_count, self.digest))
+
+    def __len__(self):
+        return self.word_count
+
+    def __contains__(self, word):
+        codes = encode_word(word)
+        if not codes:
+            return False
+        edges = self.edges
+        entry = 0
+        node = ROOT
+        for code in codes:
+            entry = edges[node + code]
+            if not entry:
+                return False
+            node = entry >> 1
+        return bool(entry & 1)
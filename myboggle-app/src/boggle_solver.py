@@ -2,28 +2,107 @@
 Sameer Dhanda
 @03096291
 """
+from functools import lru_cache
+
+from boggle_grid import canonical_grid, decode_grid
+from boggle_index import (ALL_LETTERS, DictionaryIndex, LETTER_CODES,
+                          MASK_COLUMN, ROOT, filter_words)
+
+# Neighbour search order: row above, same row, row below
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1),
+              (0, -1),           (0, 1),
+              (1, -1),  (1, 0),  (1, 1))
+
+
+def score_word(word):
+    """
+    Return the standard Boggle score for a word
+    """
+    length = len(word)
+    if length < 3:
+        return 0
+    if length <= 4:
+        return 1
+    if length == 5:
+        return 2
+    if length == 6:
+        return 3
+    if length == 7:
+        return 5
+    return 11
+
+
+@lru_cache(maxsize=None)
+def neighbour_table(rows, cols):
+    """
+    Return, for each cell index (row * cols + col), the tuple of its
+    in-bounds neighbour indexes in DIRECTIONS order
+    """
+    table = []
+    for row in range(rows):
+        for col in range(cols):
+            table.append(tuple(
+                (row + dr) * cols + col + dc for dr, dc in DIRECTIONS
+                if 0 <= row + dr < rows and 0 <= col + dc < cols))
+    return tuple(table)
+
+
+def board_word_filters(grid):
+    """
+    Return the iter_wordlist filters (see boggle_index) that keep only the
+    words that could be on a board: at least 3 letters, at most as many
+    letters as the tiles hold, and only letters of its tiles. For example
+
+        DictionaryIndex.from_wordlist(path, **board_word_filters(grid))
+
+    compiles a small index for a one-off solve
+    """
+    if isinstance(grid, str):
+        grid = decode_grid(grid)
+    tiles = [tile.upper() for row in grid for tile in row]
+    return {
+        "min_length": 3,
+        "max_length": sum(len(tile) for tile in tiles),
+        "letters": set("".join(tiles)),
+    }
+
+
+def map_paths(found, cells):
+    """
+    Return found ({word: cell path}) with every cell index i replaced by
+    cells[i]
+    """
+    return {word: tuple([cells[cell] for cell in path])
+            for word, path in found.items()}
 
 
 class Boggle:
-    def __init__(self, grid=None, dictionary=None):
+    def __init__(self, grid=None, dictionary=None, cache=None):
         """
-        Constructor: Initialize the Boggle game
+        Constructor: Initialize the Boggle game. cache is an optional
+        SolveCache (see boggle_cache) shared by solves of the same boards
         """
-        self.grid = grid if grid else []
+        self.setGrid(grid if grid else [])
         self.dictionary = dictionary if dictionary else []
+        self.cache = cache
         self.solutions = []
+        self._index = None
+        self._board_index = None
 
     def setGrid(self, grid):
         """
-        Set the Boggle grid
+        Set the Boggle grid (a list of rows of tiles, or a grid code, see
+        boggle_grid)
         """
-        self.grid = grid
+        self.grid = decode_grid(grid) if isinstance(grid, str) else grid
 
     def setDictionary(self, dictionary):
         """
-        Set the dictionary of valid words
+        Set the dictionary of valid words (a word list or a DictionaryIndex)
         """
         self.dictionary = dictionary
+        self._index = None
+        self._board_index = None
 
     def _expand_tile(self, tile):
         """
@@ -37,103 +116,275 @@ class Boggle:
         else:
             return tile_upper
 
-    def getSolution(self):
+    def _get_index(self):
         """
-        Find and return all valid words in the grid using depth-first search
+        Return the compiled dictionary index. A plain word list is first
+        compiled for one board, from only the words that could be on it
+        (see board_word_filters), which is much cheaper than the whole list
+        for a one-off solve; once another board is solved, the whole list is
+        compiled once so repeated solves share it
         """
-        # Reset solutions for each new search
-        self.solutions = []
+        if isinstance(self.dictionary, DictionaryIndex):
+            return self.dictionary
+        if self._index is not None:
+            return self._index
+
+        filters = board_word_filters(self.grid)
+        board = (filters["max_length"], frozenset(filters["letters"]))
+        if self._board_index is None:
+            words = filter_words(self.dictionary, **filters)
+            self._board_index = (board, DictionaryIndex.from_words(words))
+        elif self._board_index[0] != board:
+            self._board_index = None
+            self._index = DictionaryIndex.from_words(self.dictionary)
+            return self._index
+        return self._board_index[1]
+
+    def _expand_grid(self, rows, cols):
+        """
+        Expand every tile once per grid. Returns the tile strings and, per
+        cell, the tuple of letter codes to follow in the index (None for
+        tiles that contain non A-Z letters and can never start or extend a
+        word)
+        """
+        tiles = []
+        steps = []
+        for r in range(rows):
+            for c in range(cols):
+                tile = self._expand_tile(self.grid[r][c])
+                codes = tuple(LETTER_CODES.get(letter) for letter in tile)
+                tiles.append(tile)
+                steps.append(None if None in codes else codes)
+        return tiles, steps
+
+    def _search(self):
+        """
+        Find all valid words in the grid, from the cache if the board or
+        one of its rotations or reflections was solved before with the
+        same dictionary. Returns a dict (in discovery order) mapping each
+        word to the cell indexes of the first path that spells it
+        """
+        if self.cache is None or not self.grid or not self.dictionary:
+            return self._search_grid()
+
+        try:
+            grid_code, perm = canonical_grid(self.grid)
+        except ValueError:
+            # Tiles without a grid code symbol are solved uncached
+            return self._search_grid()
+
+        # The cache holds paths on the canonical board: cell i of the
+        # canonical board is cell perm[i] of this one
+        identity = all(cell == i for i, cell in enumerate(perm))
+        version = self._get_index().version
+        found = self.cache.get(version, grid_code)
+        if found is not None:
+            return found if identity else map_paths(found, perm)
+
+        found = self._search_grid()
+        if identity:
+            self.cache.set(version, grid_code, found)
+        else:
+            inverse = [0] * len(perm)
+            for i, cell in enumerate(perm):
+                inverse[cell] = i
+            self.cache.set(version, grid_code, map_paths(found, inverse))
+        return found
+
+    def _search_grid(self):
+        """
+        Find all valid words in the grid using depth-first search
+        """
+        found = {}
 
         # Handle edge cases: empty grid or dictionary
         if not self.grid or not self.dictionary:
-            return []
+            return found
 
         rows = len(self.grid)
         cols = len(self.grid[0]) if rows > 0 else 0
 
         # Handle empty dimensions
         if rows == 0 or cols == 0:
-            return []
+            return found
+
+        edges = self._get_index().edges
+        neighbours = neighbour_table(rows, cols)
+        tiles, steps = self._expand_grid(rows, cols)
+        lengths = [len(tile) for tile in tiles]
 
-        # Convert dictionary to uppercase for case-insensitive matching
-        dict_set = set(word.upper() for word in self.dictionary)
+        # Letters that are on no tile (both letters of a QU or ST tile are
+        # on the board): index nodes whose words all need one of them are
+        # never entered
+        board_letters = 0
+        for codes in steps:
+            for code in codes or ():
+                board_letters |= 1 << code
+        missing = ALL_LETTERS & ~board_letters
 
-        prefixes = set()
-        for word in dict_set:
-            for i in range(1, len(word) + 1):
-                prefixes.add(word[:i])
+        # Depth-first search with an explicit stack, so board size is not
+        # limited by the recursion limit. A frame is (cell, index entry
+        # reached on it, bitmask of the cells on the path, word length,
+        # path). Neighbours are pushed in reverse so frames pop in the same
+        # order as a recursive search
+        reversed_neighbours = [tuple(reversed(cells)) for cells in neighbours]
+        cell_bits = [1 << cell for cell in range(len(steps))]
+        stack = []
 
-        def dfs(row, col, visited, current_word):
-            """
-            Depth-first search to find words starting from (row, col)
-            """
-            # Stop if current word is not a valid prefix
-            if current_word not in prefixes:
-                return
+        for cell in reversed(range(len(steps))):
+            codes = steps[cell]
+            if not codes:
+                continue
+            entry = ROOT
+            for code in codes:
+                entry = edges[(entry >> 1) + code]
+                if not entry:
+                    break
+            if not entry or edges[(entry >> 1) + MASK_COLUMN] & missing:
+                continue
+            stack.append((cell, entry, cell_bits[cell], lengths[cell], (cell,)))
+
+        while stack:
+            cell, entry, visited, length, path = stack.pop()
 
             # Check if current word is valid (3+ letters and in dictionary)
-            if len(current_word) >= 3 and current_word in dict_set:
+            if length >= 3 and entry & 1:
+                word = "".join([tiles[i] for i in path])
                 # Avoid duplicates
-                if current_word not in self.solutions:
-                    self.solutions.append(current_word)
+                if word not in found:
+                    found[word] = path
 
-            # Explore all 8 adjacent directions
-            directions = [(-1, -1), (-1, 0), (-1, 1),
-                          (0, -1),           (0, 1),
-                          (1, -1),  (1, 0),  (1, 1)]
+            base = entry >> 1
+            for next_cell in reversed_neighbours[cell]:
+                if visited & cell_bits[next_cell]:
+                    continue
+                codes = steps[next_cell]
+                if codes is None:
+                    continue
 
-            for dr, dc in directions:
-                new_row = row + dr
-                new_col = col + dc
+                # Follow the tile's letters; stop if they leave the index
+                # or lead to words that need letters missing from the board
+                child = base
+                for code in codes:
+                    child = edges[child + code]
+                    if not child:
+                        break
+                    child_entry = child
+                    child >>= 1
+                else:
+                    if edges[child + MASK_COLUMN] & missing:
+                        continue
+                    stack.append((next_cell, child_entry if codes else entry,
+                                  visited | cell_bits[next_cell],
+                                  length + lengths[next_cell],
+                                  path + (next_cell,)))
 
-                # Check if new position is within bounds and not visited
-                if (0 <= new_row < rows and
-                    0 <= new_col < cols and
-                        (new_row, new_col) not in visited):
+        return found
 
-                    # Get the expanded tile value
-                    tile_value = self._expand_tile(
-                        self.grid[new_row][new_col])
+    def getSolution(self, sort=False):
+        """
+        Find and return all valid words in the grid, in discovery order or
+        alphabetically if sort is True
+        """
+        self.solutions = list(self._search())
+        if sort:
+            self.solutions.sort()
+        return self.solutions
 
-                    # Mark this tile as visited
-                    visited.add((new_row, new_col))
+    def getSolutionDetails(self, sort=False):
+        """
+        Find all valid words in the grid and return, for each one, the
+        [row, col] cells of a path that spells it and its Boggle score
+        """
+        found = self._search()
+        self.solutions = list(found)
+        if sort:
+            self.solutions.sort()
 
-                    # Recursively search from the new position
-                    dfs(new_row, new_col, visited,
-                        current_word + tile_value)
+        cols = len(self.grid[0]) if self.grid else 0
+        return [{
+            "word": word,
+            "path": [[cell // cols, cell % cols] for cell in found[word]],
+            "score": score_word(word),
+        } for word in self.solutions]
 
-                    # Backtrack: remove this tile from visited set
-                    visited.remove((new_row, new_col))
 
-        # Start DFS from each cell in the grid
-        for r in range(rows):
-            for c in range(cols):
-                # Get the starting tile value
-                starting_tile = self._expand_tile(self.grid[r][c])
+def main(argv=None):
+    """
+    Command-line interface:
 
-                # Initialize visited set with current starting position
-                initial_visited = {(r, c)}
+        python boggle_solver.py build-index [--wordlist W] [--index I]
+        python boggle_solver.py batch grids.jsonl [-o out.jsonl] [-j N]
+    """
+    import argparse
+    import json
+    import sys
+    import time
+    from pathlib import Path
 
-                # Begin search from this cell
-                dfs(r, c, initial_visited, starting_tile)
+    here = Path(__file__).resolve().parent
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--wordlist", default=here / "full-wordlist.json",
+                        help="JSON or plain-text word list")
+    common.add_argument("--index",
+                        help="compiled index file (default: next to the "
+                             "word list with a .dawg suffix)")
 
-        return self.solutions
+    parser = argparse.ArgumentParser(prog="boggle_solver.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("build-index", parents=[common],
+                        help="compile the word list into an index file")
+
+    batch = commands.add_parser(
+        "batch", parents=[common],
+        help="solve a JSONL file of grids ('-' for stdin)")
+    batch.add_argument("grids")
+    batch.add_argument("-o", "--output", help="output JSONL (default stdout)")
+    batch.add_argument("-j", "--processes", type=int,
+                       help="worker processes (default: CPU count)")
+    batch.add_argument("--chunksize", type=int, default=32)
+    batch.add_argument("--unordered", action="store_true",
+                       help="emit results as soon as they are ready")
+
+    args = parser.parse_args(argv)
+    wordlist = Path(args.wordlist)
+    index_path = Path(args.index) if args.index else \
+        wordlist.with_suffix(".dawg")
 
+    if args.command == "build-index":
+        start = time.perf_counter()
+        index = DictionaryIndex.from_wordlist(wordlist)
+        index.save(index_path)
+        print(f"{index_path}: {len(index)} words, {index.node_count} nodes, "
+              f"{time.perf_counter() - start:.2f}s", file=sys.stderr)
+        return
 
-def main():
-    # Example 4x4 grid
-    grid = [["A", "B", "C", "D"],
-            ["E", "F", "G", "H"],
-            ["I", "J", "K", "L"],
-            ["A", "B", "C", "D"]]
+    from boggle_batch import iter_jsonl_grids, solve_batch
 
-    # Example dictionary
-    dictionary = ["ABEF", "AFJIEB", "DGKD", "DGKA"]
+    DictionaryIndex.load_or_build(wordlist, index_path).close()
+    if args.grids == "-":
+        grids = (json.loads(line) for line in sys.stdin if line.strip())
+    else:
+        grids = iter_jsonl_grids(args.grids)
 
-    # Create Boggle instance and solve
-    mygame = Boggle(grid, dictionary)
-    print(mygame.getSolution())
+    out = open(args.output, "w", encoding="utf-8") if args.output \
+        else sys.stdout
+    count = 0
+    start = time.perf_counter()
+    try:
+        for result in solve_batch(grids, index_path, args.processes,
+                                  args.chunksize, not args.unordered):
+            out.write(json.dumps(result) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"Solved {count} grids in {elapsed:.2f}s "
+          f"({count / elapsed if elapsed else 0:.1f} grids/s)",
+          file=sys.stderr)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()